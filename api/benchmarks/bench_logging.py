@@ -0,0 +1,152 @@
+"""
+Log-induced latency on the event loop: synchronous StreamHandler vs the queue.
+
+Many asyncio tasks each emit `analysis_completed`-style JSON records while the
+output stream is slow (every write sleeps --write-ms, like a blocked stdout pipe
+or a slow log shipper). Reports the per-call latency seen by the caller, which
+is the time the event loop spends inside logging. A second table compares the
+old eager `f"Raw response: {response}"` INFO line with the sampled, lazily
+rendered DEBUG payload log at the default INFO level.
+
+Usage (from api/):
+    python -m benchmarks.bench_logging --tasks 50 --records 200 --write-ms 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import logging
+import queue
+import time
+from logging.handlers import QueueListener
+from statistics import quantiles
+from types import SimpleNamespace
+
+from utils.logging_config import LazyStr, NonBlockingQueueHandler, payload_log_sampled
+
+
+class SlowStream(io.TextIOBase):
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s
+        self.bytes = 0
+
+    def write(self, s: str) -> int:
+        time.sleep(self.delay_s)
+        self.bytes += len(s)
+        return len(s)
+
+
+def _formatter() -> logging.Formatter:
+    try:
+        from pythonjsonlogger import jsonlogger
+
+        return jsonlogger.JsonFormatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+    except ImportError:
+        return logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+
+def _logger(name: str, mode: str, delay_s: float, queue_size: int):
+    handler = logging.StreamHandler(SlowStream(delay_s))
+    handler.setFormatter(_formatter())
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    listener = None
+    if mode == "queue":
+        records: queue.Queue = queue.Queue(maxsize=queue_size)
+        listener = QueueListener(records, handler, respect_handler_level=True)
+        listener.start()
+        logger.handlers = [NonBlockingQueueHandler(records)]
+    else:
+        logger.handlers = [handler]
+    return logger, listener
+
+
+async def _load(logger: logging.Logger, tasks: int, records: int) -> list:
+    latencies = []
+
+    async def worker(i: int) -> None:
+        for n in range(records):
+            t0 = time.perf_counter()
+            logger.info(
+                "analysis_completed",
+                extra={"status": "normal", "confidence": 0.87, "tokensUsed": 512, "hasImage": n % 3 == 0, "task": i},
+            )
+            latencies.append(time.perf_counter() - t0)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(worker(i) for i in range(tasks)))
+    return latencies
+
+
+def measure(mode: str, tasks: int, records: int, delay_s: float, queue_size: int) -> dict:
+    logger, listener = _logger(f"bench.{mode}", mode, delay_s, queue_size)
+    t0 = time.perf_counter()
+    latencies = asyncio.run(_load(logger, tasks, records))
+    loop_s = time.perf_counter() - t0
+    if listener is not None:
+        listener.stop()  # drain, so the writer's total is comparable
+    total_s = time.perf_counter() - t0
+    cuts = quantiles(latencies, n=100)
+    return {
+        "mode": mode,
+        "p50_us": cuts[49] * 1e6,
+        "p99_us": cuts[98] * 1e6,
+        "max_us": max(latencies) * 1e6,
+        "loop_s": loop_s,
+        "total_s": total_s,
+    }
+
+
+def payload_cost(n: int) -> dict:
+    logger = logging.getLogger("bench.payload")
+    logger.propagate = False
+    logger.handlers = [logging.NullHandler()]
+    logger.setLevel(logging.INFO)
+    # Roughly the shape/size of a chat completion object
+    response = SimpleNamespace(
+        id="chatcmpl-123",
+        choices=[SimpleNamespace(message=SimpleNamespace(content='{"status": "normal", "reasoning": "' + "x" * 400 + '"}'))],
+        usage=SimpleNamespace(prompt_tokens=3200, completion_tokens=90, total_tokens=3290),
+        system_fingerprint="fp_" + "0" * 12,
+    )
+    text = response.choices[0].message.content
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        logger.info(f"Raw response: {response}")
+        logger.info(f"Extracted text: {text}")
+    eager = (time.perf_counter() - t0) / n
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        if payload_log_sampled(logger):
+            logger.debug("openai_raw_response", extra={"response": LazyStr(response), "text": text})
+    lazy = (time.perf_counter() - t0) / n
+    return {"eager_us": eager * 1e6, "lazy_us": lazy * 1e6}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--records", type=int, default=200)
+    parser.add_argument("--write-ms", type=float, default=0.2)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{args.tasks} tasks x {args.records} records, {args.write_ms} ms per stream write")
+    print(f"{'handler':<8} {'p50 us':>9} {'p99 us':>9} {'max us':>10} {'loop s':>8} {'drained s':>10}")
+    for mode in ("sync", "queue"):
+        r = measure(mode, args.tasks, args.records, args.write_ms / 1000, args.queue_size)
+        print(
+            f"{r['mode']:<8} {r['p50_us']:>9.1f} {r['p99_us']:>9.1f} {r['max_us']:>10.1f} "
+            f"{r['loop_s']:>8.2f} {r['total_s']:>10.2f}"
+        )
+
+    p = payload_cost(20000)
+    print(f"payload log per call at INFO: eager f-string {p['eager_us']:.1f} us, sampled lazy DEBUG {p['lazy_us']:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Per-observation cost of the in-process metrics.
+
+Times a bare loop, `Counter.inc`, `Histogram.observe` and a full `with stage(...)`
+block (two perf_counter calls plus the observe) so the instrumentation overhead
+on the /api/analyze hot path can be compared with the stages it measures.
+
+Usage (from api/):
+    python -m benchmarks.bench_metrics --n 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from utils.metrics import Counter, Histogram, Registry
+
+
+def _per_call_ns(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    fn(n)
+    return (time.perf_counter() - t0) * 1e9 / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    registry = Registry()
+    counter = registry.register(Counter("bench_total", "bench", ("reason",)))
+    histogram = registry.register(Histogram("bench_seconds", "bench", ("stage",)))
+
+    def baseline(n):
+        for _ in range(n):
+            pass
+
+    def inc(n):
+        for _ in range(n):
+            counter.inc("rate_limit")
+
+    def observe(n):
+        for _ in range(n):
+            histogram.observe(0.0042, "context")
+
+    def timed(n):
+        for _ in range(n):
+            with histogram.time("context"):
+                pass
+
+    base = _per_call_ns(baseline, args.n)
+    print(f"{'operation':<22} {'ns/op':>8}")
+    for name, fn in (("Counter.inc", inc), ("Histogram.observe", observe), ("with stage(...)", timed)):
+        print(f"{name:<22} {_per_call_ns(fn, args.n) - base:>8.0f}")
+
+    t0 = time.perf_counter()
+    text = registry.render()
+    print(f"render: {(time.perf_counter() - t0) * 1e6:.0f} us, {len(text)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Prompt tokens per request: original prose prompt vs the compact encoding.
+
+Builds the messages for every scenario in mock_data/data.json (with and without
+its image) in both PROMPT_MODE=verbose and compact, counts tokens locally and
+reports per-request means plus the build time. Anomaly context and a cached
+visual assessment are included so the numbers reflect a realistic request.
+
+Usage (from api/):
+    python -m benchmarks.bench_prompt_tokens
+"""
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+from statistics import mean
+
+from services.prompt_builder import _encoder, build_prompt, count_message_tokens, count_text_tokens, image_tokens
+
+DATA = Path(__file__).resolve().parent.parent / "mock_data" / "data.json"
+FAKE_IMAGE = b"\xff\xd8" + b"\x00" * 2048  # content doesn't matter for counting
+
+
+def _requests():
+    for scenario in json.loads(DATA.read_text()):
+        sensor_data = {
+            "timestamp": scenario["timestamp"],
+            "temperature": scenario.get("temperature"),
+            "humidity": scenario.get("humidity"),
+            "co2": scenario.get("co2"),
+            "soil_moisture": scenario.get("soilMoisture"),
+        }
+        historical = {
+            "avgTemp": 23.59,
+            "trend": "stable",
+            "alerts": 0,
+            "anomaly": {
+                "zScores": {
+                    "temperature": {"z": 1.24, "hourZ": 0.8},
+                    "humidity": {"z": -0.4, "hourZ": None},
+                    "co2": {"z": 0.1, "hourZ": 0.3},
+                    "soil_moisture": {"z": -2.2, "hourZ": -1.9},
+                },
+                "maxAbsZ": 2.2,
+            },
+        }
+        yield sensor_data, historical, True
+        yield sensor_data, {**historical, "visualAssessment": {"text": "Healthy foliage, no wilting or spots.", "ageMinutes": 40}}, False
+
+
+def measure(mode: str, with_image: bool) -> dict:
+    tokens, user_tokens, build_us = [], [], []
+    for sensor_data, historical, image_case in _requests():
+        if image_case != with_image:
+            continue
+        t0 = time.perf_counter()
+        prompt = build_prompt(
+            sensor_data,
+            historical,
+            FAKE_IMAGE if with_image else None,
+            "image/jpeg",
+            token_budget=0,
+            mode=mode,
+        )
+        build_us.append((time.perf_counter() - t0) * 1e6)
+        tokens.append(count_message_tokens(prompt.messages))
+        user_tokens.append(count_text_tokens(prompt.messages[1]["content"][0]["text"]))
+    return {
+        "mode": mode,
+        "image": with_image,
+        "tokens": mean(tokens),
+        "user_tokens": mean(user_tokens),
+        "build_us": mean(build_us),
+    }
+
+
+def main() -> None:
+    counter = "tiktoken o200k_base" if _encoder() is not None else "chars/4 estimate (tiktoken not installed)"
+    print(f"token counter: {counter}; image = {image_tokens()} tokens (low detail)")
+    print(f"{'request':<14} {'verbose':>9} {'compact':>9} {'saved':>7} {'user text v/c':>14} {'build us v/c':>14}")
+    for with_image in (False, True):
+        v = measure("verbose", with_image)
+        c = measure("compact", with_image)
+        label = "image" if with_image else "sensor+cached"
+        print(
+            f"{label:<14} {v['tokens']:>9.0f} {c['tokens']:>9.0f} "
+            f"{(1 - c['tokens'] / v['tokens']) * 100:>6.1f}% "
+            f"{v['user_tokens']:>7.0f}/{c['user_tokens']:<6.0f} "
+            f"{v['build_us']:>6.1f}/{c['build_us']:<6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
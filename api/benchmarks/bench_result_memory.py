@@ -0,0 +1,99 @@
+"""
+Memory held by in-memory analysis results.
+
+Builds --results results shaped like MockAnalyzer's (model fields + id,
+timestamp, location, camera_id, sensorData, image; each decoded from its own
+JSON like a model reply, so repeated strings are separate objects) and measures
+with tracemalloc:
+  - a list of dicts (the previous `MockAnalyzer.results`)
+  - a list of `ResultRecord`s (same results, unbounded)
+  - a `ResultRing` of --capacity (what the analyzer keeps now)
+plus the time to append one record (it is encoded once, here) and to rebuild
+the ring's JSON array for /analysis-status (a join of the encoded records).
+
+Usage (from api/):
+    python -m benchmarks.bench_result_memory --results 100000 --capacity 1000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from services.result_ring import ResultRecord, ResultRing
+
+STATUSES = ("normal", "normal", "normal", "potential_anomaly", "uncertain")
+
+
+def _result_json(i: int) -> str:
+    status = STATUSES[i % len(STATUSES)]
+    return json.dumps(
+        {
+            "status": status,
+            "confidence": 0.9 if status == "normal" else 0.6,
+            "reasoning": f"Reading {i}: temperature and humidity are within range; foliage looks healthy.",
+            "primary_concern": None if status == "normal" else "sensors",
+            "visual_assessment": "Healthy cherry tomato plants with green foliage.",
+            "signals_agree": status == "normal",
+            "recommended_action": None if status == "normal" else "Inspect irrigation in this row",
+            "tokensUsed": 3300 + i % 40,
+            "cost": f"{0.0009 + (i % 40) * 1e-6:.6f}",
+            "id": f"analysis_{i}",
+            "timestamp": f"2025-01-{1 + i // 86400 % 28:02d}T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z",
+            "location": f"Section {'ABCDEFGH'[i % 8]} - Row {i // 8 % 6 + 1}",
+            "camera_id": f"CAM-{'ABCDEFGH'[i % 8]}{i // 8 % 6 + 1}",
+            "sensorData": {"temperature": 24 + i % 5, "humidity": 65, "co2": 420 + i % 30, "soilMoisture": 50},
+            "image": f"plant_{i % 12}.jpeg",
+        }
+    )
+
+
+def _measure(label: str, build, count: int):
+    gc.collect()
+    tracemalloc.start()
+    held = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<30} {current / 2**20:>9.1f} {peak / 2**20:>9.1f} {current / count:>12.0f}")
+    return held, current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, default=100_000)
+    parser.add_argument("--capacity", type=int, default=1000)
+    args = parser.parse_args()
+
+    payloads = [_result_json(i) for i in range(args.results)]
+    print(f"{'representation':<30} {'held MiB':>9} {'peak MiB':>9} {'B/result':>12}")
+
+    dicts, dict_bytes = _measure("list of dicts", lambda: [json.loads(p) for p in payloads], args.results)
+    del dicts
+    records, record_bytes = _measure(
+        "list of ResultRecord", lambda: [ResultRecord(json.loads(p)) for p in payloads], args.results
+    )
+    del records
+
+    def fill_ring() -> ResultRing:
+        ring = ResultRing(args.capacity)
+        for p in payloads:
+            ring.append(json.loads(p))
+        return ring
+
+    ring, ring_bytes = _measure(f"ResultRing({args.capacity})", fill_ring, args.results)
+    print(f"records: {dict_bytes / record_bytes:.1f}x smaller than dicts; ring: {ring_bytes / 2**20:.1f} MiB regardless of history ({ring.spilled} spilled)")
+
+    decoded = [json.loads(p) for p in payloads[:10_000]]
+    t0 = time.perf_counter()
+    for result in decoded:
+        ring.append(result)
+    print(f"append:                  {(time.perf_counter() - t0) / len(decoded) * 1e6:8.1f} us/result")
+    t0 = time.perf_counter()
+    body = ring.json_array()
+    print(f"join ring ({len(ring)}):   {(time.perf_counter() - t0) * 1e3:8.2f} ms, {len(body) / 2**10:.0f} KiB (cached until the next append)")
+
+
+if __name__ == "__main__":
+    main()
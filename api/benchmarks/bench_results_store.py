@@ -0,0 +1,101 @@
+"""
+Results store at dashboard scale.
+
+Fills a temporary SQLite results store with synthetic analyses (40 sections, 3%
+anomalies, a few pager alerts) through the batched `add` path, then times the
+dashboard queries (first page and a deep keyset page) for each filter. Peak RSS
+is reported to show memory stays flat while history grows.
+
+Usage (from api/):
+    python -m benchmarks.bench_results_store --rows 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from utils.results_store import ResultsStore
+
+SECTIONS = [f"Section {chr(65 + i // 8)} - Row {i % 8 + 1}" for i in range(40)]
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def fill(store: ResultsStore, rows: int) -> float:
+    rng = random.Random(7)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    t0 = time.perf_counter()
+    for i in range(rows):
+        section = i % len(SECTIONS)
+        roll = rng.random()
+        status = "potential_anomaly" if roll < 0.03 else "uncertain" if roll < 0.05 else "normal"
+        store.add({
+            "id": f"r{i}",
+            "timestamp": start + timedelta(seconds=30 * i),
+            "location": SECTIONS[section],
+            "camera_id": f"CAM-{section}",
+            "status": status,
+            "confidence": round(rng.uniform(0.5, 0.95), 2),
+            "reasoning": "Readings within the expected range for this section.",
+            "tokensUsed": 0,
+            "cost": "0.000000",
+            "pagerAlert": {"triggered": True} if status == "potential_anomaly" and roll < 0.002 else None,
+        })
+        if i and i % 200_000 == 0:
+            print(f"  {i:>9,} rows  rss {_rss_mb():6.1f} MB")
+    store.flush()
+    return time.perf_counter() - t0
+
+
+def timed(store: ResultsStore, **filters) -> tuple:
+    t0 = time.perf_counter()
+    page = store.query(limit=50, **filters)
+    first = (time.perf_counter() - t0) * 1000
+    # Walk 20 pages deep with the keyset cursor
+    t0 = time.perf_counter()
+    for _ in range(20):
+        if not page["nextCursor"]:
+            break
+        page = store.query(limit=50, cursor=page["nextCursor"], **filters)
+    deep = (time.perf_counter() - t0) * 1000 / 20
+    return first, deep
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ResultsStore(os.path.join(tmp, "results.db"), batch_size=args.batch)
+        print(f"inserting {args.rows:,} rows (batch {args.batch})")
+        elapsed = fill(store, args.rows)
+        print(f"insert: {args.rows / elapsed:,.0f} rows/s, peak rss {_rss_mb():.1f} MB, "
+              f"db {os.path.getsize(os.path.join(tmp, 'results.db')) / 1e6:.0f} MB")
+
+        mid = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=15 * args.rows)
+        cases = {
+            "latest (no filter)": {},
+            "location": {"location": SECTIONS[5]},
+            "location + 1 day": {"location": SECTIONS[5], "since": mid, "until": mid + timedelta(days=1)},
+            "status=potential_anomaly": {"status": "potential_anomaly"},
+            "camera_id": {"camera_id": "CAM-17"},
+            "pager only": {"pager_only": True},
+        }
+        print(f"{'query':<26} {'page 1 ms':>10} {'deep page ms':>13}")
+        for name, filters in cases.items():
+            first, deep = timed(store, **filters)
+            print(f"{name:<26} {first:>10.2f} {deep:>13.2f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
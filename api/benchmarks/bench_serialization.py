@@ -0,0 +1,106 @@
+"""
+Response serialization cost for analysis payloads.
+
+Compares, per response:
+  - /analyze: `AnalysisResult.model_validate` + FastAPI's jsonable_encoder +
+    json.dumps (the previous path) vs `analysis_result_payload` + `dumps`
+    (orjson when installed)
+  - /analysis-status: json.dumps of the whole status dict vs
+    `MockAnalyzer.status_body()`, which caches the encoded results array
+  - /api/analyses: json.loads of each stored payload + re-encoding vs splicing
+    the stored JSON
+
+Usage (from api/):
+    python -m benchmarks.bench_serialization --iterations 5000 --results 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+
+from models.schemas import AnalysisResult, analysis_result_payload
+from services.mock_analyzer import MockAnalyzer
+from utils import fast_json
+from utils.fast_json import dumps, join_array
+
+
+def _result(i: int) -> dict:
+    return {
+        "id": f"analysis_{i:06d}",
+        "timestamp": datetime(2024, 1, 15, 10, i % 60, tzinfo=timezone.utc),
+        "location": "greenhouse-A",
+        "status": "potential_anomaly" if i % 7 == 0 else "normal",
+        "confidence": 0.87,
+        "reasoning": "Temperature and humidity are within range; leaves look healthy. " * 3,
+        "sensor_anomalies": ["humidity"] if i % 7 == 0 else [],
+        "visual_observations": ["uniform green foliage", "no visible lesions"],
+        "recommendations": ["keep current irrigation schedule"],
+        "data_quality": {"sensorCompleteness": 1.0, "imageQuality": "good"},
+        "has_image": True,
+        "image": f"plant_{i % 10}.jpg",
+        "tokens_used": 1520,
+        "cost": "0.000410",
+    }
+
+
+def _per_call_us(fn, n: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--results", type=int, default=200, help="results in the status/list payloads")
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson' if fast_json.orjson is not None else 'stdlib json (orjson not installed)'}")
+    print(f"{'payload':<36} {'before us':>10} {'after us':>10} {'speedup':>8}")
+
+    def row(label: str, before: float, after: float) -> None:
+        print(f"{label:<36} {before:>10.1f} {after:>10.1f} {before / after:>7.1f}x")
+
+    result = _result(1)
+    row(
+        "single AnalysisResult",
+        _per_call_us(lambda: json.dumps(jsonable_encoder(AnalysisResult.model_validate(result))).encode(), args.iterations),
+        _per_call_us(lambda: dumps(analysis_result_payload(result)), args.iterations),
+    )
+
+    # MockAnalyzer persists the results it loads; keep that out of the repo's store
+    os.environ["RESULTS_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "results.db")
+    analyzer = MockAnalyzer()
+    results = [json.loads(json.dumps(_result(i), default=str)) for i in range(args.results)]
+    analyzer.results.clear()
+    analyzer.results.extend(results)
+    analyzer.completed = analyzer.total = args.results
+    status = {"status": "complete", "completed": args.results, "total": args.results, "results": results}
+    n = max(10, args.iterations // 20)
+    row(
+        f"analysis-status ({args.results} results)",
+        _per_call_us(lambda: json.dumps(jsonable_encoder(status)).encode(), n),
+        _per_call_us(analyzer.status_body, n),
+    )
+
+    stored = [json.dumps(r) for r in results[:50]]
+    row(
+        "analyses page (50 stored payloads)",
+        _per_call_us(
+            lambda: json.dumps(jsonable_encoder({"items": [json.loads(p) for p in stored], "nextCursor": None})).encode(),
+            n,
+        ),
+        _per_call_us(lambda: b'{"items":' + join_array(p.encode() for p in stored) + b',"nextCursor":null}', n),
+    )
+
+
+if __name__ == "__main__":
+    main()
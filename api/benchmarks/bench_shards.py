@@ -0,0 +1,139 @@
+"""
+Location sharding: ring balance, keys moved on rebalance, and analysis throughput.
+
+Part 1 places --locations section names on a ring of --workers nodes and
+reports the load spread (max/mean) and the fraction of locations that move when
+a node is added or removed (ideal: 1/(N+1) and 1/N).
+
+Part 2 pushes --readings image readings (mock_data/images, spread over the
+locations) through `analyze_reading` in this process and then through a
+ShardSupervisor with --workers processes, with a stubbed model that answers
+after --model-latency-ms. Throughput only scales with workers up to the number
+of free cores (image checks are CPU-bound).
+
+Usage (from api/):
+    python -m benchmarks.bench_shards --workers 4 --locations 200 --readings 400
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+from services.shard_ring import HashRing
+
+IMAGES = Path(__file__).resolve().parent.parent / "mock_data" / "images"
+
+
+def ring_balance(workers: int, locations: int, vnodes: int) -> None:
+    keys = [f"Section {i // 4} - Row {i % 4 + 1}" for i in range(locations)]
+    ring = HashRing([f"shard-{i}" for i in range(workers)], vnodes=vnodes)
+    owners = {key: ring.node_for(key) for key in keys}
+    load = Counter(owners.values())
+    print(f"{locations} locations on {workers} workers ({vnodes} vnodes): max/mean load {max(load.values()) / (locations / workers):.2f}")
+
+    grown = ring.copy()
+    grown.add(f"shard-{workers}")
+    moved = sum(grown.node_for(key) != owner for key, owner in owners.items())
+    print(f"  add a worker:    {moved / locations:.1%} of locations move (ideal {1 / (workers + 1):.1%})")
+    shrunk = ring.copy()
+    shrunk.remove("shard-0")
+    moved = sum(shrunk.node_for(key) != owner for key, owner in owners.items())
+    print(f"  remove a worker: {moved / locations:.1%} of locations move (ideal {1 / workers:.1%})")
+
+
+def install_stub_model(latency_ms: float) -> None:
+    """Worker initializer (also used in-process): OpenAIService with a stubbed client."""
+    os.environ.setdefault("OPENAI_API_KEY", "bench-stub")
+    from benchmarks.suite import _StubCompletions
+    from services import openai_service
+
+    service = openai_service.OpenAIService()
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=_StubCompletions(latency_ms / 1000)))
+    openai_service._service = service
+
+
+def _readings(count: int, locations: int):
+    from models.schemas import SensorData
+
+    images = [p.read_bytes() for p in sorted(IMAGES.glob("*.jp*g")) if "blurry" not in p.name]
+    for i in range(count):
+        sensors = SensorData.model_validate(
+            {
+                "timestamp": f"2025-01-15T{10 + i // 3600 % 10:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z",
+                "temperature": 24.5,
+                "humidity": 65,
+                "co2": 450,
+                "soilMoisture": 45,
+                "location": f"Section {i % locations // 4} - Row {i % 4 + 1}",
+            }
+        )
+        yield sensors, images[i % len(images)]
+
+
+async def _run(analyze, readings, concurrency: int) -> float:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(sensors, image):
+        async with slots:
+            await analyze(sensors, image_bytes=image, image_mime="image/jpeg")
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(sensors, image) for sensors, image in readings))
+    return time.perf_counter() - t0
+
+
+async def throughput(workers: int, locations: int, count: int, latency_ms: float) -> None:
+    from services.analysis_pipeline import analyze_reading
+    from services.shard_workers import ShardSupervisor
+
+    readings = list(_readings(count, locations))
+    install_stub_model(latency_ms)
+    single = await _run(analyze_reading, readings, concurrency=8 * workers)
+    print(f"in-process:        {count / single:8.1f} readings/s")
+
+    supervisor = ShardSupervisor(workers=workers, initializer=install_stub_model, initargs=(latency_ms,))
+    await supervisor.start()
+    try:
+        sharded = await _run(supervisor.analyze, readings, concurrency=8 * workers)
+    finally:
+        await supervisor.stop()
+    print(f"{workers} shard workers:   {count / sharded:8.1f} readings/s ({single / sharded:.2f}x, {os.cpu_count()} cores)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--locations", type=int, default=200)
+    parser.add_argument("--vnodes", type=int, default=64)
+    parser.add_argument("--readings", type=int, default=400)
+    parser.add_argument("--model-latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    ring_balance(args.workers, args.locations, args.vnodes)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Shared SQLite stores (sharding requires USAGE_BACKEND=sqlite) in a scratch directory
+        os.environ.update(
+            {
+                "RESULTS_DB_PATH": os.path.join(tmp, "results.db"),
+                "USAGE_DB_PATH": os.path.join(tmp, "usage.db"),
+                "USAGE_BACKEND": "sqlite",
+                "DAILY_API_LIMIT": "1000000000",
+                "ADAPTIVE_CADENCE_ENABLED": "false",
+                "VISUAL_CACHE_ENABLED": "false",
+                "LOG_LEVEL": "WARNING",
+            }
+        )
+        from utils.logging_config import configure_logging
+
+        configure_logging()
+        asyncio.run(throughput(args.workers, args.locations, args.readings, args.model_latency_ms))
+
+
+if __name__ == "__main__":
+    main()
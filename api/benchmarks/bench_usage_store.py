@@ -0,0 +1,91 @@
+"""
+Admission throughput with several workers sharing the SQLite usage store.
+
+Each worker process runs its own SharedRateLimiter against one database file
+(as uvicorn workers or pods on a shared volume would) and admits requests as
+fast as it can. The run checks that no increment is lost and that the daily
+cap is never exceeded.
+
+Usage (from api/):
+    python -m benchmarks.bench_usage_store --workers 8 --requests 5000
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+from utils.rate_limiter import SharedRateLimiter
+from utils.usage_store import SQLiteUsageStore
+
+
+def _worker(db_path: str, requests: int, limit: int, batch: int, start, out) -> None:
+    limiter = SharedRateLimiter(store=SQLiteUsageStore(db_path), daily_limit=limit, reserve_batch=batch)
+    start.wait()
+    admitted = 0
+    t0 = time.perf_counter()
+    for _ in range(requests):
+        if limiter.try_acquire()["allowed"]:
+            admitted += 1
+    limiter.flush()
+    out.put((admitted, time.perf_counter() - t0))
+
+
+def run(workers: int, requests: int, limit: int, batch: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "usage.db")
+        SQLiteUsageStore(db_path).close()  # create schema / WAL before the race
+
+        start = mp.Event()
+        out: mp.Queue = mp.Queue()
+        procs = [
+            mp.Process(target=_worker, args=(db_path, requests, limit, batch, start, out))
+            for _ in range(workers)
+        ]
+        for p in procs:
+            p.start()
+        t0 = time.perf_counter()
+        start.set()
+        results = [out.get() for _ in procs]
+        wall = time.perf_counter() - t0
+        for p in procs:
+            p.join()
+
+        admitted = sum(a for a, _ in results)
+        stored = SQLiteUsageStore(db_path).get(SharedRateLimiter.CALLS_KEY)
+
+    demand = workers * requests
+    return {
+        "workers": workers,
+        "batch": batch,
+        "demand": demand,
+        "limit": limit,
+        "admitted": admitted,
+        "stored": stored,
+        "wall_s": wall,
+        "admissions_per_s": demand / wall,
+        "ok": admitted == stored == min(demand, limit),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=5000, help="admission attempts per worker")
+    args = parser.parse_args()
+
+    demand = args.workers * args.requests
+    print(f"{'batch':>5} {'limit':>8} {'admitted':>9} {'stored':>8} {'wall ms':>9} {'adm/s':>10}  ok")
+    for limit in (demand * 2, demand // 2):
+        for batch in (1, 8):
+            r = run(args.workers, args.requests, limit, batch)
+            print(
+                f"{r['batch']:>5} {r['limit']:>8} {r['admitted']:>9} {r['stored']:>8} "
+                f"{r['wall_s'] * 1000:>9.1f} {r['admissions_per_s']:>10,.0f}  {r['ok']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
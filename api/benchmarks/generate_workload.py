@@ -0,0 +1,419 @@
+"""
+Synthetic workload generator: sensor history, analysis scenarios and camera images.
+
+Writes, in the formats the services read (point them at the output with
+SENSOR_HISTORY_PATH, or copy the files over mock_data/):
+
+  sensor_readings.json   {timestamp, location, temperature, humidity, co2, soilMoisture}
+                         per reading for --sections sections over --days days
+  data.json              --scenarios scenarios like mock_data/data.json (incl.
+                         pager alerts and burst `frames`)
+  images/*.jpeg          --images plant images over a grid of blur radii and
+                         darkness levels (plant_blur<r>_dark<pct>_<n>.jpeg)
+  manifest.json          parameters, counts and the image grid
+
+Each section has its own diurnal temperature/humidity/CO2 cycle, an irrigation
+sawtooth on soil moisture, slow sensor drift, sensor dropouts (null values for a
+stretch of readings) and heat-spike events. Readings are generated in chunks of
+whole days by a process pool; each chunk writes its rows to a part file and the
+parts are streamed into one JSON array. Every chunk, scenario and image is
+seeded from (--seed, its index), so the output is identical for any --workers.
+
+Usage (from api/):
+    python -m benchmarks.generate_workload --sections 100 --days 120 --scenarios 5000 --images 400
+    # 100 sections x 120 days at 5-minute intervals = 3.46M readings
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+API_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_OUT = API_DIR / "mock_data" / "generated"
+
+# Seed stream tags (independent random streams per kind of object)
+_PROFILE, _CHUNK, _DAY, _SCENARIO, _IMAGE = range(5)
+ROWS_PER_SECTION = 4
+# Readings per part file (rounded to whole days)
+CHUNK_READINGS = 100_000
+
+# Scenario categories and their share of --scenarios
+CATEGORIES = (
+    ("normal", 0.55),
+    ("heat_spike", 0.10),
+    ("cold_night", 0.05),
+    ("dry_soil", 0.08),
+    ("high_co2", 0.05),
+    ("sensor_dropout", 0.07),
+    ("blurry_image", 0.05),
+    ("dark_image", 0.05),
+)
+
+
+@dataclass(frozen=True)
+class Settings:
+    start: str
+    sections: int
+    days: int
+    interval_minutes: int
+    dropout_rate: float
+    spike_rate: float
+    drift: float
+    blur_levels: Tuple[float, ...]
+    dark_levels: Tuple[float, ...]
+    seed: int
+
+
+@dataclass(frozen=True)
+class SectionProfile:
+    base_temp: float
+    temp_amplitude: float
+    base_humidity: float
+    night_co2: float
+    irrigation_hours: float
+    irrigation_phase: float
+    drift_days: Tuple[float, float, float]
+    drift_phase: Tuple[float, float, float]
+
+
+def _rng(seed: int, *keys: int) -> np.random.Generator:
+    return np.random.default_rng([seed, *keys])
+
+
+def section_name(index: int) -> Tuple[str, str]:
+    """(location, camera_id) in the mock_data style: "Section C - Row 2", "CAM-C2"."""
+    block, row = divmod(index, ROWS_PER_SECTION)
+    letters = ""
+    block += 1
+    while block:
+        block, rem = divmod(block - 1, 26)
+        letters = chr(65 + rem) + letters
+    return f"Section {letters} - Row {row + 1}", f"CAM-{letters}{row + 1}"
+
+
+def section_profile(settings: Settings, index: int) -> SectionProfile:
+    rng = _rng(settings.seed, _PROFILE, index)
+    return SectionProfile(
+        base_temp=rng.uniform(21, 25),
+        temp_amplitude=rng.uniform(3, 6),
+        base_humidity=rng.uniform(58, 72),
+        night_co2=rng.uniform(600, 900),
+        irrigation_hours=rng.uniform(8, 16),
+        irrigation_phase=rng.uniform(0, 1),
+        drift_days=tuple(rng.uniform(10, 40, 3)),
+        drift_phase=tuple(rng.uniform(0, 2 * math.pi, 3)),
+    )
+
+
+def baseline(profile: SectionProfile, minutes: np.ndarray, drift: float) -> Dict[str, np.ndarray]:
+    """Noise-free readings at `minutes` since the start (diurnal cycles, irrigation, drift)."""
+    hour = (minutes / 60) % 24
+    # Peak warmth around 14:00, daylight roughly 06:00-20:00
+    diurnal = np.cos((hour - 14) / 24 * 2 * np.pi)
+    daylight = np.clip(np.sin((hour - 6) / 14 * np.pi), 0, None)
+    days = minutes / 1440
+    temp_drift, humidity_drift, co2_drift = (
+        drift * scale * np.sin(2 * np.pi * days / period + phase)
+        for scale, period, phase in zip((1.0, 3.0, 40.0), profile.drift_days, profile.drift_phase)
+    )
+    irrigation = (minutes / 60 / profile.irrigation_hours + profile.irrigation_phase) % 1
+    return {
+        "temperature": profile.base_temp + profile.temp_amplitude * diurnal + temp_drift,
+        "humidity": profile.base_humidity - 8 * diurnal + humidity_drift,
+        # Photosynthesis draws CO2 down during the day
+        "co2": profile.night_co2 - (profile.night_co2 - 410) * daylight + co2_drift,
+        "soilMoisture": 62 - 22 * irrigation,
+    }
+
+
+def _apply_day_events(settings: Settings, section: int, day: int, values: Dict[str, np.ndarray], lo: int) -> int:
+    """Heat spike and sensor dropouts for one day (rows lo..lo+per_day); returns the number of spikes."""
+    per_day = 1440 // settings.interval_minutes
+    rng = _rng(settings.seed, _DAY, section, day)
+    spikes = 0
+    if rng.random() < settings.spike_rate:
+        start = int(rng.uniform(10, 17) * 60 // settings.interval_minutes)
+        length = max(2, int(rng.uniform(30, 150) // settings.interval_minutes))
+        peak = rng.uniform(6, 12)
+        bump = peak * np.sin(np.linspace(0, np.pi, length))
+        end = min(per_day, start + length)
+        values["temperature"][lo + start : lo + end] += bump[: end - start]
+        values["humidity"][lo + start : lo + end] -= 1.5 * bump[: end - start]
+        spikes = 1
+    for column in values:
+        for _ in range(rng.poisson(settings.dropout_rate * 24)):
+            start = int(rng.integers(0, per_day))
+            length = int(rng.integers(1, 37))
+            values[column][lo + start : lo + min(per_day, start + length)] = np.nan
+    return spikes
+
+
+def _format(values: np.ndarray, digits: int) -> List[str]:
+    return ["null" if v != v else f"{v:.{digits}f}" for v in values.tolist()]
+
+
+def write_readings_chunk(settings: Settings, section: int, day0: int, days: int, path: str) -> Tuple[int, int]:
+    """Rows for `days` days of one section as comma-separated JSON objects (no brackets)."""
+    per_day = 1440 // settings.interval_minutes
+    minutes = (np.arange(days * per_day) + day0 * per_day) * settings.interval_minutes
+    values = baseline(section_profile(settings, section), minutes.astype(float), settings.drift)
+
+    rng = _rng(settings.seed, _CHUNK, section, day0)
+    for column, sigma in (("temperature", 0.3), ("humidity", 1.2), ("co2", 12.0), ("soilMoisture", 0.6)):
+        values[column] += rng.normal(0, sigma, minutes.size)
+    values["humidity"] = np.clip(values["humidity"], 5, 100)
+    values["soilMoisture"] = np.clip(values["soilMoisture"], 0, 100)
+
+    spikes = sum(_apply_day_events(settings, section, day0 + d, values, d * per_day) for d in range(days))
+
+    start = np.datetime64(settings.start.replace("Z", ""), "m")
+    stamps = np.datetime_as_string(start + minutes.astype("timedelta64[m]"), unit="s")
+    location, _ = section_name(section)
+    prefix = '{"timestamp":"'
+    middle = f'Z","location":{json.dumps(location)},"temperature":'
+    with open(path, "w") as f:
+        f.write(
+            ",\n".join(
+                f'{prefix}{ts}{middle}{t},"humidity":{h},"co2":{c},"soilMoisture":{s}}}'
+                for ts, t, h, c, s in zip(
+                    stamps,
+                    _format(values["temperature"], 2),
+                    _format(values["humidity"], 1),
+                    _format(values["co2"], 0),
+                    _format(values["soilMoisture"], 1),
+                )
+            )
+        )
+    return minutes.size, spikes
+
+
+def image_name(blur: float, dark: float, index: int) -> str:
+    return f"plant_blur{blur:g}_dark{round(dark * 100):02d}_{index:04d}.jpeg"
+
+
+def image_grid(settings: Settings, count: int) -> List[Tuple[float, float, str]]:
+    """(blur radius, darkness, file name) for `count` images, cycling through the level grid."""
+    combos = [(b, d) for b in settings.blur_levels for d in settings.dark_levels]
+    return [(*combos[i % len(combos)], image_name(*combos[i % len(combos)], i)) for i in range(count)]
+
+
+def write_images(settings: Settings, items: Sequence[Tuple[int, float, float, str]], directory: str) -> int:
+    """Leafy plant images; blur = Gaussian radius in px, darkness = fraction of brightness removed."""
+    from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+
+    for index, blur, dark, name in items:
+        rng = _rng(settings.seed, _IMAGE, index)
+        img = Image.new("RGB", (640, 480), tuple(int(v) for v in rng.integers(50, 90, 3) * (1, 0.8, 0.5)))
+        draw = ImageDraw.Draw(img)
+        hue_shift = rng.uniform(-30, 30)  # greener or yellower plants
+        for _ in range(int(rng.integers(150, 250))):
+            x, y = rng.uniform(-40, 640), rng.uniform(-40, 480)
+            w, h = rng.uniform(20, 80), rng.uniform(10, 35)
+            green = int(rng.uniform(110, 200))
+            color = (int(np.clip(rng.uniform(30, 90) + hue_shift * 2, 0, 255)), green, int(rng.uniform(20, 70)))
+            draw.ellipse((x, y, x + w, y + h), fill=color, outline=(20, 60, 20))
+            draw.line((x + 4, y + h / 2, x + w - 4, y + h / 2), fill=(200, 230, 170), width=1)
+        if blur:
+            img = img.filter(ImageFilter.GaussianBlur(radius=blur))
+        if dark:
+            img = ImageEnhance.Brightness(img).enhance(1 - dark)
+        img.save(os.path.join(directory, name), "JPEG", quality=85)
+    return len(items)
+
+
+def _pick(rng: np.random.Generator, names: List[str]) -> str:
+    return names[int(rng.integers(0, len(names)))] if names else None
+
+
+def write_scenarios(settings: Settings, count: int, images: List[Tuple[float, float, str]], path: str) -> int:
+    """data.json-style scenarios: a section's baseline at a random time plus the category's condition."""
+    weights = np.array([w for _, w in CATEGORIES])
+    clean = [n for b, d, n in images if b == min(settings.blur_levels) and d == min(settings.dark_levels)]
+    blurry = [n for b, _, n in images if b == max(settings.blur_levels)]
+    dark = [n for _, d, n in images if d == max(settings.dark_levels)]
+    start = datetime.fromisoformat(settings.start.replace("Z", "+00:00"))
+    span = settings.days * 1440
+
+    scenarios = []
+    for i in range(count):
+        rng = _rng(settings.seed, _SCENARIO, i)
+        category = CATEGORIES[int(rng.choice(len(CATEGORIES), p=weights / weights.sum()))][0]
+        section = int(rng.integers(0, settings.sections))
+        minute = int(rng.integers(0, span)) // settings.interval_minutes * settings.interval_minutes
+        profile = section_profile(settings, section)
+        base = {k: float(v[0]) for k, v in baseline(profile, np.array([float(minute)]), settings.drift).items()}
+        location, camera_id = section_name(section)
+        ts = start + timedelta(minutes=minute)
+        scenario = {
+            "id": f"analysis_{i + 1}",
+            "timestamp": ts.isoformat().replace("+00:00", "Z"),
+            "location": location,
+            "camera_id": camera_id,
+            "temperature": round(base["temperature"] + rng.normal(0, 0.3), 1),
+            "humidity": round(base["humidity"] + rng.normal(0, 1), 1),
+            "co2": round(base["co2"] + rng.normal(0, 10)),
+            "soilMoisture": round(base["soilMoisture"] + rng.normal(0, 0.5), 1),
+            "image": _pick(rng, clean),
+        }
+        if category == "heat_spike":
+            scenario["temperature"] = round(base["temperature"] + rng.uniform(8, 14), 1)
+            scenario["humidity"] = round(scenario["humidity"] - rng.uniform(10, 18), 1)
+            scenario["note"] = "Heat spike"
+            if scenario["temperature"] >= 36:
+                scenario["pagerAlert"] = {
+                    "triggered": True,
+                    "reason": f"Critical temperature detected ({scenario['temperature']}°C)",
+                    "sentAt": (ts + timedelta(seconds=5)).isoformat().replace("+00:00", "Z"),
+                }
+        elif category == "cold_night":
+            scenario["temperature"] = round(rng.uniform(9, 14), 1)
+            scenario["note"] = "Heating failure overnight"
+        elif category == "dry_soil":
+            scenario["soilMoisture"] = round(rng.uniform(12, 25), 1)
+            scenario["note"] = "Irrigation missed"
+        elif category == "high_co2":
+            scenario["co2"] = round(rng.uniform(1500, 2500))
+            scenario["note"] = "CO2 dosing stuck open"
+        elif category == "sensor_dropout":
+            for key in rng.choice(["temperature", "humidity", "co2", "soilMoisture"], int(rng.integers(1, 3)), replace=False):
+                scenario[str(key)] = None
+            scenario["note"] = "Sensor dropout"
+        elif category == "blurry_image":
+            scenario["image"] = _pick(rng, blurry)
+            scenario["note"] = "Camera out of focus"
+        elif category == "dark_image":
+            scenario["image"] = _pick(rng, dark)
+            scenario["note"] = "Grow lights off"
+        if scenario["image"] and rng.random() < 0.05:
+            # Burst capture: the analyzer scores the frames and keeps the best usable one
+            scenario["frames"] = [scenario["image"], _pick(rng, blurry), _pick(rng, dark)]
+        scenarios.append(scenario)
+
+    with open(path, "w") as f:
+        json.dump(scenarios, f, ensure_ascii=False, indent=1)
+    return count
+
+
+def merge_parts(parts: Sequence[str], path: Path) -> None:
+    """Concatenate the part files into one JSON array (streamed, never held in memory)."""
+    with open(path, "wb") as out:
+        out.write(b"[\n")
+        first = True
+        for part in parts:
+            if os.path.getsize(part) == 0:
+                continue
+            if not first:
+                out.write(b",\n")
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out, 1 << 20)
+            first = False
+        out.write(b"\n]\n")
+
+
+def _levels(text: str) -> Tuple[float, ...]:
+    return tuple(sorted(float(v) for v in text.split(",")))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=str(DEFAULT_OUT))
+    parser.add_argument("--sections", type=int, default=40)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--interval-minutes", type=int, default=5, help="must divide 1440")
+    parser.add_argument("--start", default="2025-01-01T00:00:00Z")
+    parser.add_argument("--dropout-rate", type=float, default=0.01, help="dropout episodes per sensor per hour")
+    parser.add_argument("--spike-rate", type=float, default=0.05, help="heat-spike probability per section-day")
+    parser.add_argument("--drift", type=float, default=0.8, help="temperature drift amplitude in C")
+    parser.add_argument("--scenarios", type=int, default=2000)
+    parser.add_argument("--images", type=int, default=100)
+    parser.add_argument("--blur-levels", default="0,1,3", help="Gaussian blur radii in px")
+    parser.add_argument("--dark-levels", default="0,0.6,0.9", help="fractions of brightness removed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if 1440 % args.interval_minutes:
+        parser.error("--interval-minutes must divide 1440")
+
+    settings = Settings(
+        start=args.start,
+        sections=args.sections,
+        days=args.days,
+        interval_minutes=args.interval_minutes,
+        dropout_rate=args.dropout_rate,
+        spike_rate=args.spike_rate,
+        drift=args.drift,
+        blur_levels=_levels(args.blur_levels),
+        dark_levels=_levels(args.dark_levels),
+        seed=args.seed,
+    )
+    out = Path(args.out)
+    parts_dir = out / "sensor_readings.parts"
+    images_dir = out / "images"
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    images_dir.mkdir(parents=True, exist_ok=True)
+
+    per_day = 1440 // settings.interval_minutes
+    chunk_days = max(1, CHUNK_READINGS // per_day)
+    chunks = [
+        (section, day0, min(chunk_days, settings.days - day0))
+        for section in range(settings.sections)
+        for day0 in range(0, settings.days, chunk_days)
+    ]
+    parts = [str(parts_dir / f"part-{i:05d}.json") for i in range(len(chunks))]
+    images = image_grid(settings, args.images)
+    image_batches = [
+        [(i, *images[i]) for i in range(lo, min(lo + 25, len(images)))] for lo in range(0, len(images), 25)
+    ]
+
+    t0 = time.perf_counter()
+    readings = spikes = written_images = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(write_readings_chunk, settings, *chunk, part) for chunk, part in zip(chunks, parts)]
+        futures += [pool.submit(write_images, settings, batch, str(images_dir)) for batch in image_batches]
+        scenarios = pool.submit(write_scenarios, settings, args.scenarios, images, str(out / "data.json"))
+        for future in as_completed(futures):
+            result = future.result()
+            if isinstance(result, tuple):
+                readings += result[0]
+                spikes += result[1]
+            else:
+                written_images += result
+        scenarios.result()
+    generated_s = time.perf_counter() - t0
+
+    merge_parts(parts, out / "sensor_readings.json")
+    shutil.rmtree(parts_dir)
+    total_s = time.perf_counter() - t0
+
+    manifest = {
+        "settings": asdict(settings),
+        "readings": readings,
+        "heatSpikes": spikes,
+        "scenarios": args.scenarios,
+        "images": [{"file": name, "blur": blur, "darkness": dark} for blur, dark, name in images],
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+    }
+    (out / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+    size_mb = (out / "sensor_readings.json").stat().st_size / 1e6
+    print(f"{readings:,} readings ({size_mb:.0f} MB, {spikes} heat spikes) for {settings.sections} sections")
+    print(f"{args.scenarios:,} scenarios, {written_images} images ({len(settings.blur_levels)}x{len(settings.dark_levels)} blur/darkness grid)")
+    print(
+        f"{args.workers} workers: generated in {generated_s:.1f}s ({readings / generated_s:,.0f} readings/s), "
+        f"merged in {total_s - generated_s:.1f}s -> {out}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Benchmark suite for the analysis hot paths, with saved results and a regression check.
+
+Cases:
+  context_24h[history=N]        get_24h_context over a synthetic N-reading history
+  validate_image[<file>]        ValidationService.validate_image_bytes, mock_data/images
+  fallback_analysis             ValidationService.get_fallback_analysis (rule engine)
+  rate_limiter_roundtrip        RateLimiter.try_acquire + release
+  cost_tracker_record           CostTracker.record (batched flushes included)
+  e2e_analyze[sensors|image]    POST /api/analyze through the app with a stubbed model
+
+Every case runs in isolation: the limiter, cost tracker, results store and
+history live in a temporary directory, so the repo's state files are not
+touched. The stub model answers with a valid structured reply after
+--model-latency-ms (0 by default: the numbers are the app's own overhead).
+
+Results are written as JSON (per case: median/p95/mean/min in microseconds,
+plus run metadata). `compare` checks a run against a baseline and exits 1 when
+a case's median got slower by more than --threshold (default 25%), e.g. before
+a release:
+
+Usage (from api/):
+    python -m benchmarks.suite run --out benchmarks/results/baseline.json
+    python -m benchmarks.suite run --baseline benchmarks/results/baseline.json
+    python -m benchmarks.suite compare benchmarks/results/baseline.json benchmarks/results/<run>.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from statistics import mean, median, quantiles
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+API_DIR = Path(__file__).resolve().parent.parent
+IMAGES = API_DIR / "mock_data" / "images"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+HISTORY_SIZES = (1_000, 10_000, 100_000)
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+# (case name, function to time, calls)
+Case = Tuple[str, Callable[[], object], int]
+
+
+def measure(fn: Callable[[], object], calls: int, warmup: int = 3) -> dict:
+    """Per-call wall time statistics in microseconds."""
+    for _ in range(min(warmup, calls)):
+        fn()
+    times = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1e6)
+    return {
+        "calls": calls,
+        "median_us": round(median(times), 2),
+        "p95_us": round(quantiles(times, n=20)[18], 2) if calls >= 20 else round(max(times), 2),
+        "mean_us": round(mean(times), 2),
+        "min_us": round(min(times), 2),
+    }
+
+
+def _write_history(path: Path, n: int) -> None:
+    """5-minute readings with a diurnal temperature cycle (some outside the alert band)."""
+    rows = []
+    for i in range(n):
+        ts = START + timedelta(minutes=5 * i)
+        hour = ts.hour + ts.minute / 60
+        temp = 24 + 8 * (1 - abs(hour - 14) / 12) * (1 if i % 97 else 1.6) - 4
+        rows.append({"timestamp": ts.isoformat().replace("+00:00", "Z"), "temperature": round(temp, 2), "humidity": 60})
+    path.write_text(json.dumps(rows))
+
+
+def context_cases(tmp: Path, scale: float) -> Iterator[Case]:
+    from services.context_service import get_24h_context
+
+    for size in HISTORY_SIZES:
+        path = tmp / f"history_{size}.json"
+        _write_history(path, size)
+        os.environ["SENSOR_HISTORY_PATH"] = str(path)
+        at = START + timedelta(minutes=5 * (size // 2))
+        get_24h_context(at)  # load + parse once; the case measures the cached path
+        yield f"context_24h[history={size}]", lambda at=at: get_24h_context(at), max(5, int(200 * scale))
+    os.environ.pop("SENSOR_HISTORY_PATH", None)
+
+
+def image_cases(tmp: Path, scale: float) -> Iterator[Case]:
+    from services.validator import ValidationService
+
+    for path in sorted(IMAGES.glob("*.jp*g")):
+        data = path.read_bytes()
+        yield f"validate_image[{path.name}]", lambda data=data: ValidationService.validate_image_bytes(data), max(
+            5, int(50 * scale)
+        )
+
+
+def _sensors(**overrides):
+    from models.schemas import SensorData
+
+    values = {"timestamp": "2025-01-15T10:00:00Z", "temperature": 24.5, "humidity": 65, "co2": 450, "soilMoisture": 45}
+    values.update(overrides)
+    return SensorData.model_validate(values)
+
+
+def rules_cases(tmp: Path, scale: float) -> Iterator[Case]:
+    from services.validator import ValidationService
+
+    sensors = _sensors(temperature=31.0, humidity=82)
+    yield "fallback_analysis", lambda: ValidationService.get_fallback_analysis(sensors), max(20, int(5000 * scale))
+
+
+def accounting_cases(tmp: Path, scale: float) -> Iterator[Case]:
+    from utils.cost_tracker import CostTracker
+    from utils.rate_limiter import RateLimiter
+
+    limiter = RateLimiter(daily_limit=10**9, usage_file=str(tmp / "rate_limit_data.json"))
+
+    def roundtrip() -> None:
+        limiter.try_acquire(section="greenhouse-A")
+        limiter.release(section="greenhouse-A")
+
+    tracker = CostTracker(batch_size=20)
+    tracker.state_file = str(tmp / "cost_state.json")
+    calls = max(20, int(5000 * scale))
+    yield "rate_limiter_roundtrip", roundtrip, calls
+    yield "cost_tracker_record", lambda: tracker.record("gpt-5-nano", 3200, 90, 1024), calls
+
+
+class _StubCompletions:
+    """Stands in for `client.chat.completions`: a valid structured reply after a fixed delay."""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.content = json.dumps(
+            {
+                "status": "normal",
+                "confidence": 0.86,
+                "reasoning": "Readings are within the crop profile and the foliage looks healthy.",
+                "primary_concern": None,
+                "visual_assessment": "Healthy green foliage",
+                "signals_agree": True,
+                "recommended_action": "No action needed",
+            }
+        )
+
+    async def create(self, **request):
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        return SimpleNamespace(
+            model=request["model"],
+            choices=[
+                SimpleNamespace(
+                    message=SimpleNamespace(content=self.content, refusal=None),
+                    finish_reason="stop",
+                )
+            ],
+            usage=SimpleNamespace(
+                prompt_tokens=3200,
+                completion_tokens=90,
+                total_tokens=3290,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=1024),
+            ),
+        )
+
+
+def e2e_cases(tmp: Path, scale: float, model_latency_ms: float) -> Iterator[Case]:
+    os.environ.update(
+        {
+            "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY") or "bench-stub",
+            "RESULTS_DB_PATH": str(tmp / "results.db"),
+            "WARMUP_ENABLED": "false",
+            "PROFILE_ENABLED": "false",
+            "LOOP_LAG_MONITOR_ENABLED": "false",
+        }
+    )
+    from fastapi.testclient import TestClient
+
+    from main import app
+    from services import openai_service
+    from utils import cost_tracker, rate_limiter
+
+    service = openai_service.OpenAIService()
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=_StubCompletions(model_latency_ms / 1000)))
+    openai_service._service = service
+    rate_limiter._limiter = rate_limiter.RateLimiter(daily_limit=10**9, usage_file=str(tmp / "rate_limit_data.json"))
+    tracker = cost_tracker.CostTracker()
+    tracker.state_file = str(tmp / "cost_state.json")
+    cost_tracker._tracker = tracker
+
+    sensor_data = json.dumps(
+        {"timestamp": "2025-01-15T10:00:00Z", "temperature": 24.5, "humidity": 65, "co2": 450, "soilMoisture": 45}
+    )
+    image = (IMAGES / "healthy_plant.jpeg").read_bytes()
+    calls = max(5, int(100 * scale))
+
+    with TestClient(app) as client:
+
+        def post(files=None):
+            response = client.post("/api/analyze", data={"sensor_data": sensor_data}, files=files)
+            if response.status_code != 200:
+                raise RuntimeError(f"/api/analyze returned {response.status_code}: {response.text[:200]}")
+
+        yield "e2e_analyze[sensors]", post, calls
+        yield "e2e_analyze[image]", lambda: post({"image": ("plant.jpeg", image, "image/jpeg")}), calls
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR, capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run(scale: float, only: Optional[List[str]], model_latency_ms: float) -> dict:
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory(prefix="greenhouse-bench-") as tmp_dir:
+        tmp = Path(tmp_dir)
+        groups = [
+            context_cases(tmp, scale),
+            image_cases(tmp, scale),
+            rules_cases(tmp, scale),
+            accounting_cases(tmp, scale),
+            e2e_cases(tmp, scale, model_latency_ms),
+        ]
+        for group in groups:
+            for name, fn, calls in group:
+                if only and not any(name.startswith(prefix) for prefix in only):
+                    continue
+                results[name] = measure(fn, calls)
+                print(f"{name:<46} {results[name]['median_us']:>12.1f} {results[name]['p95_us']:>12.1f}", flush=True)
+    return {
+        "meta": {
+            "createdAt": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "scale": scale,
+            "modelLatencyMs": model_latency_ms,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """Print a comparison table; returns the cases whose median regressed beyond `threshold`."""
+    regressions = []
+    print(f"{'case':<46} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for name, base in baseline["results"].items():
+        now = current["results"].get(name)
+        if now is None:
+            print(f"{name:<46} {base['median_us']:>12.1f} {'missing':>12}")
+            continue
+        change = now["median_us"] / base["median_us"] - 1 if base["median_us"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<46} {base['median_us']:>12.1f} {now['median_us']:>12.1f} {change:>+7.0%}{flag}")
+    return regressions
+
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the suite and save the results")
+    run_parser.add_argument("--out", help="results file (default: benchmarks/results/<timestamp>.json)")
+    run_parser.add_argument("--scale", type=float, default=1.0, help="multiply the number of calls per case")
+    run_parser.add_argument("--only", help="comma-separated case name prefixes")
+    run_parser.add_argument("--model-latency-ms", type=float, default=0.0, help="stub model response delay")
+    run_parser.add_argument("--baseline", help="compare against this results file and exit 1 on regression")
+    run_parser.add_argument("--threshold", type=float, default=0.25, help="allowed median slowdown (0.25 = 25%%)")
+
+    compare_parser = commands.add_parser("compare", help="compare two saved results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.25, help="allowed median slowdown (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        regressions = compare(_load(args.baseline), _load(args.current), args.threshold)
+    else:
+        # The app logs every analysis at INFO; keep the suite's output readable
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        print(f"{'case':<46} {'median us':>12} {'p95 us':>12}")
+        results = run(args.scale, args.only.split(",") if args.only else None, args.model_latency_ms)
+        out = Path(args.out) if args.out else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(results, indent=2))
+        print(f"saved {out}")
+        regressions = compare(_load(args.baseline), results, args.threshold) if args.baseline else []
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,67 @@
+import asyncio
 import os
 import logging
 import sys
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from importlib import metadata
 from pathlib import Path
 
 from dotenv import load_dotenv
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from routes.analysis import router as analysis_router
+from routes.images import router as images_router
+from routes.shards import router as shards_router
+from services.job_queue import get_job_queue
+from services.shard_workers import get_shard_supervisor
+from services.warmup import get_readiness, warm_up
+from utils.cost_tracker import get_cost_tracker
 from utils.logging_config import configure_logging
+from utils.metrics import CONTENT_TYPE, render_latest
+from utils.profiling import RequestProfilerMiddleware, get_loop_monitor, get_profile_ring
+from utils.rate_limiter import get_rate_limiter, run_periodic_flush
+from utils.results_store import get_results_store
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Location-sharded worker processes (SHARD_WORKERS > 0); first, so a bad config
+    # (ValueError / ShardUnavailable) fails start-up before any other task is running
+    shards = get_shard_supervisor()
+    await shards.start()
+    # Load stores, history, codecs and the OpenAI client off the event loop; /ready flips when done
+    warmup = asyncio.create_task(asyncio.to_thread(warm_up, get_readiness()))
+    # Write-behind persistence for in-memory usage counters
+    flusher = asyncio.create_task(run_periodic_flush(extra_flushers=(lambda: get_results_store().flush(),)))
+    # Worker pool for /api/analyze/jobs
+    jobs = get_job_queue()
+    jobs.start()
+    # Event-loop stall detection (records the handler that blocked the loop)
+    lag_monitor = asyncio.create_task(get_loop_monitor().run())
+    try:
+        yield
+    finally:
+        await warmup
+        await jobs.stop()
+        await shards.stop()
+        lag_monitor.cancel()
+        flusher.cancel()
+        get_rate_limiter().flush()
+        get_cost_tracker().flush()
+        get_results_store().flush()
+
+
+@lru_cache(maxsize=1)
+def _openai_sdk_version():
+    # Package metadata only; importing the SDK here would cost ~0.5s on the first probe
+    try:
+        return metadata.version("openai")
+    except metadata.PackageNotFoundError:
+        return None
 
 
 def create_app() -> FastAPI:
@@ -19,6 +71,7 @@ def create_app() -> FastAPI:
     app = FastAPI(
         title="Greenhouse Monitor API",
         version="0.1.0",
+        lifespan=lifespan,
     )
 
     allowed_origins = [
@@ -33,29 +86,49 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # Opt-in: sampled cProfile runs + slow-request capture (see utils/profiling.py)
+    profiling = os.getenv("PROFILE_ENABLED", "false").lower() == "true"
+    if profiling:
+        app.add_middleware(RequestProfilerMiddleware, monitor=get_loop_monitor())
+
     # Mount static files for images
     mock_data_path = Path(__file__).parent / "mock_data"
     app.mount("/api/mock_data", StaticFiles(directory=str(mock_data_path)), name="mock_data")
 
     app.include_router(analysis_router)
+    app.include_router(images_router)
+    app.include_router(shards_router)
 
     @app.get("/health")
     async def health() -> dict:
-        try:
-            import openai  # type: ignore
-
-            openai_version = getattr(openai, "__version__", None)
-        except Exception:
-            openai_version = None
-
         return {
             "status": "ok",
             "openaiConfigured": bool(os.getenv("OPENAI_API_KEY")),
             "openaiModel": os.getenv("OPENAI_MODEL", "gpt-5-nano"),
-            "openaiSdkVersion": openai_version,
+            "openaiSdkVersion": _openai_sdk_version(),
             "pythonVersion": sys.version.split(" ")[0],
         }
 
+    @app.get("/ready")
+    async def ready():
+        """Readiness probe: 503 until the startup warm-up has finished."""
+        state = get_readiness().snapshot()
+        return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Stage latencies, cache hits, fallbacks and limiter rejections (Prometheus format)."""
+        return PlainTextResponse(render_latest(), media_type=CONTENT_TYPE)
+
+    @app.get("/debug/profiling", include_in_schema=False)
+    async def profiling_status() -> dict:
+        """Event-loop lag/stalls and the request captures currently in the profile ring."""
+        return {
+            "loopLag": get_loop_monitor().snapshot(),
+            "profiling": profiling,
+            "captures": get_profile_ring().list() if profiling else [],
+        }
+
     logging.getLogger(__name__).info("app_started")
     return app
 
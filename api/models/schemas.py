@@ -1,3 +1,4 @@
+import os
 from datetime import datetime
 from typing import Literal, Optional
 
@@ -14,6 +15,10 @@ class SensorData(BaseModel):
     Supported aliases for resilience:
     - temp -> temperature
     - soil_moisture -> soilMoisture
+
+    Optional metadata (used for per-section history and baselines):
+    - location, camera_id / cameraId
+    - pagerAlert (bool or the pager record from data.json)
     """
 
     model_config = {"populate_by_name": True}
@@ -45,6 +50,30 @@ class SensorData(BaseModel):
         validation_alias=AliasChoices("soilMoisture", "soil_moisture"),
         description="Soil moisture percentage",
     )
+    location: Optional[str] = Field(
+        default=None,
+        max_length=120,
+        description="Greenhouse section/row the reading belongs to",
+    )
+    camera_id: Optional[str] = Field(
+        default=None,
+        max_length=64,
+        validation_alias=AliasChoices("camera_id", "cameraId"),
+        description="Camera covering the section",
+    )
+    pager_alert: bool = Field(
+        default=False,
+        validation_alias=AliasChoices("pagerAlert", "pager_alert"),
+        description="Reading already paged an operator (jumps the analysis queue)",
+    )
+
+    @field_validator("pager_alert", mode="before")
+    @classmethod
+    def _pager_alert_flag(cls, v):
+        # data.json carries the full pager record; only `triggered` matters here
+        if isinstance(v, dict):
+            return bool(v.get("triggered"))
+        return False if v is None else v
 
 
 class AnalysisResult(BaseModel):
@@ -70,3 +99,32 @@ class AnalysisResult(BaseModel):
 
     tokens_used: int = Field(default=0, alias="tokensUsed")
     cost: str = Field(default="0.000000")
+
+    id: Optional[str] = Field(default=None, description="Stored result id (GET /api/analysis/{id}).")
+
+
+# (field name, response key, field info) in declaration order
+_RESULT_FIELDS = [(name, field.alias or name, field) for name, field in AnalysisResult.model_fields.items()]
+
+
+def analysis_result_payload(result: dict) -> dict:
+    """
+    `AnalysisResult` response fields (by alias) for a result built by the pipeline.
+
+    Pipeline results come from schema-validated model output or the rule/fallback
+    builders, so they are not validated again here; RESPONSE_VALIDATION=true
+    restores full validation (e.g. while changing those builders).
+    """
+    if os.getenv("RESPONSE_VALIDATION", "false").lower() == "true":
+        return AnalysisResult.model_validate(result).model_dump(by_alias=True)
+    payload = {}
+    for name, key, field in _RESULT_FIELDS:
+        if name in result:
+            value = result[name]
+        elif key in result:
+            value = result[key]
+        else:
+            value = field.get_default(call_default_factory=True)
+        payload[key] = value
+    payload["confidence"] = float(payload["confidence"])
+    return payload
@@ -2,35 +2,40 @@ from __future__ import annotations
 
 import json
 import logging
-from typing import Optional
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
-from pydantic import ValidationError
+from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, ValidationError
 
-from models.schemas import AnalysisResult, SensorData
-from services.context_service import get_24h_context
+from models.schemas import AnalysisResult, SensorData, analysis_result_payload
+from services.analysis_cascade import get_cascade
+from services.analysis_pipeline import BatchItem, image_quality_result
+from services.anomaly_detector import get_detector
+from services.budget_controller import get_budget_controller
+from services.cadence_scheduler import get_scheduler
+from services.frame_selector import Frame, FrameSelector, best_rejection_reason
+from services.image_variants import get_image_variants
+from services.job_queue import AnalysisJob, QueueFull, get_job_queue
 from services.mock_analyzer import get_analyzer
-from services.openai_service import OpenAIService
+from services.shard_workers import ShardUnavailable, analyze_batch_sharded, analyze_sharded
+from services.structured_output import parse_stats
 from services.validator import ValidationService
-from utils.cost_tracker import CostTracker
-from utils.rate_limiter import RateLimiter
+from services.visual_cache import get_visual_cache
+from utils.cost_tracker import get_cost_tracker
+from utils.fast_json import FastJSONResponse, dumps, join_array
+from utils.metrics import stage
+from utils.rate_limiter import get_rate_limiter
+from utils.results_store import get_results_store
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["analysis"])
 
 
-def _force_uncertain_if_low_confidence(result: dict) -> dict:
-    try:
-        conf = float(result.get("confidence", 0.0))
-    except Exception:
-        conf = 0.0
-
-    if conf < 0.3:
-        result["status"] = "uncertain"
-    return result
-
-
 # NEW: Mock data analysis endpoints
 @router.post("/start-analysis")
 async def start_analysis():
@@ -44,7 +49,78 @@ async def start_analysis():
 async def get_analysis_status():
     """Get current analysis progress and results"""
     analyzer = get_analyzer()
-    return analyzer.get_status()
+    return FastJSONResponse(analyzer.status_body())
+
+
+@router.get("/cascade/stats")
+async def get_cascade_stats():
+    """How many readings each cascade tier resolved and what the model was spared"""
+    return get_cascade().stats()
+
+
+@router.get("/anomaly/baselines")
+async def get_anomaly_baselines():
+    """Current online EWMA baselines per location and sensor"""
+    return get_detector().snapshot()
+
+
+@router.get("/schedule")
+async def get_schedule():
+    """Per-section adaptive analysis intervals within the daily AI budget"""
+    scheduler = get_scheduler()
+    return {
+        "enabled": scheduler.enabled,
+        "dailyBudget": scheduler.daily_budget,
+        "sections": scheduler.schedule(),
+    }
+
+
+@router.get("/visual/cache")
+async def get_visual_cache_state():
+    """Cached per-camera visual assessments and how many image calls they saved"""
+    return get_visual_cache().snapshot()
+
+
+@router.get("/usage")
+async def get_usage():
+    """Today's token/cost totals, budget admission level and daily call limit"""
+    return {
+        "cost": get_cost_tracker().snapshot(),
+        "budget": get_budget_controller().status(),
+        "limit": get_rate_limiter().check_limit(),
+        "outputParsing": parse_stats.snapshot(),
+    }
+
+
+@router.get("/analyses")
+async def list_analyses(
+    since: Optional[datetime] = Query(None, description="Only results at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only results before this time"),
+    location: Optional[str] = None,
+    status: Optional[Literal["normal", "potential_anomaly", "uncertain"]] = None,
+    camera_id: Optional[str] = None,
+    pager_only: bool = False,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page"),
+):
+    """Stored analysis results, newest first, with keyset pagination"""
+    try:
+        page = get_results_store().query(
+            since=since,
+            until=until,
+            location=location,
+            status=status,
+            camera_id=camera_id,
+            pager_only=pager_only,
+            limit=limit,
+            cursor=cursor,
+            raw=True,
+        )
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+    # Stored payloads are already JSON; splice them in instead of decoding and re-encoding
+    items = join_array(payload.encode("utf-8") for payload in page["items"])
+    return FastJSONResponse(b'{"items":' + items + b',"nextCursor":' + dumps(page["nextCursor"]) + b"}")
 
 
 @router.get("/analysis/{analysis_id}")
@@ -55,15 +131,42 @@ async def get_analysis_detail(analysis_id: str):
     
     if result is None:
         raise HTTPException(status_code=404, detail=f"Analysis {analysis_id} not found")
-    
-    return result
+
+    # Versioned (immutable-cacheable) variant URLs so the dashboard never loads the full JPEG
+    if result.get("image"):
+        variants = get_image_variants()
+        result = {
+            **result,
+            "imageUrl": variants.url_for(result["image"], 640),
+            "imageSrcSet": variants.srcset(result["image"]),
+        }
+    return FastJSONResponse(result)
+
+
+_SENSOR_LIST = TypeAdapter(List[SensorData])
+_IMAGES_DIR = Path(__file__).resolve().parent.parent / "mock_data" / "images"
+
+
+def _parse_sensor_data(sensor_data: str) -> SensorData:
+    # Parse + validate sensor JSON
+    try:
+        with stage("json_parse"):
+            payload = json.loads(sensor_data)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=422, detail=f"sensor_data must be valid JSON: {str(e)}")
+
+    try:
+        with stage("validation"):
+            return SensorData.model_validate(payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
 
 
 @router.post("/analyze", response_model=AnalysisResult)
 async def analyze(
     sensor_data: str = Form(..., description="JSON string containing sensor data"),
     image: Optional[UploadFile] = File(None, description="Optional plant image (JPG/PNG)"),
-) -> AnalysisResult:
+):
     """
     Multi-modal analysis endpoint: sensors + optional image.
 
@@ -72,112 +175,205 @@ async def analyze(
     - Enforces daily limit (144/day) with graceful fallback rules
     - Uses OpenAI model when available
     """
-    # Parse + validate sensor JSON
+    sensors = _parse_sensor_data(sensor_data)
+
+    image_bytes: Optional[bytes] = None
+    image_mime: Optional[str] = None
+    if image is not None:
+        with stage("image_read"):
+            image_bytes = await image.read()
+        image_mime = image.content_type
+
     try:
-        payload = json.loads(sensor_data)
+        result = await analyze_sharded(sensors, image_bytes=image_bytes, image_mime=image_mime)
+    except ValueError as e:
+        # Missing API key or configuration
+        raise HTTPException(status_code=400, detail=str(e))
+    except ShardUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    with stage("response_model"):
+        return FastJSONResponse(analysis_result_payload(result))
+
+
+@router.post("/analyze/batch")
+async def analyze_batch_endpoint(
+    readings: str = Form(..., description="JSON list of sensor readings"),
+    images: Optional[List[UploadFile]] = File(None, description="Images referenced by readings[].image"),
+):
+    """
+    Analyze many readings in one request.
+
+    Each reading may carry `image`: the filename of one of the uploaded `images`
+    parts, or the name of a file in mock_data/images. Readings are validated in
+    bulk; invalid items are reported without failing the batch. Results and
+    errors come back in input order.
+    """
+    try:
+        with stage("json_parse"):
+            payload = json.loads(readings)
     except json.JSONDecodeError as e:
-        raise HTTPException(status_code=422, detail=f"sensor_data must be valid JSON: {str(e)}")
+        raise HTTPException(status_code=422, detail=f"readings must be valid JSON: {str(e)}")
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=422, detail="readings must be a JSON list")
+    max_items = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+    if len(payload) > max_items:
+        raise HTTPException(status_code=422, detail=f"Too many readings in batch (max {max_items})")
+
+    uploads = {}
+    with stage("image_read"):
+        for upload in images or []:
+            uploads[upload.filename] = (await upload.read(), upload.content_type)
 
+    # Bulk validation; fall back to per-item only to attribute errors
+    items = [BatchItem() for _ in payload]
     try:
-        sensors = SensorData.model_validate(payload)
+        with stage("validation"):
+            validated = _SENSOR_LIST.validate_python(payload)
+        for item, sensors in zip(items, validated):
+            item.sensors = sensors
     except ValidationError as e:
-        raise HTTPException(status_code=422, detail=e.errors())
+        errors = {}
+        for err in e.errors():
+            if err["loc"] and isinstance(err["loc"][0], int):
+                errors.setdefault(err["loc"][0], []).append({**err, "loc": err["loc"][1:]})
+        for i, item in enumerate(items):
+            if i in errors:
+                item.error = errors[i]
+            else:
+                item.sensors = SensorData.model_validate(payload[i])
 
-    # Build historical context
-    ctx = get_24h_context(sensors.timestamp)
-    historical = {"avgTemp": ctx.avgTemp, "trend": ctx.trend, "alerts": ctx.alerts}
+    for item, raw in zip(items, payload):
+        ref = raw.get("image") if isinstance(raw, dict) else None
+        if item.error is not None or not ref:
+            continue
+        if ref in uploads:
+            item.image_bytes, item.image_mime = uploads[ref]
+            continue
+        path = _IMAGES_DIR / Path(str(ref)).name
+        if path.is_file():
+            item.image_bytes = path.read_bytes()
+            item.image_mime = "image/png" if path.suffix.lower() == ".png" else "image/jpeg"
+        else:
+            item.error = f"Image reference not found: {ref}"
 
-    # Validate sensor completeness per assessment rule
-    sensors_ok_for_ai, sensor_issue = ValidationService.validate_sensor_data(sensors)
-    if not sensors_ok_for_ai:
-        result = {
-            "status": "uncertain",
-            "confidence": 0.1,
-            "reasoning": sensor_issue or "Insufficient sensor data for reliable analysis",
-            "visual_assessment": None,
-            "signals_agree": None,
-            "primary_concern": None,
-            "recommended_action": "Restore missing sensors and re-run analysis",
-            "timestamp": sensors.timestamp,
-            "tokensUsed": 0,
-            "cost": "0.000000",
-        }
-        return AnalysisResult.model_validate(result)
+    entries = await analyze_batch_sharded(items)
+    for entry in entries:
+        if entry["ok"]:
+            entry["result"] = analysis_result_payload(entry["result"])
+    succeeded = sum(1 for entry in entries if entry["ok"])
+    return FastJSONResponse(
+        {"count": len(entries), "succeeded": succeeded, "failed": len(entries) - succeeded, "items": entries}
+    )
+
+
+@router.post("/analyze/burst", response_model=AnalysisResult)
+async def analyze_burst(
+    sensor_data: str = Form(..., description="JSON string containing sensor data"),
+    camera_id: str = Form("unknown", description="Camera that captured the burst"),
+    frames: List[UploadFile] = File(..., description="Burst of plant images (JPG/PNG)"),
+):
+    """
+    Burst analysis endpoint: sensors + several frames from one camera.
+
+    Every frame is scored for sharpness/exposure; only the best usable frame is
+    sent to the model. If no frame is usable the reading is marked 'uncertain'
+    without spending an AI call.
+    """
+    sensors = _parse_sensor_data(sensor_data)
+
+    selector = FrameSelector()
+    if len(frames) > selector.max_frames:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Too many frames in burst (max {selector.max_frames})",
+        )
+
+    for upload in frames:
+        selector.add(
+            Frame(
+                camera_id=camera_id,
+                image_bytes=await upload.read(),
+                mime_type=upload.content_type,
+                name=upload.filename,
+            )
+        )
+
+    best, scores = selector.flush(camera_id)
+
+    # Sensor completeness is checked inside the pipeline; only short-circuit on images here.
+    sensors_ok_for_ai, _ = ValidationService.validate_sensor_data(sensors)
+    if best is None and sensors_ok_for_ai:
+        return FastJSONResponse(
+            analysis_result_payload(image_quality_result(sensors, best_rejection_reason(scores)))
+        )
+
+    # The frame is chosen here; the reading is analyzed on its location's shard like /api/analyze
+    try:
+        result = await analyze_sharded(
+            sensors,
+            image_bytes=best.frame.image_bytes if best else None,
+            image_mime=best.frame.mime_type if best else None,
+            image_validated=True,
+            image_phash=best.quality.phash if best else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ShardUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return FastJSONResponse(analysis_result_payload(result))
+
+
+@router.post("/analyze/jobs", status_code=202)
+async def submit_analysis_job(
+    sensor_data: str = Form(..., description="JSON string containing sensor data"),
+    image: Optional[UploadFile] = File(None, description="Optional plant image (JPG/PNG)"),
+):
+    """
+    Asynchronous variant of /api/analyze.
+
+    Validates the input, queues the job and returns 202 with a job id right away;
+    poll GET /api/analyze/jobs/{job_id} for the result. Answers 429 with
+    Retry-After when the queue is full.
+    """
+    sensors = _parse_sensor_data(sensor_data)
 
     image_bytes: Optional[bytes] = None
     image_mime: Optional[str] = None
-
     if image is not None:
         image_bytes = await image.read()
         image_mime = image.content_type
+        max_bytes = int(float(os.getenv("MAX_IMAGE_SIZE_MB", "10")) * 1024 * 1024)
+        if len(image_bytes) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Image exceeds {max_bytes // (1024 * 1024)}MB")
 
-        image_ok, image_issue = ValidationService.validate_image_bytes(image_bytes)
-        if not image_ok:
-            # Per requirements: blurry/dark/obstructed => uncertain (not a hard 422)
-            result = {
-                "status": "uncertain",
-                "confidence": 0.2,
-                "reasoning": f"Image quality issue: {image_issue}",
-                "visual_assessment": None,
-                "signals_agree": None,
-                "primary_concern": "visual",
-                "recommended_action": "Retake photo with better lighting/focus",
-                "timestamp": sensors.timestamp,
-                "tokensUsed": 0,
-                "cost": "0.000000",
-            }
-            return AnalysisResult.model_validate(result)
-
-    # Rate limiting (graceful fallback)
-    limiter = RateLimiter(daily_limit=144)
-    limit = limiter.check_limit()
-    if not limit.get("allowed", True):
-        logger.info("rate_limit_exceeded", extra=limit)
-        fallback = ValidationService.get_fallback_analysis(sensors)
-        fallback["reasoning"] = f"AI skipped (rate limit); {fallback.get('reasoning', '')}".strip()
-        fallback["timestamp"] = sensors.timestamp
-        return AnalysisResult.model_validate(_force_uncertain_if_low_confidence(fallback))
-
-    # Use OpenAI
     try:
-        service = OpenAIService()
-        ai_result = await service.analyze_greenhouse(
-            sensor_data={
-                "timestamp": sensors.timestamp.isoformat(),
-                "temperature": sensors.temperature,
-                "humidity": sensors.humidity,
-                "co2": sensors.co2,
-                "soil_moisture": sensors.soil_moisture,
-            },
-            historical=historical,
-            image_bytes=image_bytes,
-            image_mime_type=image_mime,
+        job = get_job_queue().submit(AnalysisJob(sensors, image_bytes, image_mime))
+    except QueueFull as e:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(e.retry_after)},
         )
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {**job.to_dict(), "statusUrl": f"/api/analyze/jobs/{job.id}"}
 
-        ai_result = _force_uncertain_if_low_confidence(ai_result)
-        ai_result["timestamp"] = sensors.timestamp
-
-        # Track usage
-        limiter.increment()
-        CostTracker().add(int(ai_result.get("tokensUsed", 0) or 0))
-
-        logger.info(
-            "analysis_completed",
-            extra={
-                "status": ai_result.get("status"),
-                "confidence": ai_result.get("confidence"),
-                "tokensUsed": ai_result.get("tokensUsed"),
-                "hasImage": bool(image_bytes),
-            },
-        )
-        return AnalysisResult.model_validate(ai_result)
 
-    except ValueError as e:
-        # Missing API key or configuration
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        logger.exception("analysis_ai_failed_fallback", extra={"error": str(e)})
-        fallback = ValidationService.get_fallback_analysis(sensors)
-        fallback["reasoning"] = f"AI unavailable; {fallback.get('reasoning', '')}".strip()
-        fallback["timestamp"] = sensors.timestamp
-        return AnalysisResult.model_validate(_force_uncertain_if_low_confidence(fallback))
+@router.get("/analyze/jobs/stats")
+async def get_job_stats():
+    """Worker pool, queue depth and job counts by state"""
+    return get_job_queue().stats()
+
+
+@router.get("/analyze/jobs/{job_id}")
+async def get_analysis_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=30, description="Long-poll up to this many seconds for completion"),
+):
+    """Job status; the AnalysisResult is included once the job has completed"""
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    await queue.wait(job, wait)
+    return FastJSONResponse(job.to_dict())
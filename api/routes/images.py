@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
+
+from services.image_variants import ImageNotFound, get_image_variants
+
+router = APIRouter(prefix="/api", tags=["images"])
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Unversioned URLs must revalidate, but a matching ETag costs only a 304
+REVALIDATE = "public, no-cache"
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+@router.get("/images/{name}")
+async def get_image(
+    name: str,
+    request: Request,
+    w: Optional[int] = Query(None, ge=16, le=4096, description="Target width (rounded up to a cached size)"),
+    fmt: Literal["auto", "webp", "jpeg", "original"] = Query("auto"),
+    v: Optional[str] = Query(None, description="Content hash; versioned URLs are cached as immutable"),
+):
+    """
+    Camera image, optionally resized/re-encoded.
+
+    Variants are generated once and cached on disk by content hash. Responses
+    carry a strong ETag (304 on If-None-Match) and, when `v` matches the current
+    content hash, `Cache-Control: immutable` for a year. `fmt=auto` picks WebP
+    when the client accepts it. Files are sent with FileResponse, which uses
+    zero-copy `http.response.pathsend` on servers that support it.
+    """
+    vary = None
+    if fmt == "auto":
+        fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+        vary = "Accept"
+
+    variants = get_image_variants()
+    try:
+        variant = await variants.get(name, w, fmt)
+    except ImageNotFound:
+        raise HTTPException(status_code=404, detail=f"Image {name} not found")
+
+    headers = {
+        "ETag": variant.etag,
+        "Cache-Control": IMMUTABLE if v == variant.content_hash[:16] else REVALIDATE,
+    }
+    if vary:
+        headers["Vary"] = vary
+    if _etag_matches(request.headers.get("if-none-match"), variant.etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(variant.path, media_type=variant.media_type, headers=headers)
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, HTTPException
+
+from services.shard_workers import get_shard_supervisor
+
+router = APIRouter(prefix="/api", tags=["shards"])
+
+
+@router.get("/shards")
+async def shards_status():
+    """Shard workers: per-worker counters, location ownership, rebalances and recent results"""
+    supervisor = get_shard_supervisor()
+    if not supervisor.running:
+        return {"enabled": supervisor.enabled, "workers": [], "ring": None}
+    return await supervisor.status()
+
+
+@router.post("/shards", status_code=201)
+async def add_shard():
+    """Start one more worker; the locations it now owns move to it with their state"""
+    supervisor = get_shard_supervisor()
+    if not supervisor.running:
+        raise HTTPException(status_code=409, detail="Sharding is disabled (SHARD_WORKERS=0)")
+    return {"shardId": await supervisor.add_worker()}
+
+
+@router.delete("/shards/{shard_id}")
+async def remove_shard(shard_id: str):
+    """Hand a worker's locations to the others, then stop it"""
+    supervisor = get_shard_supervisor()
+    try:
+        await supervisor.remove_worker(shard_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Shard {shard_id} not found")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"removed": shard_id}
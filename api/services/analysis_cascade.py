@@ -0,0 +1,208 @@
+"""
+Tiered analysis cascade.
+
+Cheap deterministic checks decide clear cases locally and only ambiguous readings
+are escalated to the model:
+
+- rules tier:   threshold breaches far past the limit -> local `potential_anomaly`
+- context tier: all sensors comfortably in range + stable 24h history + no online
+                anomaly (|z| below CASCADE_Z_ESCALATE) -> local `normal`
+- model tier:   anything borderline, trending, anomalous, previously alerting, or with an image
+"""
+from __future__ import annotations
+
+import logging
+import os
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from models.schemas import SensorData
+from services.rule_engine import RuleEngine, get_rule_engine
+
+logger = logging.getLogger(__name__)
+
+TIER_RULES = "rules"
+TIER_CONTEXT = "context"
+TIER_MODEL = "model"
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class CascadeConfig:
+    enabled: bool = True
+    # Relative distance to a threshold (e.g. 0.10 = 10% of the limit) treated as borderline.
+    margin: float = 0.10
+    # Local decisions below this confidence are escalated instead.
+    min_confidence: float = 0.85
+    resolve_clear_anomalies: bool = True
+    # Online anomaly |z| at or above this always goes to the model.
+    z_escalate: float = 3.0
+    # Token estimate for a sensor-only model call until real calls have been observed.
+    est_tokens_per_call: int = 600
+
+    @classmethod
+    def from_env(cls) -> "CascadeConfig":
+        return cls(
+            enabled=_env_bool("CASCADE_ENABLED", "true"),
+            margin=float(os.getenv("CASCADE_MARGIN", "0.10")),
+            min_confidence=float(os.getenv("CASCADE_MIN_CONFIDENCE", "0.85")),
+            resolve_clear_anomalies=_env_bool("CASCADE_RESOLVE_ANOMALIES", "true"),
+            z_escalate=float(os.getenv("CASCADE_Z_ESCALATE", "3.0")),
+            est_tokens_per_call=int(os.getenv("CASCADE_EST_TOKENS", "600")),
+        )
+
+
+@dataclass(frozen=True)
+class CascadeDecision:
+    tier: str
+    confidence: float
+    reason: str
+    result: Optional[dict] = None
+
+    @property
+    def escalate(self) -> bool:
+        return self.result is None
+
+
+class AnalysisCascade:
+    """Decide readings locally where possible and count what the model was spared."""
+
+    def __init__(self, config: Optional[CascadeConfig] = None, engine: Optional[RuleEngine] = None):
+        self.config = config or CascadeConfig.from_env()
+        self.engine = engine or get_rule_engine()
+        self.resolved = Counter()
+        self.escalations = Counter()
+        self.model_calls = 0
+        self.sensor_only_calls = 0
+        self.sensor_only_tokens = 0
+        self.tokens_saved = 0
+
+    def _headroom(self, sensors: SensorData, zone: Optional[str]) -> list[tuple[str, float]]:
+        """
+        Signed relative distance to each threshold: >0 inside the limit, <0 past it.
+        """
+        out = []
+        for rule in self.engine.compile(zone=zone).rules:
+            value = getattr(sensors, rule.field)
+            if value is None:
+                continue
+            scale = abs(rule.value) or 1.0
+            if rule.bound == "max":
+                out.append((rule.field, (rule.value - value) / scale))
+            else:
+                out.append((rule.field, (value - rule.value) / scale))
+        return out
+
+    def _escalate(self, reason: str, confidence: float = 0.0) -> CascadeDecision:
+        self.escalations[reason] += 1
+        return CascadeDecision(tier=TIER_MODEL, confidence=confidence, reason=reason)
+
+    def _resolve(self, tier: str, confidence: float, reason: str, result: dict) -> CascadeDecision:
+        result["confidence"] = round(confidence, 2)
+        result["reasoning"] = f"Resolved locally ({tier} tier); {result.get('reasoning', '')}".strip()
+        self.resolved[tier] += 1
+        self.tokens_saved += self.avg_tokens_per_call
+        return CascadeDecision(tier=tier, confidence=result["confidence"], reason=reason, result=result)
+
+    @property
+    def avg_tokens_per_call(self) -> int:
+        if self.sensor_only_calls:
+            return round(self.sensor_only_tokens / self.sensor_only_calls)
+        return self.config.est_tokens_per_call
+
+    def decide(
+        self,
+        sensors: SensorData,
+        historical: dict,
+        has_image: bool = False,
+        zone: Optional[str] = None,
+    ) -> CascadeDecision:
+        """
+        Run the cheap tiers for a complete sensor reading.
+
+        Returns:
+            CascadeDecision; `result` is an `AnalysisResult`-compatible dict when the
+            reading was decided locally, None when it must go to the model.
+        """
+        if not self.config.enabled:
+            return self._escalate("cascade_disabled")
+        if has_image:
+            return self._escalate("has_image")
+
+        margin = self.config.margin
+        headroom = self._headroom(sensors, zone)
+        worst = min((h for _, h in headroom), default=None)
+        if worst is None:
+            return self._escalate("no_rules")
+
+        # Rules tier: every breach is clearly past its limit -> decide locally.
+        if worst < 0:
+            if not self.config.resolve_clear_anomalies:
+                return self._escalate("breach")
+            breaches = [h for _, h in headroom if h < 0]
+            if any(-h < 2 * margin for h in breaches):
+                return self._escalate("borderline_breach")
+            # Confidence grows with how far past the limit the mildest breach is, in
+            # margins: 0.875 at the 2-margin floor up to 0.95 from 4 margins out.
+            overshoot = min(-h for h in breaches)
+            confidence = min(0.95, 0.80 + 0.15 * min(1.0, overshoot / (4 * margin)))
+            if confidence < self.config.min_confidence:
+                return self._escalate("low_confidence", confidence)
+            result = self.engine.evaluate(sensors, zone=zone)
+            return self._resolve(TIER_RULES, confidence, "clear_breach", result)
+
+        if worst < margin:
+            return self._escalate("borderline")
+
+        # Context tier: in range with comfortable headroom; require a quiet history.
+        trend = historical.get("trend")
+        if trend != "stable":
+            return self._escalate(f"trend_{trend or 'unknown'}")
+        if int(historical.get("alerts") or 0) > 0:
+            return self._escalate("recent_alerts")
+        max_abs_z = (historical.get("anomaly") or {}).get("maxAbsZ")
+        if max_abs_z is not None and max_abs_z >= self.config.z_escalate:
+            return self._escalate("anomaly_z")
+
+        confidence = min(0.95, 0.80 + 0.15 * min(1.0, worst / (3 * margin)))
+        if confidence < self.config.min_confidence:
+            return self._escalate("low_confidence", confidence)
+        result = self.engine.evaluate(sensors, zone=zone)
+        return self._resolve(TIER_CONTEXT, confidence, "in_range_stable", result)
+
+    def record_model_call(self, tokens: int, has_image: bool = False) -> None:
+        """Feed real usage back so savings are estimated from observed sensor-only calls."""
+        self.model_calls += 1
+        if not has_image:
+            self.sensor_only_calls += 1
+            self.sensor_only_tokens += int(tokens or 0)
+
+    def stats(self) -> dict:
+        resolved_locally = sum(self.resolved.values())
+        return {
+            "enabled": self.config.enabled,
+            "resolvedByTier": {
+                TIER_RULES: self.resolved[TIER_RULES],
+                TIER_CONTEXT: self.resolved[TIER_CONTEXT],
+                TIER_MODEL: self.model_calls,
+            },
+            "escalationReasons": dict(self.escalations),
+            "modelCallsSaved": resolved_locally,
+            "tokensSaved": self.tokens_saved,
+            "avgTokensPerSensorOnlyCall": self.avg_tokens_per_call,
+        }
+
+
+_cascade: Optional[AnalysisCascade] = None
+
+
+def get_cascade() -> AnalysisCascade:
+    """Get global cascade instance (counters are process-wide)"""
+    global _cascade
+    if _cascade is None:
+        _cascade = AnalysisCascade()
+    return _cascade
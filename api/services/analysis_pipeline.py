@@ -0,0 +1,385 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+from models.schemas import SensorData
+from services.analysis_cascade import get_cascade
+from services.anomaly_detector import get_detector
+from services.budget_controller import LEVEL_COMPACT, LEVEL_NO_IMAGE, LEVEL_RULES, get_budget_controller
+from services.cadence_scheduler import get_scheduler
+from services.context_service import HistoricalContext, get_24h_context, get_24h_contexts
+from services.openai_service import ModelUnavailable, OpenAIService, get_openai_service
+from services.prompt_builder import PromptBudgetExceeded
+from services.validator import ValidationService
+from services.visual_cache import get_visual_cache
+from utils.cost_tracker import get_cost_tracker
+from utils.metrics import FALLBACKS, LIMITER_REJECTIONS, cache_lookup, stage
+from utils.rate_limiter import get_rate_limiter
+from utils.results_store import get_results_store
+
+logger = logging.getLogger(__name__)
+
+
+def force_uncertain_if_low_confidence(result: dict) -> dict:
+    try:
+        conf = float(result.get("confidence", 0.0))
+    except Exception:
+        conf = 0.0
+
+    if conf < 0.3:
+        result["status"] = "uncertain"
+    return result
+
+
+def image_quality_result(sensors: SensorData, image_issue: Optional[str]) -> dict:
+    """Per requirements: blurry/dark/obstructed => uncertain (not a hard 422)."""
+    return {
+        "status": "uncertain",
+        "confidence": 0.2,
+        "reasoning": f"Image quality issue: {image_issue}",
+        "visual_assessment": None,
+        "signals_agree": None,
+        "primary_concern": "visual",
+        "recommended_action": "Retake photo with better lighting/focus",
+        "timestamp": sensors.timestamp,
+        "tokensUsed": 0,
+        "cost": "0.000000",
+    }
+
+
+async def analyze_reading(
+    sensors: SensorData,
+    image_bytes: Optional[bytes] = None,
+    image_mime: Optional[str] = None,
+    image_validated: bool = False,
+    location: Optional[str] = None,
+    image_phash: Optional[int] = None,
+    context: Optional[HistoricalContext] = None,
+    service: Optional[OpenAIService] = None,
+) -> dict:
+    """
+    Run one validated sensor reading (+ optional image) through the analysis pipeline.
+
+    - Checks sensor completeness and image quality before spending an AI call
+    - Reuses the camera's cached visual assessment while the image is unchanged
+    - Decides clear sensor-only cases locally via the analysis cascade
+    - Defers model calls for sections that are not due under the adaptive cadence
+    - Degrades model work as the daily USD budget runs low (no image -> compact -> rules)
+    - Enforces the daily limit with graceful rule-based fallback
+    - Tracks usage/cost for successful AI calls
+    - Persists every result to the results store (batched)
+
+    `context` and `service` let batch callers pass a precomputed 24h context and a
+    shared client instead of rebuilding them per reading.
+
+    Raises:
+        ValueError: missing OpenAI configuration (callers map this to a 400)
+
+    Returns:
+        dict compatible with `AnalysisResult`
+    """
+    location = location or sensors.location
+    with stage("pipeline"):
+        result = await _run_pipeline(
+            sensors,
+            image_bytes=image_bytes,
+            image_mime=image_mime,
+            image_validated=image_validated,
+            location=location,
+            image_phash=image_phash,
+            context=context,
+            service=service,
+        )
+    # Returned to the caller so it can fetch the stored result (GET /api/analysis/{id})
+    result.setdefault("id", uuid.uuid4().hex)
+    with stage("result_persist"):
+        get_results_store().add(
+            {
+                **result,
+                "location": location,
+                "camera_id": sensors.camera_id,
+                "sensorData": {
+                    "temperature": sensors.temperature,
+                    "humidity": sensors.humidity,
+                    "co2": sensors.co2,
+                    "soilMoisture": sensors.soil_moisture,
+                },
+                "pagerAlert": sensors.pager_alert,
+            }
+        )
+    return result
+
+
+async def _run_pipeline(
+    sensors: SensorData,
+    image_bytes: Optional[bytes] = None,
+    image_mime: Optional[str] = None,
+    image_validated: bool = False,
+    location: Optional[str] = None,
+    image_phash: Optional[int] = None,
+    context: Optional[HistoricalContext] = None,
+    service: Optional[OpenAIService] = None,
+) -> dict:
+    # Build historical context
+    ctx = context
+    if ctx is None:
+        with stage("context"):
+            ctx = get_24h_context(sensors.timestamp)
+    historical = {"avgTemp": ctx.avgTemp, "trend": ctx.trend, "alerts": ctx.alerts}
+
+    # Online anomaly scores (O(1) per reading; baselines updated as readings arrive)
+    anomaly = get_detector().update(location, sensors.timestamp, sensors)
+    historical["anomaly"] = anomaly.to_context()
+
+    scheduler = get_scheduler()
+    if location:
+        scheduler.observe(location, sensors.timestamp, sensors, anomaly.max_abs_z)
+
+    # Validate sensor completeness per assessment rule
+    sensors_ok_for_ai, sensor_issue = ValidationService.validate_sensor_data(sensors)
+    if not sensors_ok_for_ai:
+        FALLBACKS.inc("sensor_incomplete")
+        return {
+            "status": "uncertain",
+            "confidence": 0.1,
+            "reasoning": sensor_issue or "Insufficient sensor data for reliable analysis",
+            "visual_assessment": None,
+            "signals_agree": None,
+            "primary_concern": None,
+            "recommended_action": "Restore missing sensors and re-run analysis",
+            "timestamp": sensors.timestamp,
+            "tokensUsed": 0,
+            "cost": "0.000000",
+        }
+
+    if image_bytes is not None and not image_validated:
+        with stage("image_validation"):
+            quality = ValidationService.assess_image_bytes(image_bytes)
+        if not quality.ok:
+            FALLBACKS.inc("image_quality")
+            return image_quality_result(sensors, quality.issue)
+        image_phash = quality.phash
+
+    # Vision/sensor decoupling: an unchanged image within the staleness window is not
+    # re-sent; the camera's last assessment goes to the model as text instead.
+    visual = get_visual_cache()
+    camera_id = sensors.camera_id if visual.enabled else None
+    cached_visual = None
+    if camera_id and image_bytes is not None:
+        if image_phash is None:
+            image_phash = ValidationService.image_phash(image_bytes)
+        cached_visual = visual.reuse_for_image(camera_id, image_phash, sensors.timestamp)
+        cache_lookup("visual", cached_visual is not None)
+        if cached_visual is not None:
+            image_bytes, image_mime = None, None
+    elif camera_id:
+        cached_visual = visual.fresh(camera_id, sensors.timestamp)
+        cache_lookup("visual_text", cached_visual is not None)
+    if cached_visual is not None:
+        historical["visualAssessment"] = cached_visual.to_context(sensors.timestamp)
+
+    # Cheap tiers first: only ambiguous readings (or readings with images) reach the model
+    cascade = get_cascade()
+    decision = cascade.decide(sensors, historical, has_image=image_bytes is not None, zone=location)
+    if not decision.escalate:
+        FALLBACKS.inc("cascade_local")
+        logger.info(
+            "analysis_resolved_locally",
+            extra={"tier": decision.tier, "reason": decision.reason, "confidence": decision.confidence},
+        )
+        result = decision.result
+        result["timestamp"] = sensors.timestamp
+        if cached_visual is not None and not result.get("visual_assessment"):
+            result["visual_assessment"] = cached_visual.assessment
+        return result
+
+    # Adaptive cadence: spend AI calls on sections that are volatile/anomalous right now
+    if location and scheduler.enabled and not scheduler.is_due(location, sensors.timestamp):
+        next_due = scheduler.next_due(location)
+        FALLBACKS.inc("cadence_deferred")
+        fallback = ValidationService.get_fallback_analysis(sensors, zone=location)
+        fallback["reasoning"] = (
+            f"AI deferred (section not due until {next_due.isoformat() if next_due else 'later'}); "
+            f"{fallback.get('reasoning', '')}"
+        ).strip()
+        fallback["timestamp"] = sensors.timestamp
+        return force_uncertain_if_low_confidence(fallback)
+
+    # Budget-aware admission: shed the expensive parts first instead of hitting a cliff
+    budget = get_budget_controller()
+    level = budget.admission_level() if budget.enabled else None
+    if level == LEVEL_RULES:
+        FALLBACKS.inc("daily_budget")
+        fallback = ValidationService.get_fallback_analysis(sensors, zone=location)
+        fallback["reasoning"] = f"AI skipped (daily budget); {fallback.get('reasoning', '')}".strip()
+        fallback["timestamp"] = sensors.timestamp
+        return force_uncertain_if_low_confidence(fallback)
+    if level in (LEVEL_NO_IMAGE, LEVEL_COMPACT):
+        image_bytes, image_mime = None, None
+
+    # Rate limiting (graceful fallback); reserves the call atomically if allowed
+    limiter = get_rate_limiter()
+    with stage("limiter"):
+        limit = limiter.try_acquire(section=location)
+    if not limit.get("allowed", True):
+        LIMITER_REJECTIONS.inc()
+        FALLBACKS.inc("rate_limit")
+        logger.info("rate_limit_exceeded", extra=limit)
+        fallback = ValidationService.get_fallback_analysis(sensors, zone=location)
+        fallback["reasoning"] = f"AI skipped (rate limit); {fallback.get('reasoning', '')}".strip()
+        fallback["timestamp"] = sensors.timestamp
+        return force_uncertain_if_low_confidence(fallback)
+
+    # Use OpenAI (raises ValueError on missing API key or configuration)
+    if service is None:
+        try:
+            service = get_openai_service()
+        except ValueError:
+            limiter.release(section=location)
+            raise
+
+    try:
+        ai_result = await service.analyze_greenhouse(
+            sensor_data={
+                "timestamp": sensors.timestamp.isoformat(),
+                "temperature": sensors.temperature,
+                "humidity": sensors.humidity,
+                "co2": sensors.co2,
+                "soil_moisture": sensors.soil_moisture,
+            },
+            historical=historical,
+            image_bytes=image_bytes,
+            image_mime_type=image_mime,
+            compact=level == LEVEL_COMPACT,
+        )
+
+        ai_result = force_uncertain_if_low_confidence(ai_result)
+        ai_result["timestamp"] = sensors.timestamp
+        # The prompt builder may have dropped the image to fit the token budget
+        image_sent = bool(ai_result.get("imageSent", image_bytes is not None))
+
+        # Track usage (the limiter slot was reserved above)
+        if ai_result.get("model"):
+            with stage("cost_persist"):
+                cost = get_cost_tracker().record(
+                    ai_result["model"],
+                    int(ai_result.get("promptTokens", 0) or 0),
+                    int(ai_result.get("completionTokens", 0) or 0),
+                    int(ai_result.get("cachedTokens", 0) or 0),
+                )
+                budget.record_spend(cost)
+        cascade.record_model_call(int(ai_result.get("tokensUsed", 0) or 0), has_image=image_sent)
+        if location:
+            scheduler.mark_analyzed(location, sensors.timestamp)
+        if image_sent:
+            visual.store(camera_id, ai_result.get("visual_assessment"), image_phash, sensors.timestamp)
+        elif cached_visual is not None:
+            visual.note_text_reuse()
+            if not ai_result.get("visual_assessment"):
+                ai_result["visual_assessment"] = cached_visual.assessment
+
+        logger.info(
+            "analysis_completed",
+            extra={
+                "status": ai_result.get("status"),
+                "confidence": ai_result.get("confidence"),
+                "tokensUsed": ai_result.get("tokensUsed"),
+                "hasImage": image_sent,
+                "budgetLevel": level,
+            },
+        )
+        return ai_result
+
+    except PromptBudgetExceeded as e:
+        limiter.release(section=location)
+        FALLBACKS.inc("prompt_budget")
+        logger.warning("prompt_over_token_budget", extra={"tokens": e.tokens, "budget": e.budget})
+        fallback = ValidationService.get_fallback_analysis(sensors, zone=location)
+        fallback["reasoning"] = f"AI skipped (prompt over token budget); {fallback.get('reasoning', '')}".strip()
+        fallback["timestamp"] = sensors.timestamp
+        return force_uncertain_if_low_confidence(fallback)
+
+    except ModelUnavailable as e:
+        # Unpaid call: give the slot back and leave the cadence/cascade counters untouched
+        limiter.release(section=location)
+        FALLBACKS.inc("ai_error")
+        logger.warning("analysis_ai_unavailable_fallback", extra={"error": str(e)})
+        fallback = ValidationService.get_fallback_analysis(sensors, zone=location)
+        fallback["reasoning"] = f"AI unavailable; {fallback.get('reasoning', '')}".strip()
+        fallback["timestamp"] = sensors.timestamp
+        return force_uncertain_if_low_confidence(fallback)
+
+    except Exception as e:
+        limiter.release(section=location)
+        FALLBACKS.inc("ai_error")
+        logger.exception("analysis_ai_failed_fallback", extra={"error": str(e)})
+        fallback = ValidationService.get_fallback_analysis(sensors, zone=location)
+        fallback["reasoning"] = f"AI unavailable; {fallback.get('reasoning', '')}".strip()
+        fallback["timestamp"] = sensors.timestamp
+        return force_uncertain_if_low_confidence(fallback)
+
+
+@dataclass
+class BatchItem:
+    """One reading of a batch request; `error` is set when it failed validation."""
+
+    sensors: Optional[SensorData] = None
+    image_bytes: Optional[bytes] = None
+    image_mime: Optional[str] = None
+    error: Optional[object] = None
+
+
+async def analyze_batch(items: Sequence[BatchItem], concurrency: Optional[int] = None) -> List[dict]:
+    """
+    Run many readings through `analyze_reading` with shared setup.
+
+    - 24h contexts for all valid readings come from one history pass
+    - One OpenAI client is shared by every model call in the batch
+    - At most `concurrency` readings (BATCH_CONCURRENCY) are in flight at once
+
+    Returns:
+        one entry per input item, in input order:
+        {"index", "ok": True, "result"} or {"index", "ok": False, "error"}
+    """
+    concurrency = concurrency or int(os.getenv("BATCH_CONCURRENCY", "8"))
+    valid = [i for i, item in enumerate(items) if item.error is None]
+    contexts = dict(zip(valid, get_24h_contexts([items[i].sensors.timestamp for i in valid])))
+
+    try:
+        service: Optional[OpenAIService] = get_openai_service()
+    except ValueError:
+        service = None  # readings that need the model report the config error themselves
+
+    gate = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index: int) -> dict:
+        item = items[index]
+        async with gate:
+            try:
+                result = await analyze_reading(
+                    item.sensors,
+                    image_bytes=item.image_bytes,
+                    image_mime=item.image_mime,
+                    context=contexts[index],
+                    service=service,
+                )
+            except ValueError as e:
+                return {"index": index, "ok": False, "error": str(e)}
+            except Exception as e:
+                logger.exception("batch_item_failed", extra={"index": index})
+                return {"index": index, "ok": False, "error": f"{type(e).__name__}: {e}"}
+        return {"index": index, "ok": True, "result": result}
+
+    done = await asyncio.gather(*(run(i) for i in valid))
+    out: List[Optional[dict]] = [None] * len(items)
+    for entry in done:
+        out[entry["index"]] = entry
+    for i, item in enumerate(items):
+        if item.error is not None:
+            out[i] = {"index": i, "ok": False, "error": item.error}
+    return out  # type: ignore[return-value]
@@ -0,0 +1,248 @@
+"""
+Online per-sensor anomaly detector.
+
+Keeps, per location and sensor, an EWMA mean/variance plus hour-of-day seasonal
+baselines in flat NumPy arrays. Each reading is scored against the state *before*
+it is folded in, so z-scores cost O(1) per reading and never rescan history.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+from models.schemas import SensorData
+from services.rule_engine import FIELDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCATION = "default"
+HOURS = 24
+
+Values = Union[SensorData, Mapping[str, Optional[float]]]
+
+
+@dataclass(frozen=True)
+class AnomalyScores:
+    """z-scores against the running baseline (`z`) and the same hour of day (`hour_z`)."""
+
+    location: str
+    z: Dict[str, Optional[float]]
+    hour_z: Dict[str, Optional[float]]
+
+    @property
+    def max_abs_z(self) -> Optional[float]:
+        scores = [abs(v) for v in (*self.z.values(), *self.hour_z.values()) if v is not None]
+        return max(scores) if scores else None
+
+    def to_context(self) -> dict:
+        """Compact form for prompt context / local triage (warm-up sensors omitted)."""
+        out = {}
+        for name in FIELDS:
+            z, hz = self.z.get(name), self.hour_z.get(name)
+            if z is None and hz is None:
+                continue
+            out[name] = {"z": z, "hourZ": hz}
+        return {"zScores": out, "maxAbsZ": self.max_abs_z}
+
+
+def _values(values: Values) -> Tuple[Optional[float], ...]:
+    if isinstance(values, SensorData):
+        return tuple(getattr(values, f) for f in FIELDS)
+    out = []
+    for f in FIELDS:
+        v = values.get(f)
+        if v is None and f == "soil_moisture":
+            v = values.get("soilMoisture")
+        out.append(None if v is None else float(v))
+    return tuple(out)
+
+
+class AnomalyDetector:
+    """EWMA + hour-of-day baselines for every (location, sensor) pair."""
+
+    def __init__(
+        self,
+        alpha: Optional[float] = None,
+        seasonal_alpha: Optional[float] = None,
+        warmup: Optional[int] = None,
+        seasonal_warmup: Optional[int] = None,
+        capacity: int = 16,
+    ):
+        self.alpha = alpha if alpha is not None else float(os.getenv("ANOMALY_EWMA_ALPHA", "0.1"))
+        self.seasonal_alpha = (
+            seasonal_alpha if seasonal_alpha is not None else float(os.getenv("ANOMALY_SEASONAL_ALPHA", "0.2"))
+        )
+        self.warmup = warmup if warmup is not None else int(os.getenv("ANOMALY_WARMUP", "8"))
+        # Seasonal baselines see one sample per hour per day; a few days are enough.
+        self.seasonal_warmup = (
+            seasonal_warmup if seasonal_warmup is not None else int(os.getenv("ANOMALY_SEASONAL_WARMUP", "3"))
+        )
+        self._index: Dict[str, int] = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        k = len(FIELDS)
+        self.mean = np.zeros((capacity, k))
+        self.var = np.zeros((capacity, k))
+        self.count = np.zeros((capacity, k), dtype=np.int64)
+        self.hour_mean = np.zeros((capacity, HOURS, k))
+        self.hour_var = np.zeros((capacity, HOURS, k))
+        self.hour_count = np.zeros((capacity, HOURS, k), dtype=np.int64)
+
+    def _grow(self) -> None:
+        old = (self.mean, self.var, self.count, self.hour_mean, self.hour_var, self.hour_count)
+        n = old[0].shape[0]
+        self._allocate(n * 2)
+        for new, prev in zip(
+            (self.mean, self.var, self.count, self.hour_mean, self.hour_var, self.hour_count), old
+        ):
+            new[:n] = prev
+
+    def _row(self, location: Optional[str]) -> int:
+        key = location or DEFAULT_LOCATION
+        row = self._index.get(key)
+        if row is None:
+            row = len(self._index)
+            if row >= self.mean.shape[0]:
+                self._grow()
+            self._index[key] = row
+        return row
+
+    @staticmethod
+    def _hour(ts: datetime) -> int:
+        return ts.hour if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc).hour
+
+    @staticmethod
+    def _z(x: float, mean: float, var: float, count: int, warmup: int) -> Optional[float]:
+        if count < warmup:
+            return None
+        # Floor the std so perfectly flat histories don't explode tiny deviations.
+        std = max(math.sqrt(var), 1e-3 * max(abs(mean), 1.0))
+        return round((x - mean) / std, 2)
+
+    @staticmethod
+    def _fold(mean: float, var: float, count: int, x: float, alpha: float) -> Tuple[float, float]:
+        if count == 0:
+            return x, 0.0
+        diff = x - mean
+        incr = alpha * diff
+        return mean + incr, (1.0 - alpha) * (var + diff * incr)
+
+    def score(self, location: Optional[str], timestamp: datetime, values: Values) -> AnomalyScores:
+        """Score a reading without updating the baselines."""
+        return self._process(location, timestamp, values, update=False)
+
+    def update(self, location: Optional[str], timestamp: datetime, values: Values) -> AnomalyScores:
+        """Score a reading against the current baselines, then fold it in."""
+        return self._process(location, timestamp, values, update=True)
+
+    def _process(self, location: Optional[str], timestamp: datetime, values: Values, update: bool) -> AnomalyScores:
+        row = self._row(location)
+        hour = self._hour(timestamp)
+        z: Dict[str, Optional[float]] = {}
+        hour_z: Dict[str, Optional[float]] = {}
+
+        for col, x in enumerate(_values(values)):
+            name = FIELDS[col]
+            if x is None:
+                z[name] = hour_z[name] = None
+                continue
+
+            mean, var, count = float(self.mean[row, col]), float(self.var[row, col]), int(self.count[row, col])
+            hmean = float(self.hour_mean[row, hour, col])
+            hvar = float(self.hour_var[row, hour, col])
+            hcount = int(self.hour_count[row, hour, col])
+
+            z[name] = self._z(x, mean, var, count, self.warmup)
+            hour_z[name] = self._z(x, hmean, hvar, hcount, self.seasonal_warmup)
+
+            if update:
+                self.mean[row, col], self.var[row, col] = self._fold(mean, var, count, x, self.alpha)
+                self.count[row, col] = count + 1
+                self.hour_mean[row, hour, col], self.hour_var[row, hour, col] = self._fold(
+                    hmean, hvar, hcount, x, self.seasonal_alpha
+                )
+                self.hour_count[row, hour, col] = hcount + 1
+
+        return AnomalyScores(location=location or DEFAULT_LOCATION, z=z, hour_z=hour_z)
+
+    def seed_from_file(self, path: Union[str, Path], location: Optional[str] = None) -> int:
+        """Warm the baselines from a `sensor_readings.json`-style file (oldest first)."""
+        try:
+            with open(path, "r") as f:
+                rows = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("anomaly_seed_failed", extra={"path": str(path), "error": str(e)})
+            return 0
+
+        parsed = []
+        for r in rows if isinstance(rows, list) else []:
+            if not isinstance(r, dict) or not r.get("timestamp"):
+                continue
+            try:
+                ts = datetime.fromisoformat(str(r["timestamp"]).replace("Z", "+00:00"))
+            except ValueError:
+                continue
+            parsed.append((ts, r))
+
+        parsed.sort(key=lambda x: x[0])
+        for ts, r in parsed:
+            self.update(r.get("location") or location, ts, r)
+        return len(parsed)
+
+    def export_location(self, location: Optional[str]) -> Optional[dict]:
+        """One location's baselines as plain lists (to hand it to another shard worker)."""
+        row = self._index.get(location or DEFAULT_LOCATION)
+        if row is None:
+            return None
+        return {
+            name: getattr(self, name)[row].tolist()
+            for name in ("mean", "var", "count", "hour_mean", "hour_var", "hour_count")
+        }
+
+    def import_location(self, location: Optional[str], state: dict) -> None:
+        """Replace a location's baselines with ones from `export_location`."""
+        row = self._row(location)
+        for name, values in state.items():
+            getattr(self, name)[row] = values
+
+    def snapshot(self) -> dict:
+        """Current EWMA baselines per location (for debugging/dashboards)."""
+        out = {}
+        for key, row in self._index.items():
+            out[key] = {
+                name: {
+                    "mean": round(float(self.mean[row, col]), 3),
+                    "std": round(math.sqrt(float(self.var[row, col])), 3),
+                    "count": int(self.count[row, col]),
+                }
+                for col, name in enumerate(FIELDS)
+            }
+        return out
+
+
+_detector: Optional[AnomalyDetector] = None
+_detector_lock = threading.Lock()
+
+
+def get_detector() -> AnomalyDetector:
+    """Get global detector instance, seeded once from mock_data/sensor_readings.json"""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                detector = AnomalyDetector()
+                seed_path = Path(__file__).parent.parent / "mock_data" / "sensor_readings.json"
+                if seed_path.exists():
+                    detector.seed_from_file(seed_path)
+                _detector = detector
+    return _detector
@@ -0,0 +1,132 @@
+"""
+Budget-aware admission control.
+
+Compares today's spend and the live spend rate with DAILY_BUDGET_USD and picks how
+much model work a reading may use. As the budget runs low, throughput degrades in
+steps instead of stopping at a hard cliff:
+
+    full -> no_image -> compact (sensor-only, short output) -> rules (no model call)
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, Optional, Tuple
+
+from utils.cost_tracker import CostTracker, get_cost_tracker
+
+logger = logging.getLogger(__name__)
+
+LEVEL_FULL = "full"
+LEVEL_NO_IMAGE = "no_image"
+LEVEL_COMPACT = "compact"
+LEVEL_RULES = "rules"
+
+
+class BudgetController:
+    """Pick an admission level from remaining budget and projected end-of-day spend."""
+
+    # (max projected spend / budget, min remaining budget fraction) needed per level
+    FULL_LIMITS = (1.0, 0.25)
+    NO_IMAGE_LIMITS = (1.25, 0.10)
+    COMPACT_MIN_REMAINING = 0.03
+
+    def __init__(
+        self,
+        daily_budget_usd: Optional[float] = None,
+        tracker: Optional[CostTracker] = None,
+        window_seconds: Optional[float] = None,
+    ):
+        self.daily_budget_usd = (
+            daily_budget_usd if daily_budget_usd is not None else float(os.getenv("DAILY_BUDGET_USD", "0"))
+        )
+        self.window_seconds = window_seconds or float(os.getenv("BUDGET_RATE_WINDOW_SECONDS", "3600"))
+        self.tracker = tracker or get_cost_tracker()
+        self._lock = threading.Lock()
+        self._events: Deque[Tuple[float, float]] = deque()
+        self.decisions = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.daily_budget_usd > 0
+
+    def record_spend(self, cost_usd: float) -> None:
+        """Feed each call's cost in so the live spend rate reflects the last window."""
+        now = time.monotonic()
+        with self._lock:
+            self._events.append((now, cost_usd))
+            self._trim_locked(now)
+
+    def _trim_locked(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        while self._events and self._events[0][0] < cutoff:
+            self._events.popleft()
+
+    def spend_rate_per_s(self, spent: float, now: Optional[datetime] = None) -> float:
+        """Higher of the recent-window rate and today's average rate (USD/s)."""
+        with self._lock:
+            self._trim_locked(time.monotonic())
+            window_spend = sum(c for _, c in self._events)
+        window_rate = window_spend / self.window_seconds
+
+        now = now or datetime.now()
+        elapsed = (now - now.replace(hour=0, minute=0, second=0, microsecond=0)).total_seconds()
+        day_rate = spent / max(elapsed, 60.0)
+        return max(window_rate, day_rate)
+
+    def status(self, now: Optional[datetime] = None) -> dict:
+        spent = self.tracker.spent_usd()
+        if not self.enabled:
+            return {"enabled": False, "level": LEVEL_FULL, "spentUsd": round(spent, 6)}
+
+        now = now or datetime.now()
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        seconds_left = max(86400 - (now - midnight).total_seconds(), 0.0)
+        rate = self.spend_rate_per_s(spent, now)
+        projected = spent + rate * seconds_left
+        remaining = max(self.daily_budget_usd - spent, 0.0) / self.daily_budget_usd
+        pressure = projected / self.daily_budget_usd
+
+        if spent >= self.daily_budget_usd:
+            level = LEVEL_RULES
+        elif pressure <= self.FULL_LIMITS[0] and remaining > self.FULL_LIMITS[1]:
+            level = LEVEL_FULL
+        elif pressure <= self.NO_IMAGE_LIMITS[0] and remaining > self.NO_IMAGE_LIMITS[1]:
+            level = LEVEL_NO_IMAGE
+        elif remaining > self.COMPACT_MIN_REMAINING:
+            level = LEVEL_COMPACT
+        else:
+            level = LEVEL_RULES
+
+        return {
+            "enabled": True,
+            "level": level,
+            "budgetUsd": self.daily_budget_usd,
+            "spentUsd": round(spent, 6),
+            "remainingFraction": round(remaining, 4),
+            "spendRateUsdPerHour": round(rate * 3600, 6),
+            "projectedUsd": round(projected, 6),
+            "decisions": dict(self.decisions),
+        }
+
+    def admission_level(self) -> str:
+        level = self.status()["level"]
+        self.decisions[level] += 1
+        if level != LEVEL_FULL:
+            logger.info("budget_degraded_admission", extra={"level": level})
+        return level
+
+
+_controller: Optional[BudgetController] = None
+
+
+def get_budget_controller() -> BudgetController:
+    """Get global budget controller instance"""
+    global _controller
+    if _controller is None:
+        _controller = BudgetController()
+    return _controller
@@ -0,0 +1,191 @@
+"""
+Adaptive analysis cadence.
+
+Instead of analyzing every section on a fixed 15-minute cadence, each section's
+interval is derived from its recent volatility and anomaly score. The daily AI
+budget (DAILY_API_LIMIT) is split across sections in proportion to those weights:
+stable sections are sampled rarely, volatile or anomalous ones often.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from models.schemas import SensorData
+from services.rule_engine import FIELDS
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 24 * 60 * 60
+
+# Change per hour that counts as "one unit" of volatility for each sensor.
+VOLATILITY_SCALE: Dict[str, float] = {
+    "temperature": 1.0,
+    "humidity": 5.0,
+    "co2": 50.0,
+    "soil_moisture": 5.0,
+}
+
+
+def _aware(ts: datetime) -> datetime:
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+
+@dataclass
+class SectionState:
+    volatility: float = 0.0
+    anomaly: float = 0.0
+    last_seen: Optional[datetime] = None
+    last_values: Tuple[Optional[float], ...] = ()
+    last_analyzed: Optional[datetime] = None
+
+
+class CadenceScheduler:
+    """Allocate a global daily analysis budget across sections by volatility/anomaly."""
+
+    def __init__(
+        self,
+        daily_budget: Optional[int] = None,
+        min_interval_s: Optional[float] = None,
+        max_interval_s: Optional[float] = None,
+        volatility_alpha: float = 0.3,
+        volatility_gain: float = 1.0,
+        anomaly_gain: float = 0.5,
+        urgent_z: Optional[float] = None,
+    ):
+        self.enabled = os.getenv("ADAPTIVE_CADENCE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+        self.daily_budget = daily_budget or int(os.getenv("DAILY_API_LIMIT", "144"))
+        self.min_interval_s = min_interval_s or float(os.getenv("CADENCE_MIN_INTERVAL_SECONDS", "300"))
+        self.max_interval_s = max_interval_s or float(os.getenv("CADENCE_MAX_INTERVAL_SECONDS", "7200"))
+        self.volatility_alpha = volatility_alpha
+        self.volatility_gain = volatility_gain
+        self.anomaly_gain = anomaly_gain
+        # Readings at/above this anomaly |z| are always due, regardless of schedule.
+        self.urgent_z = urgent_z or float(os.getenv("CASCADE_Z_ESCALATE", "3.0"))
+        self.sections: Dict[str, SectionState] = {}
+
+    def observe(
+        self,
+        section: str,
+        timestamp: datetime,
+        sensors: SensorData,
+        anomaly_max_z: Optional[float] = None,
+    ) -> SectionState:
+        """Fold a new reading into the section's volatility/anomaly state."""
+        timestamp = _aware(timestamp)
+        state = self.sections.setdefault(section, SectionState())
+        values = tuple(getattr(sensors, f) for f in FIELDS)
+
+        if state.last_seen is not None and state.last_values and timestamp > state.last_seen:
+            hours = (timestamp - state.last_seen).total_seconds() / 3600
+            rates = [
+                abs(v - prev) / VOLATILITY_SCALE[name] / max(hours, 1 / 60)
+                for name, v, prev in zip(FIELDS, values, state.last_values)
+                if v is not None and prev is not None
+            ]
+            if rates:
+                rate = sum(rates) / len(rates)
+                state.volatility += self.volatility_alpha * (rate - state.volatility)
+
+        if timestamp >= (state.last_seen or timestamp):
+            state.last_seen = timestamp
+            state.last_values = values
+        state.anomaly = float(anomaly_max_z or 0.0)
+        return state
+
+    def weight(self, state: SectionState) -> float:
+        return (
+            1.0
+            + self.volatility_gain * state.volatility
+            + self.anomaly_gain * max(0.0, state.anomaly - 1.0)
+        )
+
+    def intervals(self) -> Dict[str, float]:
+        """
+        Per-section analysis interval (seconds) so total calls/day stay within budget.
+
+        Budget is split by weight; sections that hit the min/max interval clamp are
+        fixed and the remaining budget is re-split among the others (water-filling).
+        """
+        if not self.sections:
+            return {}
+
+        weights = {name: self.weight(state) for name, state in self.sections.items()}
+        fixed: Dict[str, float] = {}
+        budget = float(self.daily_budget)
+
+        while True:
+            free = {k: w for k, w in weights.items() if k not in fixed}
+            if not free:
+                break
+            remaining = budget - sum(DAY_SECONDS / iv for iv in fixed.values())
+            total_w = sum(free.values())
+            clamped = False
+            for name, w in free.items():
+                calls = max(remaining, 0.0) * w / total_w
+                interval = DAY_SECONDS / calls if calls > 0 else self.max_interval_s
+                if interval < self.min_interval_s:
+                    fixed[name] = self.min_interval_s
+                    clamped = True
+                elif interval > self.max_interval_s:
+                    fixed[name] = self.max_interval_s
+                    clamped = True
+            if not clamped:
+                for name, w in free.items():
+                    fixed[name] = DAY_SECONDS * total_w / (max(remaining, 1e-9) * w)
+                break
+
+        return fixed
+
+    def is_due(self, section: str, now: datetime) -> bool:
+        state = self.sections.get(section)
+        if state is None or state.last_analyzed is None:
+            return True
+        if state.anomaly >= self.urgent_z:
+            return True
+        interval = self.intervals().get(section, self.min_interval_s)
+        return _aware(now) - state.last_analyzed >= timedelta(seconds=interval)
+
+    def next_due(self, section: str) -> Optional[datetime]:
+        state = self.sections.get(section)
+        if state is None or state.last_analyzed is None:
+            return None
+        interval = self.intervals().get(section, self.min_interval_s)
+        return state.last_analyzed + timedelta(seconds=interval)
+
+    def mark_analyzed(self, section: str, when: datetime) -> None:
+        self.sections.setdefault(section, SectionState()).last_analyzed = _aware(when)
+
+    def schedule(self) -> List[dict]:
+        intervals = self.intervals()
+        out = []
+        for name, state in sorted(self.sections.items()):
+            interval = intervals.get(name)
+            next_due = self.next_due(name)
+            out.append(
+                {
+                    "section": name,
+                    "intervalSeconds": round(interval) if interval else None,
+                    "callsPerDay": round(DAY_SECONDS / interval, 2) if interval else None,
+                    "volatility": round(state.volatility, 3),
+                    "anomaly": round(state.anomaly, 2),
+                    "weight": round(self.weight(state), 3),
+                    "lastAnalyzed": state.last_analyzed.isoformat() if state.last_analyzed else None,
+                    "nextDue": next_due.isoformat() if next_due else None,
+                }
+            )
+        return out
+
+
+_scheduler: Optional[CadenceScheduler] = None
+
+
+def get_scheduler() -> CadenceScheduler:
+    """Get global cadence scheduler instance"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = CadenceScheduler()
+    return _scheduler
@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import json
 import os
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Any, Optional
+from typing import Any, List, Optional, Sequence, Tuple
+
+from utils.metrics import cache_lookup
 
 
 @dataclass(frozen=True)
@@ -39,35 +42,23 @@ def _coerce_float(x: Any) -> Optional[float]:
         return None
 
 
-def get_24h_context(current_ts: datetime) -> HistoricalContext:
-    """
-    Lightweight historical context builder.
-
-    If `mock_data/sensor_readings.json` exists, derive:
-    - avgTemp: average temperature across last 24h
-    - trend: stable/rising/falling
-    - alerts: count of readings outside mild thresholds
-    """
+def _history_path() -> str:
     base_dir = os.path.dirname(os.path.dirname(__file__))
-    path = os.path.join(base_dir, "mock_data", "sensor_readings.json")
-
-    if current_ts.tzinfo is None:
-        current_ts = current_ts.replace(tzinfo=timezone.utc)
+    return os.getenv("SENSOR_HISTORY_PATH") or os.path.join(base_dir, "mock_data", "sensor_readings.json")
 
-    start = current_ts - timedelta(hours=24)
 
+def _load_points(path: str) -> Optional[List[Tuple[datetime, float]]]:
+    """(timestamp, temperature) pairs sorted by time, or None if history is unavailable."""
     if not os.path.exists(path):
-        return HistoricalContext(avgTemp=None, trend="unknown", alerts=0)
+        return None
 
     try:
         with open(path, "r") as f:
             rows = json.load(f)
     except Exception:
-        return HistoricalContext(avgTemp=None, trend="unknown", alerts=0)
-
-    points: list[tuple[datetime, float]] = []
-    alerts = 0
+        return None
 
+    points: List[Tuple[datetime, float]] = []
     for r in rows if isinstance(rows, list) else []:
         ts = _parse_ts(r.get("timestamp") if isinstance(r, dict) else None)
         temp = _coerce_float(r.get("temperature") if isinstance(r, dict) else None)
@@ -75,31 +66,101 @@ def get_24h_context(current_ts: datetime) -> HistoricalContext:
             continue
         if ts.tzinfo is None:
             ts = ts.replace(tzinfo=timezone.utc)
+        points.append((ts, temp))
 
-        if ts < start or ts > current_ts:
-            continue
+    # Stable sort keeps file order for equal timestamps (first/last used for trend)
+    points.sort(key=lambda x: x[0])
+    return points
 
-        points.append((ts, temp))
 
-        if temp >= 35 or temp <= 15:
-            alerts += 1
+@dataclass(frozen=True)
+class _HistoryIndex:
+    """Sorted history with prefix sums; windows are two bisects and two subtractions."""
 
-    if not points:
-        return HistoricalContext(avgTemp=None, trend="unknown", alerts=alerts)
+    times: List[datetime]
+    temps: List[float]
+    temp_sums: List[float]
+    alert_counts: List[int]
 
-    points.sort(key=lambda x: x[0])
+
+def _build_index(points: List[Tuple[datetime, float]]) -> _HistoryIndex:
+    times = [ts for ts, _ in points]
     temps = [t for _, t in points]
-    avg = sum(temps) / len(temps)
+    temp_sums = [0.0]
+    alert_counts = [0]
+    for t in temps:
+        temp_sums.append(temp_sums[-1] + t)
+        alert_counts.append(alert_counts[-1] + (1 if t >= 35 or t <= 15 else 0))
+    return _HistoryIndex(times, temps, temp_sums, alert_counts)
+
 
-    # Trend by comparing first vs last
-    delta = temps[-1] - temps[0]
-    if abs(delta) < 1.0:
-        trend = "stable"
-    elif delta > 0:
-        trend = "rising"
-    else:
-        trend = "falling"
+_points_cache: dict = {}
+
+
+def _cached_index(path: str) -> Optional[_HistoryIndex]:
+    """History index memoized on the file's mtime (re-read and rebuilt only when the file changes)."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _points_cache.get(path)
+    hit = cached is not None and cached[0] == mtime
+    cache_lookup("history", hit)
+    if hit:
+        return cached[1]
+    points = _load_points(path)
+    index = _build_index(points) if points is not None else None
+    _points_cache[path] = (mtime, index)
+    return index
+
+
+def get_24h_context(current_ts: datetime) -> HistoricalContext:
+    """
+    Lightweight historical context builder.
+
+    If `mock_data/sensor_readings.json` exists, derive:
+    - avgTemp: average temperature across last 24h
+    - trend: stable/rising/falling
+    - alerts: count of readings outside mild thresholds
+    """
+    return get_24h_contexts([current_ts])[0]
+
+
+def get_24h_contexts(timestamps: Sequence[datetime]) -> List[HistoricalContext]:
+    """
+    Build the 24h context for many readings in one pass over the history.
+
+    The history is loaded, sorted and indexed with prefix sums (temperature total,
+    alert count) once, and kept until the file changes; each window is then two
+    binary searches, so a reading costs O(log history) instead of a full file read.
+    """
+    index = _cached_index(_history_path())
+    if index is None:
+        return [HistoricalContext(avgTemp=None, trend="unknown", alerts=0) for _ in timestamps]
+
+    times, temps, temp_sums, alert_counts = index.times, index.temps, index.temp_sums, index.alert_counts
+
+    contexts = []
+    for current_ts in timestamps:
+        if current_ts.tzinfo is None:
+            current_ts = current_ts.replace(tzinfo=timezone.utc)
+        lo = bisect_left(times, current_ts - timedelta(hours=24))
+        hi = bisect_right(times, current_ts)
+        if hi <= lo:
+            contexts.append(HistoricalContext(avgTemp=None, trend="unknown", alerts=0))
+            continue
 
-    return HistoricalContext(avgTemp=round(avg, 2), trend=trend, alerts=alerts)
+        avg = (temp_sums[hi] - temp_sums[lo]) / (hi - lo)
+        alerts = alert_counts[hi] - alert_counts[lo]
 
+        # Trend by comparing first vs last
+        delta = temps[hi - 1] - temps[lo]
+        if abs(delta) < 1.0:
+            trend = "stable"
+        elif delta > 0:
+            trend = "rising"
+        else:
+            trend = "falling"
 
+        contexts.append(HistoricalContext(avgTemp=round(avg, 2), trend=trend, alerts=alerts))
+    return contexts
@@ -0,0 +1,152 @@
+"""
+Best-frame selection for multi-frame camera bursts.
+
+Cameras may capture several frames per trigger. Instead of spending an AI call on
+whichever frame happened to arrive, every frame in a burst (or short window) is
+scored with the validator heuristics and only the best usable frame is forwarded.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from services.validator import ImageQuality, ValidationService
+
+logger = logging.getLogger(__name__)
+
+# Edge mean at which a frame is considered fully sharp (blur rejection is at 6).
+SHARPNESS_SATURATION = 20.0
+# Mid-grey target for exposure scoring (dark rejection is at 25).
+EXPOSURE_TARGET = 128.0
+
+
+@dataclass(frozen=True)
+class Frame:
+    camera_id: str
+    image_bytes: bytes
+    mime_type: Optional[str] = None
+    captured_at: Optional[datetime] = None
+    name: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class FrameScore:
+    frame: Frame
+    quality: ImageQuality
+    sharpness: float
+    exposure: float
+    score: float
+
+    @property
+    def usable(self) -> bool:
+        return self.quality.ok
+
+
+def score_frame(frame: Frame) -> FrameScore:
+    """
+    Score a frame on sharpness (edge strength) and exposure (distance from mid-grey).
+
+    Both components are normalised to 0..1; unusable frames always score 0.
+    """
+    quality = ValidationService.assess_image_bytes(frame.image_bytes)
+
+    sharpness = 0.0
+    if quality.edge_mean is not None:
+        sharpness = min(quality.edge_mean / SHARPNESS_SATURATION, 1.0)
+
+    exposure = 0.0
+    if quality.brightness is not None:
+        exposure = max(0.0, 1.0 - abs(quality.brightness - EXPOSURE_TARGET) / EXPOSURE_TARGET)
+
+    score = (0.7 * sharpness + 0.3 * exposure) if quality.ok else 0.0
+    return FrameScore(
+        frame=frame,
+        quality=quality,
+        sharpness=round(sharpness, 4),
+        exposure=round(exposure, 4),
+        score=round(score, 4),
+    )
+
+
+def select_best_frame(frames: Iterable[Frame]) -> Tuple[Optional[FrameScore], List[FrameScore]]:
+    """
+    Score all frames and pick the best usable one.
+
+    Returns:
+        (best_usable_frame_or_None, all_scores)
+    """
+    scores = [score_frame(f) for f in frames]
+    usable = [s for s in scores if s.usable]
+    best = max(usable, key=lambda s: s.score) if usable else None
+
+    logger.info(
+        "frame_selection",
+        extra={
+            "frames": len(scores),
+            "usable": len(usable),
+            "selected": best.frame.name if best else None,
+            "score": best.score if best else None,
+        },
+    )
+    return best, scores
+
+
+def best_rejection_reason(scores: List[FrameScore]) -> Optional[str]:
+    """Issue of the least-bad rejected frame, used when no frame is usable."""
+    if not scores:
+        return None
+    rejected = sorted(scores, key=lambda s: (s.sharpness + s.exposure), reverse=True)
+    return rejected[0].quality.issue
+
+
+class FrameSelector:
+    """
+    Buffer frames per `camera_id` over a short window and release the best one.
+
+    `add()` collects frames as they arrive; `flush()` scores the buffered window
+    for a camera and returns the best usable frame (or None if all were rejected).
+    """
+
+    def __init__(
+        self,
+        window_seconds: Optional[float] = None,
+        max_frames: Optional[int] = None,
+    ):
+        self.window = timedelta(
+            seconds=window_seconds
+            if window_seconds is not None
+            else float(os.getenv("BURST_WINDOW_SECONDS", "30"))
+        )
+        self.max_frames = max_frames or int(os.getenv("BURST_MAX_FRAMES", "8"))
+        self._buffers: Dict[str, List[Frame]] = defaultdict(list)
+
+    def add(self, frame: Frame) -> None:
+        buf = self._buffers[frame.camera_id]
+        buf.append(frame)
+
+        # Keep only frames inside the window relative to the newest capture.
+        newest = max((f.captured_at for f in buf if f.captured_at), default=None)
+        if newest is not None:
+            cutoff = newest - self.window
+            buf[:] = [
+                f for f in buf
+                if f.captured_at is None or _aware(f.captured_at) >= _aware(cutoff)
+            ]
+
+        if len(buf) > self.max_frames:
+            del buf[: len(buf) - self.max_frames]
+
+    def pending(self, camera_id: str) -> int:
+        return len(self._buffers.get(camera_id, []))
+
+    def flush(self, camera_id: str) -> Tuple[Optional[FrameScore], List[FrameScore]]:
+        frames = self._buffers.pop(camera_id, [])
+        return select_best_frame(frames)
+
+
+def _aware(ts: datetime) -> datetime:
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
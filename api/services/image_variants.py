@@ -0,0 +1,169 @@
+"""
+Resized/re-encoded camera image variants, cached on disk by content hash.
+
+A variant is identified by (source file name, content hash, width, format), so
+its bytes never change for a given key: the key doubles as a strong ETag, and
+URLs that carry the hash (`?v=`) can be cached by browsers as immutable.
+Variants are generated once on demand (Pillow, in a worker thread) and then
+served straight from disk; when a source image changes, its old variants are
+removed.
+"""
+from __future__ import annotations
+
+import asyncio
+import glob
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+_API_DIR = Path(__file__).resolve().parent.parent
+
+FORMATS = {"jpeg": ("image/jpeg", "jpg"), "webp": ("image/webp", "webp")}
+
+
+@dataclass(frozen=True)
+class Variant:
+    path: Path
+    etag: str
+    media_type: str
+    content_hash: str
+    width: Optional[int] = None  # None: original size
+
+
+class ImageNotFound(Exception):
+    pass
+
+
+class ImageVariantCache:
+    """
+    On-demand image variants (IMAGE_VARIANT_WIDTHS, JPEG/WebP) under IMAGE_CACHE_DIR.
+
+    Requested widths round up to the nearest configured width (capped at the
+    source width), so the cache holds at most images x widths x formats files.
+    """
+
+    def __init__(self, source_dir: Optional[Path] = None, cache_dir: Optional[Path] = None):
+        self.source_dir = Path(source_dir or _API_DIR / "mock_data" / "images")
+        self.cache_dir = Path(cache_dir or os.getenv("IMAGE_CACHE_DIR", str(_API_DIR / "image_cache")))
+        self.widths = tuple(sorted(int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,1280").split(",")))
+        self.quality = int(os.getenv("IMAGE_VARIANT_QUALITY", "80"))
+        self._lock = threading.Lock()
+        # name -> (mtime_ns, size, sha256 hex, (width, height))
+        self._sources: Dict[str, Tuple[int, int, str, Tuple[int, int]]] = {}
+        self._building: Dict[str, asyncio.Lock] = {}
+
+    def _source_path(self, name: str) -> Path:
+        safe = Path(name).name
+        path = self.source_dir / safe
+        if safe != name or safe.startswith(".") or not path.is_file():
+            raise ImageNotFound(name)
+        return path
+
+    def source_info(self, name: str) -> Tuple[Path, str, Tuple[int, int]]:
+        """(path, content hash, (width, height)); rehashed only when mtime/size change."""
+        path = self._source_path(name)
+        st = path.stat()
+        with self._lock:
+            cached = self._sources.get(name)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return path, cached[2], cached[3]
+
+        from PIL import Image
+
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        with Image.open(path) as img:
+            size = img.size
+        with self._lock:
+            previous = self._sources.get(name)
+            self._sources[name] = (st.st_mtime_ns, st.st_size, digest, size)
+        if previous and previous[2] != digest:
+            self._drop_variants(name, keep=digest)
+        return path, digest, size
+
+    def _drop_variants(self, name: str, keep: str) -> None:
+        # Keys are "<file name>@<hash>-w<width>.<ext>"; match the file name exactly
+        for old in self.cache_dir.glob(f"{glob.escape(name)}@*"):
+            source, _, rest = old.name.rpartition("@")
+            if source == name and not rest.startswith(f"{keep[:16]}-"):
+                old.unlink(missing_ok=True)
+
+    def _width_for(self, requested: Optional[int], source_width: int) -> Optional[int]:
+        if not requested:
+            return None
+        for width in self.widths:
+            if width >= requested:
+                return None if width >= source_width else width
+        return None if self.widths[-1] >= source_width else self.widths[-1]
+
+    def resolve(self, name: str, width: Optional[int], fmt: str) -> Variant:
+        """Variant descriptor for a request (the file may not exist yet; see `get`)."""
+        path, digest, (source_width, _) = self.source_info(name)
+        width = self._width_for(width, source_width)
+        if fmt == "original" or (width is None and fmt == "jpeg" and path.suffix.lower() in (".jpg", ".jpeg")):
+            media_type = "image/png" if path.suffix.lower() == ".png" else "image/jpeg"
+            return Variant(path, f'"{digest[:16]}"', media_type, digest)
+        media_type, ext = FORMATS[fmt]
+        key = f"{name}@{digest[:16]}-w{width or source_width}.{ext}"
+        return Variant(self.cache_dir / key, f'"{key}"', media_type, digest, width)
+
+    def _build(self, name: str, variant: Variant) -> None:
+        from PIL import Image
+
+        source, _, _ = self.source_info(name)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = variant.path.with_suffix(variant.path.suffix + ".tmp")
+        with Image.open(source) as img:
+            img = img.convert("RGB")
+            if variant.width and variant.width < img.width:
+                img.thumbnail((variant.width, round(img.height * variant.width / img.width)), Image.LANCZOS)
+            if variant.media_type == "image/webp":
+                img.save(tmp, format="WEBP", quality=self.quality, method=4)
+            else:
+                img.save(tmp, format="JPEG", quality=self.quality, optimize=True, progressive=True)
+        os.replace(tmp, variant.path)
+
+    async def get(self, name: str, width: Optional[int], fmt: str) -> Variant:
+        """
+        Variant ready on disk, generating it off the event loop on first use.
+
+        Raises:
+            ImageNotFound: unknown or unsafe image name
+        """
+        variant = await asyncio.to_thread(self.resolve, name, width, fmt)
+        if variant.path.exists():
+            return variant
+        # One build per variant; concurrent requests for it wait instead of re-encoding
+        lock = self._building.setdefault(variant.path.name, asyncio.Lock())
+        async with lock:
+            if not variant.path.exists():
+                await asyncio.to_thread(self._build, name, variant)
+        return variant
+
+    def url_for(self, name: str, width: Optional[int] = None, fmt: str = "auto") -> Optional[str]:
+        """Versioned URL (`v` = content hash), cacheable as immutable; None if the image is missing."""
+        try:
+            _, digest, _ = self.source_info(name)
+        except (ImageNotFound, OSError):
+            return None
+        query = f"v={digest[:16]}&fmt={fmt}" + (f"&w={width}" if width else "")
+        return f"/api/images/{quote(name)}?{query}"
+
+    def srcset(self, name: str) -> Optional[Dict[str, str]]:
+        """{width: url} for every configured width (for <img srcset>)."""
+        urls = {str(w): self.url_for(name, w) for w in self.widths}
+        return urls if all(urls.values()) else None
+
+
+_cache: Optional[ImageVariantCache] = None
+
+
+def get_image_variants() -> ImageVariantCache:
+    global _cache
+    if _cache is None:
+        _cache = ImageVariantCache()
+    return _cache
@@ -0,0 +1,240 @@
+"""
+Asynchronous analysis jobs.
+
+`POST /api/analyze/jobs` validates the input, enqueues a job on a bounded asyncio
+queue and returns 202 immediately; a fixed pool of workers runs the jobs through
+`analyze_reading` (on the location's shard worker when SHARD_WORKERS > 0).
+Clients poll (or long-poll) the job for its result. When the queue is full,
+`submit` raises `QueueFull` with a Retry-After estimate so the route can answer
+429 instead of holding connections open.
+
+Jobs are ordered by `services.priority_scheduler` (pre-score, aging, preemption of
+queued routine work by critical readings) rather than first-in-first-out.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from models.schemas import SensorData, analysis_result_payload
+from services.analysis_pipeline import force_uncertain_if_low_confidence
+from services.priority_scheduler import Priority, PriorityWorkQueue, score_reading
+from services.shard_workers import analyze_sharded
+from services.validator import ValidationService
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class QueueFull(Exception):
+    """The job queue is at capacity; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Analysis queue is full; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class AnalysisJob:
+    sensors: SensorData
+    image_bytes: Optional[bytes] = None
+    image_mime: Optional[str] = None
+    priority: Optional[Priority] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = JOB_QUEUED
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    preempted: bool = False
+    created_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_COMPLETED, JOB_FAILED)
+
+    def to_dict(self) -> dict:
+        payload = {"jobId": self.id, "status": self.status}
+        if self.priority is not None:
+            payload["priority"] = {"class": self.priority.cls, "score": self.priority.score}
+        if self.preempted:
+            payload["preempted"] = True
+        if self.started_at is not None:
+            payload["queueWaitMs"] = round((self.started_at - self.created_at) * 1000, 1)
+        if self.finished_at is not None and self.started_at is not None:
+            payload["runMs"] = round((self.finished_at - self.started_at) * 1000, 1)
+        if self.result is not None:
+            payload["result"] = self.result
+        if self.error is not None:
+            payload["error"] = self.error
+        return payload
+
+
+class AnalysisJobQueue:
+    """Bounded job queue + worker pool (start/stop from the app lifespan)."""
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        result_ttl_seconds: Optional[float] = None,
+    ):
+        self.max_size = max_size or int(os.getenv("JOB_QUEUE_MAX_SIZE", "100"))
+        self.worker_count = workers or int(os.getenv("JOB_WORKERS", "4"))
+        self.result_ttl_seconds = result_ttl_seconds or float(os.getenv("JOB_RESULT_TTL_SECONDS", "600"))
+
+        self._queue: Optional[PriorityWorkQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._jobs: Dict[str, AnalysisJob] = {}
+        # EWMA of job run time, used for the Retry-After estimate
+        self._avg_run_s = 2.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._queue = PriorityWorkQueue(maxsize=self.max_size)
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"analysis-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        logger.info("job_workers_started", extra={"workers": self.worker_count, "maxSize": self.max_size})
+
+    async def stop(self) -> None:
+        """Cancel the workers; unfinished jobs get the rule-based result so waiters wake."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        unfinished = [job for job in self._jobs.values() if not job.finished]
+        for job in unfinished:
+            self._finish_with_fallback(job, "AI skipped (server shutting down)")
+        if unfinished:
+            logger.info("analysis_jobs_finished_on_shutdown", extra={"jobs": len(unfinished)})
+
+    def retry_after_seconds(self) -> int:
+        depth = self._queue.qsize() if self._queue else 0
+        return max(1, round(depth * self._avg_run_s / max(self.worker_count, 1)))
+
+    def submit(self, job: AnalysisJob) -> AnalysisJob:
+        """
+        Enqueue without waiting; raises QueueFull when at capacity.
+
+        A critical job arriving at a full queue displaces the lowest-priority queued
+        routine job, which is answered from the rule engine instead.
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        self._prune()
+        if job.priority is None:
+            job.priority = score_reading(job.sensors)
+        try:
+            evicted = self._queue.put_nowait(job, job.priority)
+        except asyncio.QueueFull:
+            raise QueueFull(self.retry_after_seconds())
+        self._jobs[job.id] = job
+        if evicted is not None:
+            evicted.preempted = True
+            self._finish_with_fallback(evicted, "AI preempted (queue full)")
+            logger.info("analysis_job_preempted", extra={"jobId": evicted.id})
+        return job
+
+    def _finish_with_fallback(self, job: AnalysisJob, reason: str) -> None:
+        """Complete a job the model won't see with the rule-based result."""
+        fallback = ValidationService.get_fallback_analysis(job.sensors, zone=job.sensors.location)
+        fallback["reasoning"] = f"{reason}; {fallback.get('reasoning', '')}".strip()
+        fallback["timestamp"] = job.sensors.timestamp
+        fallback = force_uncertain_if_low_confidence(fallback)
+        job.result = analysis_result_payload(fallback)
+        job.status = JOB_COMPLETED
+        job.finished_at = time.monotonic()
+        if job.started_at is None:
+            job.started_at = job.finished_at
+        job.image_bytes = None
+        job.done.set()
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: AnalysisJob, timeout: float) -> AnalysisJob:
+        """Long-poll: return once the job finishes or `timeout` seconds pass."""
+        if timeout > 0 and not job.finished:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def stats(self) -> dict:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": len(self._workers),
+            "queueDepth": self._queue.qsize() if self._queue else 0,
+            "maxSize": self.max_size,
+            "avgRunMs": round(self._avg_run_s * 1000, 1),
+            "jobs": counts,
+            "priorityClasses": self._queue.wait_stats() if self._queue else {},
+        }
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - self.result_ttl_seconds
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job, _, _ = await self._queue.get()
+            await self._run(job)
+
+    async def _run(self, job: AnalysisJob) -> None:
+        job.status = JOB_RUNNING
+        job.started_at = time.monotonic()
+        try:
+            result = await analyze_sharded(job.sensors, image_bytes=job.image_bytes, image_mime=job.image_mime)
+            job.result = analysis_result_payload(result)
+            job.status = JOB_COMPLETED
+        except Exception as e:
+            # ValueError = missing configuration; anything else is unexpected
+            if not isinstance(e, ValueError):
+                logger.exception("analysis_job_failed", extra={"jobId": job.id})
+            job.error = str(e)
+            job.status = JOB_FAILED
+        finally:
+            job.finished_at = time.monotonic()
+            job.image_bytes = None  # don't keep uploads around with the result
+            self._avg_run_s = 0.8 * self._avg_run_s + 0.2 * (job.finished_at - job.started_at)
+            # A job cancelled by stop() is still running here; stop() finishes it and wakes waiters
+            if job.finished:
+                job.done.set()
+
+
+_job_queue: Optional[AnalysisJobQueue] = None
+
+
+def get_job_queue() -> AnalysisJobQueue:
+    """Get global job queue instance"""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = AnalysisJobQueue()
+    return _job_queue
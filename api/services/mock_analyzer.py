@@ -6,11 +6,22 @@ import asyncio
 import json
 import logging
 import os
+import tempfile
+import textwrap
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, TextIO, Tuple
 
+from models.schemas import SensorData
 from services.context_service import get_24h_context
-from services.openai_service import OpenAIService
+from services.frame_selector import Frame, best_rejection_reason, select_best_frame
+from services.openai_service import ModelUnavailable, get_openai_service
+from services.prompt_builder import PromptBudgetExceeded
+from services.result_ring import ResultRing
+from services.shard_workers import anomaly_context_sharded
+from services.validator import ValidationService
+from utils.fast_json import dumps
+from utils.results_store import get_results_store
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +31,13 @@ class MockAnalyzer:
     
     def __init__(self):
         self.is_processing = False
-        self.results: List[Dict] = []
+        # Newest ANALYSIS_RESULTS_IN_MEMORY results; all of them are also in the results store
+        self.results = ResultRing(int(os.getenv("ANALYSIS_RESULTS_IN_MEMORY", "1000")))
         self.total = 0
         self.completed = 0
         self.mock_data_path = Path(__file__).parent.parent / "mock_data"
+        # analyzed_results.json being written by the current run: (temp file, temp path, results written)
+        self._results_out: Optional[Tuple[TextIO, str, int]] = None
         
         # Load existing results on startup if available
         self._load_cached_results()
@@ -34,10 +48,14 @@ class MockAnalyzer:
             results_file = self.mock_data_path / "analyzed_results.json"
             if results_file.exists():
                 with open(results_file, 'r') as f:
-                    self.results = json.load(f)
-                    self.completed = len(self.results)
-                    self.total = len(self.results)
-                logger.info(f"Loaded {len(self.results)} cached analysis results")
+                    cached = json.load(f)
+                # Only the newest are kept in memory; the store serves the rest by id
+                get_results_store().add_many(cached)
+                self.results.clear()
+                self.results.extend(cached)
+                self.completed = len(cached)
+                self.total = len(cached)
+                logger.info("Loaded %d cached analysis results", len(cached))
         except Exception as e:
             logger.warning(f"Could not load cached results: {e}")
     
@@ -47,15 +65,61 @@ class MockAnalyzer:
             "status": "processing" if self.is_processing else "complete",
             "completed": self.completed,
             "total": self.total,
-            "results": self.results
+            "spilled": self.results.spilled,
+            "results": self.results.to_dicts()
         }
+
+    def status_body(self) -> bytes:
+        """`get_status()` as JSON bytes (the results array is re-encoded only after a change)"""
+        head = dumps({
+            "status": "processing" if self.is_processing else "complete",
+            "completed": self.completed,
+            "total": self.total,
+            "spilled": self.results.spilled,
+        })
+        return head[:-1] + b',"results":' + self.results.json_array() + b"}"
     
     def get_result_by_id(self, result_id: str) -> Optional[Dict]:
-        """Get single result by ID"""
-        for result in self.results:
-            if result.get("id") == result_id:
-                return result
-        return None
+        """Get single result by ID (falls back to the results store)"""
+        result = self.results.find(result_id)
+        if result is not None:
+            return result
+        return get_results_store().get(result_id)
+
+    def _record(self, result: Dict) -> None:
+        self.results.append(result)
+        get_results_store().add(result)
+        if self._results_out is not None:
+            out, tmp_path, written = self._results_out
+            # Same layout as json.dump(results, indent=2), one element at a time
+            element = textwrap.indent(json.dumps(result, indent=2, default=str), "  ")
+            out.write(("\n" if written == 0 else ",\n") + element)
+            self._results_out = (out, tmp_path, written + 1)
+
+    def _open_results_file(self) -> None:
+        """Stream this run's results to a temp file; `_close_results_file` swaps it in."""
+        fd, tmp_path = tempfile.mkstemp(prefix=".analyzed_results.", suffix=".tmp", dir=self.mock_data_path)
+        out = os.fdopen(fd, "w")
+        out.write("[")
+        self._results_out = (out, tmp_path, 0)
+
+    def _close_results_file(self, keep: bool) -> None:
+        """Replace analyzed_results.json with the streamed file (`keep`) or discard it."""
+        if self._results_out is None:
+            return
+        out, tmp_path, written = self._results_out
+        self._results_out = None
+        try:
+            with out:
+                if keep:
+                    out.write("\n]" if written else "]")
+                    out.flush()
+                    os.fsync(out.fileno())
+            if keep:
+                os.replace(tmp_path, self.mock_data_path / "analyzed_results.json")
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
     
     async def start_analysis(self) -> Dict:
         """Start analyzing mock data in background"""
@@ -63,7 +127,7 @@ class MockAnalyzer:
             return {"error": "Analysis already in progress"}
         
         # Clear previous results
-        self.results = []
+        self.results.clear()
         self.completed = 0
         self.is_processing = True
         
@@ -87,59 +151,96 @@ class MockAnalyzer:
             self.is_processing = False
             return {"error": str(e)}
     
+    def _select_burst_frame(self, scenario: Dict) -> Tuple[Optional[str], Optional[bytes], bool, Optional[str]]:
+        """Score a scenario's burst of frames and keep the best usable one"""
+        frames = []
+        for name in scenario["frames"]:
+            image_path = self.mock_data_path / "images" / name
+            if image_path.exists():
+                with open(image_path, 'rb') as f:
+                    frames.append(Frame(
+                        camera_id=scenario.get("camera_id", "Unknown Camera"),
+                        image_bytes=f.read(),
+                        mime_type="image/jpeg",
+                        name=name,
+                    ))
+
+        if not frames:
+            return scenario.get("image"), None, True, None
+
+        best, scores = select_best_frame(frames)
+        if best is None:
+            return scores[0].frame.name, None, False, best_rejection_reason(scores)
+        return best.frame.name, best.frame.image_bytes, True, None
+
+    @staticmethod
+    def _fallback_result(scenario: Dict, reason: str) -> Dict:
+        """Rule-based result for a scenario the model didn't analyze"""
+        result = ValidationService.get_fallback_analysis(
+            SensorData.model_validate(scenario), zone=scenario.get("location")
+        )
+        result["reasoning"] = f"{reason}; {result.get('reasoning', '')}".strip()
+        return result
+
     async def _process_scenarios(self, scenarios: List[Dict]):
         """Process scenarios one by one"""
+        completed_run = False
         try:
-            service = OpenAIService()
+            self._open_results_file()
+            service = get_openai_service()
             
             for scenario in scenarios:
-                # Load image
-                image_path = self.mock_data_path / "images" / scenario["image"]
-                image_bytes = None
-                
-                if image_path.exists():
-                    with open(image_path, 'rb') as f:
-                        image_bytes = f.read()
-                
-                # Validate image quality BEFORE calling AI
-                from services.validator import ValidationService
-                
-                if image_bytes:
-                    image_ok, image_issue = ValidationService.validate_image_bytes(image_bytes)
-                    if not image_ok:
-                        # Return uncertain result without calling AI
-                        result = {
-                            "status": "uncertain",
-                            "confidence": 0.2,
-                            "reasoning": f"Image quality issue: {image_issue}",
-                            "visual_assessment": None,
-                            "signals_agree": None,
-                            "primary_concern": "visual",
-                            "recommended_action": "Retake photo with better lighting/focus and retry analysis",
-                            "tokensUsed": 0,
-                            "cost": "0.000000"
-                        }
-                        
-                        # Add metadata
-                        result["id"] = scenario["id"]
-                        result["timestamp"] = scenario["timestamp"]
-                        result["location"] = scenario.get("location", "Unknown Location")
-                        result["camera_id"] = scenario.get("camera_id", "Unknown Camera")
-                        result["sensorData"] = {
-                            "temperature": scenario["temperature"],
-                            "humidity": scenario["humidity"],
-                            "co2": scenario["co2"],
-                            "soilMoisture": scenario["soilMoisture"]
-                        }
-                        result["image"] = scenario["image"]
-                        
-                        if "pagerAlert" in scenario:
-                            result["pagerAlert"] = scenario["pagerAlert"]
-                        
-                        self.results.append(result)
-                        self.completed += 1
-                        logger.info(f"Completed analysis {self.completed}/{self.total}: {scenario['id']} (image quality failure)")
-                        continue
+                # Load image (bursts: keep only the best usable frame)
+                if scenario.get("frames"):
+                    image_name, image_bytes, image_ok, image_issue = self._select_burst_frame(scenario)
+                else:
+                    image_name = scenario["image"]
+                    image_path = self.mock_data_path / "images" / image_name
+                    image_bytes = None
+                    image_ok, image_issue = True, None
+
+                    if image_path.exists():
+                        with open(image_path, 'rb') as f:
+                            image_bytes = f.read()
+
+                    # Validate image quality BEFORE calling AI
+                    if image_bytes:
+                        image_ok, image_issue = ValidationService.validate_image_bytes(image_bytes)
+
+                if not image_ok:
+                    # Return uncertain result without calling AI
+                    result = {
+                        "status": "uncertain",
+                        "confidence": 0.2,
+                        "reasoning": f"Image quality issue: {image_issue}",
+                        "visual_assessment": None,
+                        "signals_agree": None,
+                        "primary_concern": "visual",
+                        "recommended_action": "Retake photo with better lighting/focus and retry analysis",
+                        "tokensUsed": 0,
+                        "cost": "0.000000"
+                    }
+                    
+                    # Add metadata
+                    result["id"] = scenario["id"]
+                    result["timestamp"] = scenario["timestamp"]
+                    result["location"] = scenario.get("location", "Unknown Location")
+                    result["camera_id"] = scenario.get("camera_id", "Unknown Camera")
+                    result["sensorData"] = {
+                        "temperature": scenario["temperature"],
+                        "humidity": scenario["humidity"],
+                        "co2": scenario["co2"],
+                        "soilMoisture": scenario["soilMoisture"]
+                    }
+                    result["image"] = image_name
+                    
+                    if "pagerAlert" in scenario:
+                        result["pagerAlert"] = scenario["pagerAlert"]
+                    
+                    self._record(result)
+                    self.completed += 1
+                    logger.info("Completed analysis %d/%d: %s (image quality failure)", self.completed, self.total, scenario["id"])
+                    continue
                 
                 # Check for missing sensors
                 if scenario.get("temperature") is None:
@@ -166,37 +267,47 @@ class MockAnalyzer:
                         "co2": scenario["co2"],
                         "soilMoisture": scenario["soilMoisture"]
                     }
-                    result["image"] = scenario["image"]
+                    result["image"] = image_name
                     
                     if "pagerAlert" in scenario:
                         result["pagerAlert"] = scenario["pagerAlert"]
                     
-                    self.results.append(result)
+                    self._record(result)
                     self.completed += 1
-                    logger.info(f"Completed analysis {self.completed}/{self.total}: {scenario['id']} (missing sensor)")
+                    logger.info("Completed analysis %d/%d: %s (missing sensor)", self.completed, self.total, scenario["id"])
                     continue
                 
                 # Analyze with AI
                 from datetime import datetime
                 timestamp = datetime.fromisoformat(scenario["timestamp"].replace('Z', '+00:00'))
                 ctx = get_24h_context(timestamp)
+                # Baselines live on the location's shard worker when sharding is on
+                anomaly = await anomaly_context_sharded(scenario.get("location"), timestamp, scenario)
                 
-                result = await service.analyze_greenhouse(
-                    sensor_data={
-                        "timestamp": scenario["timestamp"],
-                        "temperature": scenario["temperature"],
-                        "humidity": scenario["humidity"],
-                        "co2": scenario["co2"],
-                        "soil_moisture": scenario["soilMoisture"]
-                    },
-                    historical={
-                        "avgTemp": ctx.avgTemp,
-                        "trend": ctx.trend,
-                        "alerts": ctx.alerts
-                    },
-                    image_bytes=image_bytes,
-                    image_mime_type="image/jpeg"
-                )
+                try:
+                    result = await service.analyze_greenhouse(
+                        sensor_data={
+                            "timestamp": scenario["timestamp"],
+                            "temperature": scenario["temperature"],
+                            "humidity": scenario["humidity"],
+                            "co2": scenario["co2"],
+                            "soil_moisture": scenario["soilMoisture"]
+                        },
+                        historical={
+                            "avgTemp": ctx.avgTemp,
+                            "trend": ctx.trend,
+                            "alerts": ctx.alerts,
+                            "anomaly": anomaly
+                        },
+                        image_bytes=image_bytes,
+                        image_mime_type="image/jpeg"
+                    )
+                except ModelUnavailable as e:
+                    logger.warning("Model unavailable for %s, using rule-based fallback: %s", scenario["id"], e)
+                    result = self._fallback_result(scenario, "AI unavailable")
+                except PromptBudgetExceeded as e:
+                    logger.warning("Prompt for %s over token budget, using rule-based fallback: %s", scenario["id"], e)
+                    result = self._fallback_result(scenario, "AI skipped (prompt over token budget)")
                 
                 # Add metadata
                 result["id"] = scenario["id"]
@@ -209,33 +320,41 @@ class MockAnalyzer:
                     "co2": scenario["co2"],
                     "soilMoisture": scenario["soilMoisture"]
                 }
-                result["image"] = scenario["image"]
+                result["image"] = image_name
                 
                 # Add pager alert if present
                 if "pagerAlert" in scenario:
                     result["pagerAlert"] = scenario["pagerAlert"]
                 
                 # Store result
-                self.results.append(result)
+                self._record(result)
                 self.completed += 1
                 
-                logger.info(f"Completed analysis {self.completed}/{self.total}: {scenario['id']}")
+                logger.info("Completed analysis %d/%d: %s", self.completed, self.total, scenario["id"])
                 
-            # Save results to file
-            results_file = self.mock_data_path / "analyzed_results.json"
-            with open(results_file, 'w') as f:
-                json.dump(self.results, f, indent=2, default=str)
+            # Every result of the run was streamed to the file as it was recorded
+            completed_run = True
             
         except Exception as e:
             logger.exception(f"Error processing scenarios: {e}")
         finally:
+            try:
+                self._close_results_file(keep=completed_run)
+            except OSError as e:
+                logger.warning(f"Could not save analysis results: {e}")
             self.is_processing = False
 
 
 # Global instance
-_analyzer = MockAnalyzer()
+_analyzer: Optional[MockAnalyzer] = None
+_analyzer_lock = threading.Lock()
 
 
 def get_analyzer() -> MockAnalyzer:
-    """Get global analyzer instance"""
+    """Get global analyzer instance (cached results are loaded on first use)"""
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                _analyzer = MockAnalyzer()
     return _analyzer
@@ -1,19 +1,23 @@
 from __future__ import annotations
 
-import base64
-import json
 import logging
 import os
-import re
+import threading
 from typing import Optional
 
-from openai import AsyncOpenAI
-
+from services.prompt_builder import build_prompt
+from services.structured_output import OutputParseError, parse_model_output, response_format
 from utils.cost_tracker import calculate_cost
+from utils.logging_config import LazyStr, payload_log_sampled
+from utils.metrics import MODEL_CALLS, stage
 
 logger = logging.getLogger(__name__)
 
 
+class ModelUnavailable(RuntimeError):
+    """The model call failed (transport/API error); nothing was billed."""
+
+
 class OpenAIService:
     """Service for interacting with OpenAI (vision-capable) models."""
 
@@ -22,37 +26,43 @@ class OpenAIService:
         if not api_key:
             raise ValueError("Missing OPENAI_API_KEY. Set it in api/.env or environment.")
 
+        # Imported here: the SDK is the slowest import in the app (~0.5s)
+        from openai import AsyncOpenAI
+
         self.client = AsyncOpenAI(api_key=api_key)
         self.model = os.getenv("OPENAI_MODEL", "gpt-5-nano")
         self.temperature = float(os.getenv("OPENAI_TEMPERATURE", "0.3"))
         self.max_output_tokens = int(os.getenv("OPENAI_MAX_TOKENS", "300"))
+        # Output cap used when the budget controller degrades to compact calls
+        self.compact_max_output_tokens = int(os.getenv("OPENAI_COMPACT_MAX_TOKENS", "150"))
+        # JSON-schema constrained replies (generated from AnalysisResult)
+        self.structured_output = os.getenv("OPENAI_STRUCTURED_OUTPUT", "true").lower() == "true"
+
+    def _usage_info(self, response, prompt_tokens_estimate: int) -> dict:
+        """Real prompt/completion split; cached prompt tokens are priced separately."""
+        usage = response.usage
+        prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+        completion_tokens = int(getattr(usage, "completion_tokens", 0) or 0)
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = int(getattr(details, "cached_tokens", 0) or 0)
+        model = getattr(response, "model", None) or self.model
+        return {
+            "tokensUsed": usage.total_tokens or prompt_tokens + completion_tokens,
+            "promptTokens": prompt_tokens,
+            "completionTokens": completion_tokens,
+            "cachedTokens": cached_tokens,
+            "promptTokensEstimate": prompt_tokens_estimate,
+            "model": model,
+            "cost": calculate_cost(model, prompt_tokens, completion_tokens, cached_tokens),
+        }
 
-    @staticmethod
-    def _encode_image_bytes(image_bytes: bytes) -> str:
-        return base64.b64encode(image_bytes).decode("utf-8")
-
-    @staticmethod
-    def _extract_first_json_object(text: str) -> str:
-        """
-        Best-effort JSON extraction if the model returns extra text.
-        Keeps the service resilient without silently accepting malformed outputs.
-        """
-        text = text.strip()
-        if text.startswith("{") and text.endswith("}"):
-            return text
-
-        # crude but effective for single JSON object responses
-        m = re.search(r"\{[\s\S]*\}", text)
-        if not m:
-            raise json.JSONDecodeError("No JSON object found in output", text, 0)
-        return m.group(0)
-    
     async def analyze_greenhouse(
         self,
         sensor_data: dict,
         historical: dict,
         image_bytes: Optional[bytes] = None,
         image_mime_type: Optional[str] = None,
+        compact: bool = False,
     ) -> dict:
         """
         Analyze greenhouse conditions using OpenAI model (supports vision).
@@ -62,143 +72,110 @@ class OpenAIService:
             historical: 24h historical context
             image_bytes: Optional raw bytes of plant image
             image_mime_type: Optional mime type (e.g. image/jpeg)
+            compact: Budget-saving mode - sensor-only with a lower output cap
             
         Returns:
-            dict: Analysis result with status, confidence, reasoning, etc.
+            dict: Analysis result with status, confidence, reasoning, etc. (`imageSent`
+            tells whether the image actually went to the model)
+
+        Raises:
+            PromptBudgetExceeded: prompt can't fit OPENAI_PROMPT_TOKEN_BUDGET (nothing sent)
+            ModelUnavailable: the API call failed (callers release the slot and fall back)
         """
         
-        # Build user message content
-        user_content = []
-        
-        # Text content
-        text_content = f"""CURRENT READING:
-Time: {sensor_data.get('timestamp', 'Unknown')}
-Temperature: {sensor_data.get('temperature', 'N/A')}°C
-Humidity: {sensor_data.get('humidity', 'N/A')}%
-CO₂: {sensor_data.get('co2', 'N/A')}ppm
-Soil Moisture: {sensor_data.get('soil_moisture', sensor_data.get('soilMoisture', 'N/A'))}%
-
-CONTEXT (past 24 hours):
-Average temp: {historical.get('avgTemp', 'N/A')}°C
-Trend: {historical.get('trend', 'N/A')}
-Previous alerts: {historical.get('alerts', 0)}
-
-{'VISUAL DATA: Plant image attached for visual inspection.' if image_bytes else 'VISUAL DATA: No image available - sensor-only analysis.'}
-
-Analyze this reading for plant stress indicators.{' Cross-reference sensor data with visual assessment.' if image_bytes else ''}"""
-        
-        user_content.append({
-            "type": "text",
-            "text": text_content
-        })
-        
-        # Add image if provided
-        if image_bytes:
-            base64_image = self._encode_image_bytes(image_bytes)
-            mime = image_mime_type or "image/jpeg"
-            user_content.append({
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:{mime};base64,{base64_image}",
-                    "detail": "low"  # "low" for faster/cheaper, "high" for detailed
-                }
-            })
-        
-        # System prompt
-        system_prompt = """You are a greenhouse monitoring system analyzing sensor data and visual inspection for cherry tomato plants.
-
-CRITICAL INSTRUCTIONS:
-- If any sensor reading is missing or clearly invalid, return status "uncertain"
-- If image is provided but blurry/dark/obstructed, return status "uncertain" and mention image quality issue
-- If sensor data and visual assessment CONFLICT, return status "uncertain" and explain the conflict
-- Consider time of day context (night heat is more concerning)
-- Consider rate of change (sudden vs gradual)
-- If multiple factors conflict, return status "uncertain"
-- Always provide brief reasoning (max 2 sentences)
-- Keep visual_assessment to maximum 25 words
-
-Respond ONLY with valid JSON matching this schema:
-{
-  "status": "normal" | "potential_anomaly" | "uncertain",
-  "confidence": 0.0-1.0,
-  "reasoning": "brief explanation (max 2 sentences)",
-  "primary_concern": "temperature" | "humidity" | "co2" | "soil_moisture" | "visual" | null,
-  "visual_assessment": "max 25 words describing what you observe in the image (or null if no image)" | null,
-  "signals_agree": true | false | null,
-  "recommended_action": "what operator should check" | null
-}"""
-        
+        if compact:
+            image_bytes = None
+
+        # Compact encoding + constant system prefix; trimmed/rerouted to fit the token budget
+        prompt = build_prompt(sensor_data, historical, image_bytes, image_mime_type)
+        if prompt.trimmed:
+            logger.info(
+                "prompt_trimmed",
+                extra={"trimmed": prompt.trimmed, "promptTokensEstimate": prompt.prompt_tokens},
+            )
+        image_bytes = image_bytes if prompt.has_image else None
+
         try:
             logger.info(
                 "openai_request_start",
-                extra={"model": self.model, "hasImage": bool(image_bytes)},
-            )
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_content},
-                ],
-                temperature=self.temperature,
-                max_tokens=self.max_output_tokens,
+                extra={
+                    "model": self.model,
+                    "hasImage": bool(image_bytes),
+                    "promptTokensEstimate": prompt.prompt_tokens,
+                },
             )
+            request = {
+                "model": self.model,
+                "messages": prompt.messages,
+                "temperature": self.temperature,
+                "max_tokens": self.compact_max_output_tokens if compact else self.max_output_tokens,
+            }
+            if self.structured_output:
+                request["response_format"] = response_format()
+            with stage("model_call"):
+                response = await self.client.chat.completions.create(**request)
+
+            choice = response.choices[0]
+            message = choice.message
+            text = getattr(message, "content", None)
+            # Full payload only at DEBUG, sampled; rendered by the log writer thread, not here
+            if payload_log_sampled(logger):
+                logger.debug("openai_raw_response", extra={"response": LazyStr(response), "text": text})
+
+            # Usage is recorded even when parsing fails: the call was paid for
+            usage_info = self._usage_info(response, prompt.prompt_tokens)
+            # False when the prompt builder dropped the image to fit the token budget
+            usage_info["imageSent"] = prompt.has_image
+            try:
+                with stage("response_parse"):
+                    result = parse_model_output(
+                        text,
+                        structured=self.structured_output,
+                        finish_reason=getattr(choice, "finish_reason", None),
+                        refusal=getattr(message, "refusal", None),
+                    )
+            except OutputParseError as e:
+                MODEL_CALLS.inc("parse_error")
+                logger.warning("openai_output_parse_error", extra={"reason": e.reason, "error": str(e)})
+                return {
+                    "status": "uncertain",
+                    "confidence": 0.1,
+                    "reasoning": "AI response parsing failed; using threshold fallback.",
+                    "primary_concern": None,
+                    "visual_assessment": None,
+                    "signals_agree": None,
+                    "recommended_action": "Manual inspection required",
+                    **usage_info,
+                }
 
-            # Debug: Log the raw response
-            logger.info(f"Raw response: {response}")
-            
-            # Extract text from response - handle different response structures
-            if hasattr(response.choices[0].message, 'content'):
-                text = response.choices[0].message.content
-            elif hasattr(response.choices[0], 'text'):
-                text = response.choices[0].text
-            else:
-                text = str(response.choices[0])
-            
-            logger.info(f"Extracted text: {text}")
-
-            if not text or text.strip() == "":
-                logger.error(f"Empty response - full response object: {response}")
-                raise ValueError("Empty response from OpenAI")
-
-            json_text = self._extract_first_json_object(text)
-            result = json.loads(json_text)
-
-            # Add usage info
-            total_tokens = response.usage.total_tokens
-            result["tokensUsed"] = total_tokens
-            result["cost"] = calculate_cost(total_tokens)
+            result.update(usage_info)
+            MODEL_CALLS.inc("ok")
             logger.info(
                 "openai_request_end",
-                extra={"model": self.model, "tokensUsed": total_tokens},
+                extra={"model": usage_info["model"], "tokensUsed": usage_info["tokensUsed"], "compact": compact},
             )
             return result
             
-        except json.JSONDecodeError as e:
-            # Fallback if GPT doesn't return valid JSON
-            logger.warning("openai_json_decode_error", extra={"error": str(e)})
-            return {
-                "status": "uncertain",
-                "confidence": 0.1,
-                "reasoning": "AI response parsing failed; using threshold fallback.",
-                "primary_concern": None,
-                "visual_assessment": None,
-                "signals_agree": None,
-                "recommended_action": "Manual inspection required",
-                "tokensUsed": 0,
-                "cost": "0.000000"
-            }
-            
         except Exception as e:
-            # Generic error fallback
+            MODEL_CALLS.inc("error")
             logger.exception("openai_api_error", extra={"error": str(e)})
-            return {
-                "status": "uncertain",
-                "confidence": 0.0,
-                "reasoning": f"AI unavailable ({type(e).__name__}); using threshold fallback.",
-                "primary_concern": None,
-                "visual_assessment": None,
-                "signals_agree": None,
-                "recommended_action": "Check system logs and retry",
-                "tokensUsed": 0,
-                "cost": "0.000000"
-            }
+            raise ModelUnavailable(f"{type(e).__name__}: {e}") from e
+
+
+_service: Optional[OpenAIService] = None
+_service_lock = threading.Lock()
+
+
+def get_openai_service() -> OpenAIService:
+    """
+    Get the process-wide service (one AsyncOpenAI client and connection pool).
+
+    Raises:
+        ValueError: missing OPENAI_API_KEY (not cached, so a later call can succeed)
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = OpenAIService()
+    return _service
@@ -0,0 +1,163 @@
+"""
+Priority scheduling for the model worker pool.
+
+Each job gets a cheap pre-score before it is queued (no model call):
+
+    score = PAGER_WEIGHT * pagerAlert + BREACH_WEIGHT * rule breaches + min(|z|, Z_CAP)
+
+and a priority class (critical / elevated / routine). Workers always take the
+highest *effective* score, where effective = score + aging rate * seconds waited.
+Because every queued item ages at the same rate, the effective order is fixed at
+enqueue time (key = aging * t_enqueue - score), so a plain heap is enough and a
+routine item waiting long enough overtakes fresher high-score work (no starvation).
+
+When the queue is full, a critical job evicts the lowest-priority queued routine
+job instead of being rejected. In-flight model calls are never interrupted.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from models.schemas import SensorData
+from services.anomaly_detector import get_detector
+from services.rule_engine import get_rule_engine
+
+CRITICAL = "critical"
+ELEVATED = "elevated"
+ROUTINE = "routine"
+PRIORITY_CLASSES = (CRITICAL, ELEVATED, ROUTINE)
+
+PAGER_WEIGHT = 10.0
+BREACH_WEIGHT = 3.0
+Z_CAP = 6.0
+
+
+@dataclass(frozen=True)
+class Priority:
+    score: float
+    cls: str
+    breaches: int
+    max_abs_z: float
+    pager: bool
+
+
+def score_reading(sensors: SensorData, location: Optional[str] = None) -> Priority:
+    """Pre-score a reading from the rule engine, anomaly baselines and pager flag."""
+    location = location or sensors.location
+    breaches = get_rule_engine().breaches(sensors, zone=location)
+    # score() doesn't fold the reading into the baselines; the pipeline does that later
+    z = get_detector().score(location, sensors.timestamp, sensors).max_abs_z or 0.0
+    pager = bool(sensors.pager_alert)
+
+    score = PAGER_WEIGHT * pager + BREACH_WEIGHT * breaches + min(abs(z), Z_CAP)
+    critical_at = float(os.getenv("PRIORITY_CRITICAL_SCORE", "6"))
+    elevated_at = float(os.getenv("PRIORITY_ELEVATED_SCORE", "2.5"))
+    if pager or score >= critical_at:
+        cls = CRITICAL
+    elif score >= elevated_at:
+        cls = ELEVATED
+    else:
+        cls = ROUTINE
+    return Priority(score=round(score, 3), cls=cls, breaches=breaches, max_abs_z=round(z, 3), pager=pager)
+
+
+class PriorityWorkQueue:
+    """
+    Bounded asyncio priority queue with aging and preemption of routine work.
+
+    `put_nowait` returns the evicted item (if a critical item displaced one) and
+    raises `asyncio.QueueFull` otherwise when at capacity.
+    """
+
+    def __init__(self, maxsize: int, aging_per_second: Optional[float] = None, wait_samples: int = 1000):
+        self.maxsize = maxsize
+        self.aging_per_second = (
+            aging_per_second
+            if aging_per_second is not None
+            else float(os.getenv("PRIORITY_AGING_PER_SECOND", "0.1"))
+        )
+        self._heap: List[Tuple[float, int, Priority, float, Any]] = []
+        self._removed: set = set()
+        self._seq = itertools.count()
+        self._size = 0
+        # One permit per live item; an eviction swaps one item for another
+        self._items = asyncio.Semaphore(0)
+        self._waits: Dict[str, Deque[float]] = {c: deque(maxlen=wait_samples) for c in PRIORITY_CLASSES}
+        self._dequeued: Dict[str, int] = dict.fromkeys(PRIORITY_CLASSES, 0)
+        self._preempted: Dict[str, int] = dict.fromkeys(PRIORITY_CLASSES, 0)
+
+    def qsize(self) -> int:
+        return self._size
+
+    def depth_by_class(self) -> Dict[str, int]:
+        depth = dict.fromkeys(PRIORITY_CLASSES, 0)
+        for _, seq, priority, _, _ in self._heap:
+            if seq not in self._removed:
+                depth[priority.cls] += 1
+        return depth
+
+    def put_nowait(self, item: Any, priority: Priority) -> Optional[Any]:
+        evicted = None
+        if self._size >= self.maxsize:
+            if priority.cls != CRITICAL:
+                raise asyncio.QueueFull
+            evicted = self._evict_routine()
+            if evicted is None:
+                raise asyncio.QueueFull
+
+        now = time.monotonic()
+        heapq.heappush(self._heap, (self.aging_per_second * now - priority.score, next(self._seq), priority, now, item))
+        if evicted is None:
+            self._size += 1
+            self._items.release()
+        return evicted
+
+    def _evict_routine(self) -> Optional[Any]:
+        # Lowest effective priority = largest key among live routine entries
+        candidates = [e for e in self._heap if e[1] not in self._removed and e[2].cls == ROUTINE]
+        if not candidates:
+            return None
+        victim = max(candidates, key=lambda e: e[0])
+        self._removed.add(victim[1])
+        self._preempted[ROUTINE] += 1
+        return victim[4]
+
+    async def get(self) -> Tuple[Any, Priority, float]:
+        """Wait for and pop the best item; returns (item, priority, queue wait seconds)."""
+        await self._items.acquire()
+        while True:
+            _, seq, priority, enqueued, item = heapq.heappop(self._heap)
+            if seq not in self._removed:
+                break
+            self._removed.discard(seq)
+        self._size -= 1
+
+        waited = time.monotonic() - enqueued
+        self._waits[priority.cls].append(waited)
+        self._dequeued[priority.cls] += 1
+        return item, priority, waited
+
+    def wait_stats(self) -> Dict[str, dict]:
+        """Queue-wait time per priority class (recent samples)."""
+        stats = {}
+        depth = self.depth_by_class()
+        for cls in PRIORITY_CLASSES:
+            samples = sorted(self._waits[cls])
+            entry = {
+                "queued": depth[cls],
+                "dequeued": self._dequeued[cls],
+                "preempted": self._preempted[cls],
+            }
+            if samples:
+                entry["waitMsAvg"] = round(sum(samples) / len(samples) * 1000, 1)
+                entry["waitMsP95"] = round(samples[min(len(samples) - 1, int(0.95 * len(samples)))] * 1000, 1)
+                entry["waitMsMax"] = round(samples[-1] * 1000, 1)
+            stats[cls] = entry
+        return stats
@@ -0,0 +1,285 @@
+"""
+Prompt construction and local token budgeting for the model call.
+
+The system prompt is a module constant and always the first message, so every
+request shares a byte-identical prefix (provider-side prompt caching applies once
+it is long enough). Per-reading data goes into a compact key=value user message
+that the system prompt documents once, instead of a prose template per call.
+
+Tokens are counted locally before sending (tiktoken when installed, otherwise a
+chars/4 estimate) so a request over OPENAI_PROMPT_TOKEN_BUDGET is trimmed -
+anomaly detail, then cached visual text, then the image (rerouted to
+sensor-only) - or rejected with `PromptBudgetExceeded` before any tokens are paid.
+"""
+from __future__ import annotations
+
+import base64
+import math
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List, Optional
+
+SYSTEM_PROMPT = """You are a greenhouse monitoring system analyzing sensor data and visual inspection for cherry tomato plants.
+
+INPUT: now=reading (T C, H %, CO2 ppm, SM soil moisture %, "-" missing); 24h=context; z=anomaly z vs baseline/same hour (|z|>=3 unusual); img=attached|none|cached(age) last camera assessment
+
+CRITICAL INSTRUCTIONS:
+- If any sensor reading is missing or clearly invalid, return status "uncertain"
+- If image is provided but blurry/dark/obstructed, return status "uncertain" and mention image quality issue
+- If sensor data and visual assessment CONFLICT, return status "uncertain" and explain the conflict
+- Consider time of day context (night heat is more concerning)
+- Consider rate of change (sudden vs gradual)
+- If multiple factors conflict, return status "uncertain"
+- Always provide brief reasoning (max 2 sentences)
+- Keep visual_assessment to maximum 25 words
+
+Respond ONLY with one JSON object:
+{"status": "normal"|"potential_anomaly"|"uncertain", "confidence": 0.0-1.0, "reasoning": "max 2 sentences", "primary_concern": "temperature"|"humidity"|"co2"|"soil_moisture"|"visual"|null, "visual_assessment": "max 25 words on the image (null if no image)"|null, "signals_agree": true|false|null, "recommended_action": "what operator should check"|null}"""
+
+# Original prose-schema prompt, used by PROMPT_MODE=verbose
+VERBOSE_SYSTEM_PROMPT = """You are a greenhouse monitoring system analyzing sensor data and visual inspection for cherry tomato plants.
+
+CRITICAL INSTRUCTIONS:
+- If any sensor reading is missing or clearly invalid, return status "uncertain"
+- If image is provided but blurry/dark/obstructed, return status "uncertain" and mention image quality issue
+- If sensor data and visual assessment CONFLICT, return status "uncertain" and explain the conflict
+- Consider time of day context (night heat is more concerning)
+- Consider rate of change (sudden vs gradual)
+- If multiple factors conflict, return status "uncertain"
+- Always provide brief reasoning (max 2 sentences)
+- Keep visual_assessment to maximum 25 words
+
+Respond ONLY with valid JSON matching this schema:
+{
+  "status": "normal" | "potential_anomaly" | "uncertain",
+  "confidence": 0.0-1.0,
+  "reasoning": "brief explanation (max 2 sentences)",
+  "primary_concern": "temperature" | "humidity" | "co2" | "soil_moisture" | "visual" | null,
+  "visual_assessment": "max 25 words describing what you observe in the image (or null if no image)" | null,
+  "signals_agree": true | false | null,
+  "recommended_action": "what operator should check" | null
+}"""
+
+# Chat format overhead: per message + reply priming
+_TOKENS_PER_MESSAGE = 3
+_TOKENS_REPLY = 3
+
+_Z_NAMES = {"temperature": "T", "humidity": "H", "co2": "CO2", "soil_moisture": "SM"}
+
+
+class PromptBudgetExceeded(Exception):
+    """Even the fully trimmed prompt is over the configured token budget."""
+
+    def __init__(self, tokens: int, budget: int):
+        super().__init__(f"Prompt needs ~{tokens} tokens (budget {budget})")
+        self.tokens = tokens
+        self.budget = budget
+
+
+@dataclass
+class BuiltPrompt:
+    messages: List[dict]
+    prompt_tokens: int
+    has_image: bool
+    trimmed: List[str] = field(default_factory=list)
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken  # type: ignore
+    except ImportError:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_text_tokens(text: str) -> int:
+    """Local token count (tiktoken o200k_base if installed, else ~4 chars/token)."""
+    enc = _encoder()
+    if enc is not None:
+        return len(enc.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def image_tokens() -> int:
+    """Billed tokens for one low-detail image (default: *-mini/nano models)."""
+    return int(os.getenv("OPENAI_IMAGE_TOKENS", "2833"))
+
+
+def count_message_tokens(messages: List[dict]) -> int:
+    total = _TOKENS_REPLY
+    for message in messages:
+        total += _TOKENS_PER_MESSAGE
+        content = message["content"]
+        if isinstance(content, str):
+            total += count_text_tokens(content)
+            continue
+        for part in content:
+            if part["type"] == "text":
+                total += count_text_tokens(part["text"])
+            elif part["type"] == "image_url":
+                total += image_tokens()
+    return total
+
+
+@lru_cache(maxsize=1)
+def system_prompt_tokens() -> int:
+    return count_text_tokens(SYSTEM_PROMPT)
+
+
+def _num(value) -> str:
+    if value is None or value == "N/A":
+        return "-"
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
+
+
+def _fmt_z(value) -> str:
+    return "n/a" if value is None else f"{value:+.1f}"
+
+
+def encode_reading(
+    sensor_data: dict,
+    historical: dict,
+    image_mode: str,
+    include_anomaly: bool = True,
+    include_cached_visual: bool = True,
+) -> str:
+    """Compact key=value encoding documented in `SYSTEM_PROMPT`."""
+    soil = sensor_data.get("soil_moisture", sensor_data.get("soilMoisture"))
+    ts = str(sensor_data.get("timestamp") or "-")[:16]  # minute precision is enough
+    lines = [
+        f"now: ts={ts} T={_num(sensor_data.get('temperature'))} H={_num(sensor_data.get('humidity'))} "
+        f"CO2={_num(sensor_data.get('co2'))} SM={_num(soil)}",
+        f"24h: avgT={_num(historical.get('avgTemp'))} trend={historical.get('trend') or 'unknown'} "
+        f"alerts={historical.get('alerts', 0)}",
+    ]
+
+    z_scores = (historical.get("anomaly") or {}).get("zScores") or {}
+    if include_anomaly and z_scores:
+        parts = [
+            f"{_Z_NAMES.get(name, name)}={_fmt_z(z.get('z'))}/{_fmt_z(z.get('hourZ'))}"
+            for name, z in z_scores.items()
+            if z.get("z") is not None or z.get("hourZ") is not None
+        ]
+        if parts:
+            lines.append("z: " + " ".join(parts))
+
+    cached = historical.get("visualAssessment")
+    if image_mode == "attached":
+        lines.append("img: attached")
+    elif cached and include_cached_visual:
+        lines.append(f"img: cached({cached.get('ageMinutes', '?')}m) {cached.get('text')}")
+    else:
+        lines.append("img: none")
+    return "\n".join(lines)
+
+
+def encode_reading_verbose(sensor_data: dict, historical: dict, has_image: bool) -> str:
+    """Original prose prompt (PROMPT_MODE=verbose; kept for comparison)."""
+    anomaly_line = ""
+    z_scores = (historical.get("anomaly") or {}).get("zScores") or {}
+    if z_scores:
+        parts = [f"{name} {_fmt_z(z.get('z'))}/{_fmt_z(z.get('hourZ'))}" for name, z in z_scores.items()]
+        anomaly_line = f"\nAnomaly z-scores (vs running baseline / same hour): {', '.join(parts)}"
+
+    cached_visual = historical.get("visualAssessment")
+    if has_image:
+        visual_line = "VISUAL DATA: Plant image attached for visual inspection."
+    elif cached_visual:
+        visual_line = (
+            f"VISUAL DATA: No new image; latest assessment from this camera "
+            f"({cached_visual.get('ageMinutes', '?')} min ago): {cached_visual.get('text')}"
+        )
+    else:
+        visual_line = "VISUAL DATA: No image available - sensor-only analysis."
+
+    return f"""CURRENT READING:
+Time: {sensor_data.get('timestamp', 'Unknown')}
+Temperature: {sensor_data.get('temperature', 'N/A')}°C
+Humidity: {sensor_data.get('humidity', 'N/A')}%
+CO₂: {sensor_data.get('co2', 'N/A')}ppm
+Soil Moisture: {sensor_data.get('soil_moisture', sensor_data.get('soilMoisture', 'N/A'))}%
+
+CONTEXT (past 24 hours):
+Average temp: {historical.get('avgTemp', 'N/A')}°C
+Trend: {historical.get('trend', 'N/A')}
+Previous alerts: {historical.get('alerts', 0)}{anomaly_line}
+
+{visual_line}
+
+Analyze this reading for plant stress indicators.{' Cross-reference sensor data with visual assessment.' if has_image else ''}"""
+
+
+def _messages(
+    text: str,
+    image_bytes: Optional[bytes],
+    image_mime_type: Optional[str],
+    system_prompt: str = SYSTEM_PROMPT,
+) -> List[dict]:
+    user_content = [{"type": "text", "text": text}]
+    if image_bytes:
+        mime = image_mime_type or "image/jpeg"
+        user_content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:{mime};base64,{base64.b64encode(image_bytes).decode('utf-8')}",
+                "detail": "low",  # "low" for faster/cheaper, "high" for detailed
+            },
+        })
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content},
+    ]
+
+
+def build_prompt(
+    sensor_data: dict,
+    historical: dict,
+    image_bytes: Optional[bytes] = None,
+    image_mime_type: Optional[str] = None,
+    token_budget: Optional[int] = None,
+    mode: Optional[str] = None,
+) -> BuiltPrompt:
+    """
+    Build the chat messages for one reading within the prompt token budget.
+
+    Raises:
+        PromptBudgetExceeded: if even the sensor-only, fully trimmed prompt is too large
+    """
+    budget = token_budget if token_budget is not None else int(os.getenv("OPENAI_PROMPT_TOKEN_BUDGET", "4000"))
+    mode = (mode or os.getenv("PROMPT_MODE", "compact")).lower()
+
+    if mode == "verbose":
+        text = encode_reading_verbose(sensor_data, historical, has_image=bool(image_bytes))
+        messages = _messages(text, image_bytes, image_mime_type, VERBOSE_SYSTEM_PROMPT)
+        return BuiltPrompt(messages, count_message_tokens(messages), has_image=bool(image_bytes))
+
+    # Trim steps, cheapest information loss first
+    steps = [
+        ([], dict(include_anomaly=True, include_cached_visual=True), image_bytes),
+        (["anomaly"], dict(include_anomaly=False, include_cached_visual=True), image_bytes),
+        (["anomaly", "cached_visual"], dict(include_anomaly=False, include_cached_visual=False), image_bytes),
+        (["anomaly", "cached_visual", "image"], dict(include_anomaly=False, include_cached_visual=False), None),
+    ]
+    tokens = 0
+    for trimmed, options, image in steps:
+        if trimmed and trimmed[-1] == "image" and not image_bytes:
+            break
+        text = encode_reading(sensor_data, historical, "attached" if image else "none", **options)
+        # System prompt tokens are constant; only the user message is counted per call
+        tokens = (
+            _TOKENS_REPLY
+            + 2 * _TOKENS_PER_MESSAGE
+            + system_prompt_tokens()
+            + count_text_tokens(text)
+            + (image_tokens() if image else 0)
+        )
+        if budget <= 0 or tokens <= budget:
+            return BuiltPrompt(_messages(text, image, image_mime_type), tokens, has_image=bool(image), trimmed=trimmed)
+    raise PromptBudgetExceeded(tokens, budget)
@@ -0,0 +1,99 @@
+"""
+Compact, bounded in-memory analysis results.
+
+`MockAnalyzer` used to keep every result as a nested dict, repeating the same
+keys, location/camera strings and a `sensorData` dict per entry. Results are
+now held as `ResultRecord`s (`__slots__`, interned repeated strings, the whole
+result encoded once as compact JSON) in a `ResultRing` of fixed capacity.
+Every result is also written to the `ResultsStore` when it is recorded, so
+evicting the oldest record only drops the in-memory copy; lookups by id fall
+back to the store.
+"""
+from __future__ import annotations
+
+import json
+import sys
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from utils.fast_json import dumps, join_array
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class ResultRecord:
+    """
+    One completed analysis.
+
+    The lookup fields are kept as slots (status/location/camera interned); the
+    result itself is encoded once on creation, so serving it never re-encodes
+    and `to_dict()` only decodes when a dict is actually needed.
+    """
+
+    __slots__ = ("id", "timestamp", "status", "location", "camera_id", "json")
+
+    def __init__(self, result: Dict[str, Any]):
+        self.id = result.get("id")
+        self.timestamp = result.get("timestamp")
+        self.status = _intern(result.get("status"))
+        self.location = _intern(result.get("location"))
+        self.camera_id = _intern(result.get("camera_id"))
+        self.json: bytes = dumps(result)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return json.loads(self.json)
+
+
+class ResultRing:
+    """
+    The newest `capacity` results, oldest first.
+
+    `spilled` counts records evicted since the last `clear()` (they remain in
+    the results store). The joined JSON array is cached until the next change;
+    rebuilding it only concatenates the records' encoded bytes.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.spilled = 0
+        self._records: deque = deque(maxlen=self.capacity)
+        self._array: Optional[bytes] = None
+
+    def append(self, result: Dict[str, Any]) -> ResultRecord:
+        record = ResultRecord(result)
+        if len(self._records) == self.capacity:
+            self.spilled += 1
+        self._records.append(record)
+        self._array = None
+        return record
+
+    def extend(self, results: Iterable[Dict[str, Any]]) -> None:
+        for result in results:
+            self.append(result)
+
+    def clear(self) -> None:
+        self._records.clear()
+        self.spilled = 0
+        self._array = None
+
+    def find(self, result_id: str) -> Optional[Dict[str, Any]]:
+        for record in reversed(self._records):
+            if record.id == result_id:
+                return record.to_dict()
+        return None
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [record.to_dict() for record in self._records]
+
+    def json_array(self) -> bytes:
+        if self._array is None:
+            self._array = join_array(record.json for record in self._records)
+        return self._array
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[ResultRecord]:
+        return iter(self._records)
@@ -0,0 +1,322 @@
+"""
+Table-driven threshold rules for the rule-based fallback analysis.
+
+Thresholds are loaded per crop and zone from `config/thresholds.json` and compiled
+into flat rule tables. Single readings are evaluated with plain Python; batches are
+evaluated with NumPy comparison arrays so thousands of readings cost one pass.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import operator
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from models.schemas import SensorData
+
+logger = logging.getLogger(__name__)
+
+# Column order used by the compiled tables and batch matrices.
+FIELDS: Tuple[str, ...] = ("temperature", "humidity", "co2", "soil_moisture")
+
+# (field, bound) -> reasoning template; bound "max" means value > threshold is a breach.
+MESSAGES: Dict[Tuple[str, str], str] = {
+    ("temperature", "max"): "High temperature detected (>{value:g}°C)",
+    ("temperature", "min"): "Low temperature detected (<{value:g}°C)",
+    ("humidity", "max"): "High humidity - fungal risk (>{value:g}%)",
+    ("humidity", "min"): "Low humidity (<{value:g}%)",
+    ("co2", "max"): "High CO₂ detected (>{value:g}ppm)",
+    ("co2", "min"): "Low CO₂ detected (<{value:g}ppm)",
+    ("soil_moisture", "max"): "High soil moisture (>{value:g}%)",
+    ("soil_moisture", "min"): "Low soil moisture (<{value:g}%)",
+}
+
+DEFAULT_THRESHOLDS: Dict[str, Dict[str, float]] = {
+    "temperature": {"min": 15, "max": 35},
+    "humidity": {"max": 85},
+    "co2": {"min": 350},
+    "soil_moisture": {"min": 30},
+}
+
+DEFAULT_CONFIG_PATH = Path(__file__).parent.parent / "config" / "thresholds.json"
+
+Reading = Union[SensorData, Mapping[str, Any]]
+
+_sensor_values = operator.attrgetter(*FIELDS)
+
+
+@dataclass(frozen=True)
+class Rule:
+    field: str
+    bound: str  # "min" | "max"
+    value: float
+    message: str
+
+    @property
+    def column(self) -> int:
+        return FIELDS.index(self.field)
+
+
+@dataclass
+class CompiledRules:
+    """Flat rule table for one (crop, zone) profile."""
+
+    profile: str
+    rules: Tuple[Rule, ...]
+    _arrays: Optional[tuple] = field(default=None, repr=False)
+    _templates: Dict[int, dict] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self) -> None:
+        # (column, is_max, threshold, bit) tuples for the scalar path
+        self.checks = tuple(
+            (r.column, r.bound == "max", r.value, 1 << i) for i, r in enumerate(self.rules)
+        )
+        self.temperature_bits = sum(1 << i for i, r in enumerate(self.rules) if r.field == "temperature")
+
+    def arrays(self):
+        """NumPy views of the rule table (built once, on first batch evaluation)."""
+        if self._arrays is None:
+            import numpy as np
+
+            columns = np.array([r.column for r in self.rules], dtype=np.intp)
+            is_max = np.array([r.bound == "max" for r in self.rules], dtype=bool)
+            thresholds = np.array([r.value for r in self.rules], dtype=np.float64)
+            weights = np.left_shift(np.int64(1), np.arange(len(self.rules), dtype=np.int64))
+            self._arrays = (columns, is_max, thresholds, weights)
+        return self._arrays
+
+    def template(self, mask: int) -> dict:
+        """Result dict (timestamp unset) for a breach bitmask; few distinct patterns occur."""
+        tmpl = self._templates.get(mask)
+        if tmpl is None:
+            if mask:
+                reasoning = " | ".join(r.message for i, r in enumerate(self.rules) if mask >> i & 1)
+                tmpl = _anomaly_result(reasoning, bool(mask & self.temperature_bits), None)
+            else:
+                tmpl = _normal_result(None)
+            self._templates[mask] = tmpl
+        return tmpl
+
+
+def _anomaly_result(reasoning: str, temperature_breach: bool, timestamp: Any) -> dict:
+    return {
+        "status": "potential_anomaly",
+        "confidence": 0.65,
+        "reasoning": reasoning,
+        "primary_concern": "temperature" if temperature_breach else None,
+        "visual_assessment": None,
+        "signals_agree": None,
+        "recommended_action": "Manual inspection recommended",
+        "tokensUsed": 0,
+        "cost": "0.000000",
+        "timestamp": timestamp,
+    }
+
+
+def _normal_result(timestamp: Any) -> dict:
+    return {
+        "status": "normal",
+        "confidence": 0.90,
+        "reasoning": "All sensors within normal ranges",
+        "primary_concern": None,
+        "visual_assessment": None,
+        "signals_agree": None,
+        "recommended_action": None,
+        "tokensUsed": 0,
+        "cost": "0.000000",
+        "timestamp": timestamp,
+    }
+
+
+def _reading_values(reading: Reading) -> Tuple[Tuple[Optional[float], ...], Any]:
+    if isinstance(reading, SensorData):
+        return _sensor_values(reading), reading.timestamp
+
+    values = []
+    for f in FIELDS:
+        v = reading.get(f)
+        if v is None and f == "soil_moisture":
+            v = reading.get("soilMoisture")
+        values.append(None if v is None else float(v))
+    return tuple(values), reading.get("timestamp")
+
+
+class RuleEngine:
+    """Compile threshold profiles and evaluate readings against them."""
+
+    def __init__(self, config: Optional[dict] = None):
+        self.config = config or {"default": DEFAULT_THRESHOLDS}
+        self.default_crop = os.getenv("GREENHOUSE_CROP") or self.config.get("default_crop")
+        self._compiled: Dict[Tuple[Optional[str], Optional[str]], CompiledRules] = {}
+
+    @classmethod
+    def from_file(cls, path: Optional[Union[str, Path]] = None) -> "RuleEngine":
+        path = Path(path or os.getenv("RULES_CONFIG_PATH") or DEFAULT_CONFIG_PATH)
+        try:
+            with open(path, "r") as f:
+                return cls(json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            # The fallback path must always work: degrade to built-in thresholds.
+            logger.warning("rules_config_unavailable", extra={"path": str(path), "error": str(e)})
+            return cls()
+
+    def _zone_overrides(self, crop_cfg: dict, zone: Optional[str]) -> Tuple[Optional[str], dict]:
+        """Longest zone key that prefixes the location (e.g. "Section A" for "Section A - Row 1")."""
+        if not zone:
+            return None, {}
+        zones = crop_cfg.get("zones") or {}
+        matches = [k for k in zones if zone.startswith(k)]
+        if not matches:
+            return None, {}
+        key = max(matches, key=len)
+        return key, zones[key]
+
+    def compile(self, crop: Optional[str] = None, zone: Optional[str] = None) -> CompiledRules:
+        """Resolve default <- crop <- zone thresholds into a flat rule table (cached)."""
+        crop = crop or self.default_crop
+        crop_cfg = (self.config.get("crops") or {}).get(crop, {}) if crop else {}
+        zone_key, zone_cfg = self._zone_overrides(crop_cfg, zone)
+
+        cache_key = (crop, zone_key)
+        compiled = self._compiled.get(cache_key)
+        if compiled is not None:
+            return compiled
+
+        merged: Dict[str, Dict[str, float]] = {}
+        for layer in (self.config.get("default") or DEFAULT_THRESHOLDS, crop_cfg.get("thresholds") or {}, zone_cfg):
+            for fname, bounds in layer.items():
+                merged.setdefault(fname, {}).update(bounds)
+
+        rules = []
+        for fname in FIELDS:
+            for bound in ("max", "min"):
+                value = merged.get(fname, {}).get(bound)
+                if value is None:
+                    continue
+                rules.append(
+                    Rule(
+                        field=fname,
+                        bound=bound,
+                        value=float(value),
+                        message=MESSAGES[(fname, bound)].format(value=value),
+                    )
+                )
+
+        profile = "/".join(p for p in (crop or "default", zone_key) if p)
+        compiled = CompiledRules(profile=profile, rules=tuple(rules))
+        self._compiled[cache_key] = compiled
+        return compiled
+
+    def evaluate(self, reading: Reading, crop: Optional[str] = None, zone: Optional[str] = None) -> dict:
+        """Evaluate one reading (pure Python; no NumPy needed on the single-reading path)."""
+        compiled = self.compile(crop, zone)
+        values, timestamp = _reading_values(reading)
+        result = compiled.template(self._mask(compiled, values)).copy()
+        result["timestamp"] = timestamp
+        return result
+
+    def breaches(self, reading: Reading, crop: Optional[str] = None, zone: Optional[str] = None) -> int:
+        """Number of rules the reading breaches (cheap pre-score for scheduling)."""
+        compiled = self.compile(crop, zone)
+        values, _ = _reading_values(reading)
+        return bin(self._mask(compiled, values)).count("1")
+
+    @staticmethod
+    def _mask(compiled: CompiledRules, values: Sequence[Optional[float]]) -> int:
+        mask = 0
+        for column, is_max, threshold, bit in compiled.checks:
+            v = values[column]
+            if v is not None and ((v > threshold) if is_max else (v < threshold)):
+                mask |= bit
+        return mask
+
+    def evaluate_matrix(
+        self,
+        values,
+        timestamps: Sequence[Any],
+        crop: Optional[str] = None,
+        zone: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        Evaluate an (n, 4) float matrix in `FIELDS` column order (NaN = missing).
+
+        Returns:
+            list of `AnalysisResult`-compatible dicts, in row order
+        """
+        import numpy as np
+
+        compiled = self.compile(crop, zone)
+        values = np.asarray(values, dtype=np.float64)
+        if not compiled.rules:
+            return [_normal_result(ts) for ts in timestamps]
+
+        columns, is_max, thresholds, weights = compiled.arrays()
+        picked = values[:, columns]  # (n, rules)
+        # NaN compares False on both sides, so missing sensors never breach.
+        breach = np.where(is_max, picked > thresholds, picked < thresholds)
+        masks = (breach @ weights).tolist()
+
+        templates = {mask: compiled.template(mask) for mask in set(masks)}
+        out = []
+        append = out.append
+        for mask, ts in zip(masks, timestamps):
+            result = templates[mask].copy()
+            result["timestamp"] = ts
+            append(result)
+        return out
+
+    def evaluate_batch(
+        self,
+        readings: Sequence[Reading],
+        crop: Optional[str] = None,
+        zones: Optional[Sequence[Optional[str]]] = None,
+    ) -> List[dict]:
+        """
+        Evaluate many readings in one vectorised pass per (crop, zone) profile.
+
+        Args:
+            readings: SensorData models or plain dicts (snake_case or camelCase keys)
+            crop: crop profile (defaults to the configured crop)
+            zones: optional per-reading zone/location, same length as readings
+        """
+        import numpy as np
+
+        rows = [_reading_values(r) for r in readings]
+        timestamps = [ts for _, ts in rows]
+        # None -> NaN when converting to float64
+        matrix = np.array([values for values, _ in rows], dtype=np.float64).reshape(-1, len(FIELDS))
+        n = len(rows)
+
+        if zones is None:
+            return self.evaluate_matrix(matrix, timestamps, crop=crop)
+
+        # Group rows by resolved profile so each group is one vectorised pass.
+        groups: Dict[str, Tuple[Optional[str], List[int]]] = {}
+        for i, zone in enumerate(zones):
+            profile = self.compile(crop, zone).profile
+            groups.setdefault(profile, (zone, []))[1].append(i)
+
+        results: List[Optional[dict]] = [None] * n
+        for zone, idx in groups.values():
+            rows = self.evaluate_matrix(matrix[idx], [timestamps[i] for i in idx], crop=crop, zone=zone)
+            for i, row in zip(idx, rows):
+                results[i] = row
+        return results  # type: ignore[return-value]
+
+
+_engine: Optional[RuleEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_rule_engine() -> RuleEngine:
+    """Get global rule engine instance (config is read once per process)"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RuleEngine.from_file()
+    return _engine
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import hashlib
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Set
+
+
+class HashRing:
+    """
+    Consistent-hash ring with virtual nodes.
+
+    Each node owns `vnodes` points on a 64-bit ring; a key belongs to the first
+    point at or after its hash. Adding or removing a node only moves the keys
+    in the arcs that node gains or loses (about 1/N of them). Hashes are
+    blake2b, not Python's per-process salted `hash()`, so every process agrees
+    on the placement.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 64):
+        self.vnodes = max(1, vnodes)
+        self.nodes: Set[str] = set()
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def add(self, node: str) -> None:
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for i in range(self.vnodes):
+            point = self._hash(f"{node}#{i}")
+            idx = bisect_left(self._points, point)
+            self._points.insert(idx, point)
+            self._owners.insert(idx, node)
+
+    def remove(self, node: str) -> None:
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key: str) -> str:
+        """
+        Node owning `key`.
+
+        Raises:
+            LookupError: the ring has no nodes
+        """
+        if not self._points:
+            raise LookupError("Hash ring is empty")
+        idx = bisect_right(self._points, self._hash(key))
+        return self._owners[idx % len(self._owners)]
+
+    def copy(self) -> "HashRing":
+        ring = HashRing(vnodes=self.vnodes)
+        ring.nodes = set(self.nodes)
+        ring._points = list(self._points)
+        ring._owners = list(self._owners)
+        return ring
+
+    def __len__(self) -> int:
+        return len(self.nodes)
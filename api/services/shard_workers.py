@@ -0,0 +1,718 @@
+"""
+Location-sharded analysis worker processes.
+
+With SHARD_WORKERS=N (> 0) the API process starts N worker processes and sends
+every analysis to one of them, chosen by consistent hashing on the reading's
+location: /api/analyze, analysis jobs, bursts (the frame is picked in the API),
+batches (one request per owning worker) and the mock run's anomaly scoring. A
+location always lands on the same worker, so that worker alone keeps its
+anomaly baselines, cadence state, visual cache and history cache hot. Image
+checks and the rest of the pipeline run on N cores instead of on the API's
+event loop.
+
+Workers share durable state through SQLite: the results store, and the usage
+counters. Sharding requires USAGE_BACKEND=sqlite (workers inherit it from the
+API process, which still calls the model for mock runs); with per-process
+files, every process would enforce its own DAILY_API_LIMIT.
+
+Adding or removing a worker (`add_worker` / `remove_worker`) moves only the
+locations whose ring owner changes. Routing for those locations pauses until
+their in-flight readings finish. Their anomaly baselines and cadence state are
+then exported from the old owner and imported into the new one, so a moved
+location doesn't start cold. A worker that dies is replaced (SHARD_RESPAWN);
+its locations restart cold on their new owner.
+
+Stage metrics (/metrics) of sharded analyses are recorded in the workers, not
+in the API process; `GET /api/shards` aggregates the per-worker counters.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from models.schemas import SensorData
+from services.shard_ring import HashRing
+from utils.usage_store import usage_backend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEY = "default"  # readings without a location
+
+# (sensors, image bytes, image MIME type, image already validated, image perceptual hash)
+AnalyzeRequest = Tuple[SensorData, Optional[bytes], Optional[str], bool, Optional[int]]
+
+
+class ShardUnavailable(RuntimeError):
+    """The worker handling a reading exited before answering."""
+
+
+# --- worker process -------------------------------------------------------------
+
+
+def _worker_main(shard_id: str, requests, replies, concurrency: int, initializer, initargs) -> None:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    from utils.logging_config import configure_logging
+
+    configure_logging()
+    if initializer is not None:
+        initializer(*initargs)
+    asyncio.run(_serve(shard_id, requests, replies, concurrency))
+
+
+async def _serve(shard_id: str, requests, replies, concurrency: int) -> None:
+    from models.schemas import analysis_result_payload
+    from services.analysis_pipeline import analyze_batch, analyze_reading
+    from services.anomaly_detector import get_detector
+    from services.cadence_scheduler import get_scheduler
+    from utils.cost_tracker import get_cost_tracker
+    from utils.rate_limiter import get_rate_limiter, run_periodic_flush
+    from utils.results_store import get_results_store
+
+    stats = {"processed": 0, "errors": 0, "busyS": 0.0}
+    locations: Set[str] = set()
+    slots = asyncio.Semaphore(concurrency)
+    running: Set[asyncio.Task] = set()
+    flusher = asyncio.create_task(run_periodic_flush(extra_flushers=(lambda: get_results_store().flush(),)))
+
+    async def analyze(req_id: int, payload: AnalyzeRequest) -> None:
+        sensors, image_bytes, image_mime, image_validated, image_phash = payload
+        locations.add(sensors.location or DEFAULT_KEY)
+        start = time.perf_counter()
+        try:
+            async with slots:
+                result = await analyze_reading(
+                    sensors,
+                    image_bytes=image_bytes,
+                    image_mime=image_mime,
+                    image_validated=image_validated,
+                    image_phash=image_phash,
+                )
+            replies.put((req_id, True, analysis_result_payload(result)))
+        except ValueError as e:
+            # Missing configuration; the API maps it to a 400 like in-process analysis
+            stats["errors"] += 1
+            replies.put((req_id, False, ("ValueError", str(e))))
+        except Exception as e:
+            stats["errors"] += 1
+            logger.exception("shard_analysis_failed", extra={"shardId": shard_id})
+            replies.put((req_id, False, (type(e).__name__, str(e))))
+        finally:
+            stats["processed"] += 1
+            stats["busyS"] += time.perf_counter() - start
+
+    async def analyze_many(req_id: int, payload: Tuple[Sequence[Any], int]) -> None:
+        items, batch_concurrency = payload
+        locations.update(item.sensors.location or DEFAULT_KEY for item in items)
+        start = time.perf_counter()
+        try:
+            entries = await analyze_batch(items, concurrency=min(batch_concurrency, concurrency))
+            for entry in entries:
+                if entry["ok"]:
+                    entry["result"] = analysis_result_payload(entry["result"])
+                else:
+                    stats["errors"] += 1
+            replies.put((req_id, True, entries))
+        except Exception as e:
+            stats["errors"] += len(items)
+            logger.exception("shard_batch_failed", extra={"shardId": shard_id, "items": len(items)})
+            replies.put((req_id, False, (type(e).__name__, str(e))))
+        finally:
+            stats["processed"] += len(items)
+            stats["busyS"] += time.perf_counter() - start
+
+    def anomaly(payload: Tuple[Optional[str], Any, dict]) -> dict:
+        location, timestamp, values = payload
+        locations.add(location or DEFAULT_KEY)
+        return get_detector().update(location, timestamp, values).to_context()
+
+    def export(keys: Sequence[str]) -> dict:
+        detector, scheduler = get_detector(), get_scheduler()
+        locations.difference_update(keys)
+        return {
+            key: {"anomaly": detector.export_location(key), "cadence": scheduler.sections.get(key)} for key in keys
+        }
+
+    def import_(states: Dict[str, dict]) -> int:
+        detector, scheduler = get_detector(), get_scheduler()
+        for key, state in states.items():
+            if state["anomaly"] is not None:
+                detector.import_location(key, state["anomaly"])
+            if state["cadence"] is not None:
+                scheduler.sections[key] = state["cadence"]
+            locations.add(key)
+        return len(states)
+
+    def snapshot() -> dict:
+        try:
+            import resource
+
+            peak_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        except ImportError:
+            peak_rss_mb = None
+        done = stats["processed"]
+        return {
+            "pid": os.getpid(),
+            "processed": done,
+            "errors": stats["errors"],
+            "inflight": len(running),
+            "avgMs": round(stats["busyS"] / done * 1000, 2) if done else None,
+            "locations": sorted(locations),
+            "peakRssMb": peak_rss_mb,
+        }
+
+    handlers: Dict[str, Callable[[Any], Any]] = {
+        "ping": lambda _: shard_id,
+        "export": export,
+        "import": import_,
+        "stats": lambda _: snapshot(),
+        "anomaly": anomaly,
+    }
+    # Analyses run as tasks; control messages (stats, export) are answered right away, not behind them
+    analyses = {"analyze": analyze, "batch": analyze_many}
+
+    while True:
+        message = await asyncio.to_thread(requests.get)
+        if message is None:
+            break
+        kind, req_id, payload = message
+        if kind in analyses:
+            task = asyncio.create_task(analyses[kind](req_id, payload))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            continue
+        try:
+            replies.put((req_id, True, handlers[kind](payload)))
+        except Exception as e:
+            logger.exception("shard_request_failed", extra={"shardId": shard_id, "kind": kind})
+            replies.put((req_id, False, (type(e).__name__, str(e))))
+
+    await asyncio.gather(*running, return_exceptions=True)
+    flusher.cancel()
+    get_rate_limiter().flush()
+    get_cost_tracker().flush()
+    get_results_store().flush()
+
+
+# --- supervisor (API process) ---------------------------------------------------
+
+
+@dataclass
+class _Worker:
+    shard_id: str
+    process: Any
+    requests: Any
+    routed: int = 0
+    started_at: float = field(default_factory=time.time)
+
+
+class ShardSupervisor:
+    """Starts the worker processes, routes readings by location and moves locations on rebalance."""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        vnodes: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        initializer: Optional[Callable[..., None]] = None,
+        initargs: Tuple = (),
+    ):
+        self.initial_workers = workers if workers is not None else int(os.getenv("SHARD_WORKERS", "0"))
+        self.vnodes = vnodes or int(os.getenv("SHARD_VNODES", "64"))
+        # Readings one worker analyzes concurrently (model calls are I/O bound)
+        self.concurrency = concurrency or int(os.getenv("SHARD_WORKER_CONCURRENCY", "8"))
+        self.respawn = os.getenv("SHARD_RESPAWN", "true").lower() == "true"
+        self.watch_interval = 1.0  # seconds between liveness checks
+        # Run in each worker before it serves (like ProcessPoolExecutor's initializer)
+        self.initializer = initializer
+        self.initargs = initargs
+
+        self.ring = HashRing(vnodes=self.vnodes)
+        self._next_ring: Optional[HashRing] = None
+        self._ctx = mp.get_context("spawn")
+        self._replies = None
+        self._reader: Optional[threading.Thread] = None
+        self._monitor: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: Dict[str, _Worker] = {}
+        self._pending: Dict[int, Tuple[asyncio.Future, str]] = {}
+        self._request_ids = itertools.count()
+        self._shard_ids = itertools.count()
+
+        # location -> worker holding its state; readings in flight per location
+        self._owners: Dict[str, str] = {}
+        self._inflight: Counter = Counter()
+        self._moving: Set[str] = set()
+        self._changed = asyncio.Condition()
+        self._rebalance_lock = asyncio.Lock()
+        self.rebalances: Deque[dict] = deque(maxlen=20)
+        self.recent: Deque[dict] = deque(maxlen=50)
+
+    @property
+    def enabled(self) -> bool:
+        return self.initial_workers > 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self) -> None:
+        """
+        Start the initial workers (no-op when sharding is disabled).
+
+        Raises:
+            ValueError: USAGE_BACKEND is not sqlite (the daily limit wouldn't be shared)
+            ShardUnavailable: a worker failed to start
+        """
+        if self._workers or not self.enabled:
+            return
+        if usage_backend() != "sqlite":
+            raise ValueError(
+                "SHARD_WORKERS > 0 requires USAGE_BACKEND=sqlite so the API process and "
+                "the workers share one daily usage counter"
+            )
+        self._loop = asyncio.get_running_loop()
+        self._replies = self._ctx.Queue()
+        self._reader = threading.Thread(target=self._read_replies, name="shard-replies", daemon=True)
+        self._reader.start()
+        shards = [self._spawn() for _ in range(self.initial_workers)]
+        try:
+            await asyncio.gather(*(self._ping(shard) for shard in shards))
+        except ShardUnavailable:
+            await self.stop()
+            raise
+        for shard in shards:
+            self.ring.add(shard)
+        self._monitor = asyncio.create_task(self._watch())
+        logger.info("shard_workers_started", extra={"workers": len(shards), "vnodes": self.vnodes})
+
+    async def stop(self) -> None:
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+        for shard in list(self._workers):
+            await self._stop_worker(shard)
+        if self._replies is not None:
+            self._replies.put(None)
+            self._reader.join(timeout=5)
+            self._replies = None
+
+    def _spawn(self) -> str:
+        shard = f"shard-{next(self._shard_ids)}"
+        requests = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(shard, requests, self._replies, self.concurrency, self.initializer, self.initargs),
+            name=f"analysis-{shard}",
+            daemon=True,
+        )
+        process.start()
+        self._workers[shard] = _Worker(shard, process, requests)
+        return shard
+
+    async def _stop_worker(self, shard: str) -> None:
+        worker = self._workers.pop(shard)
+        worker.requests.put(None)
+        await asyncio.to_thread(worker.process.join, 10)
+        if worker.process.is_alive():
+            worker.process.terminate()
+        self._fail_pending(shard)
+
+    async def _ping(self, shard: str, timeout: float = 60.0) -> None:
+        """
+        Wait until a new worker serves requests.
+
+        Raises:
+            ShardUnavailable: the worker exited (e.g. an import error) or didn't answer in `timeout`
+        """
+        call = asyncio.ensure_future(self._call(shard, "ping"))
+        deadline = time.monotonic() + timeout
+        while True:
+            done, _ = await asyncio.wait({call}, timeout=0.5)
+            if done:
+                call.result()
+                return
+            process = self._workers[shard].process
+            if not process.is_alive() or time.monotonic() > deadline:
+                call.cancel()
+                raise ShardUnavailable(f"Worker {shard} failed to start (exit code {process.exitcode})")
+
+    def _read_replies(self) -> None:
+        while True:
+            message = self._replies.get()
+            if message is None:
+                return
+            self._loop.call_soon_threadsafe(self._resolve, *message)
+
+    def _resolve(self, req_id: int, ok: bool, payload: Any) -> None:
+        entry = self._pending.pop(req_id, None)
+        if entry is None or entry[0].done():
+            return
+        future, _ = entry
+        if ok:
+            future.set_result(payload)
+        else:
+            kind, message = payload
+            future.set_exception(ValueError(message) if kind == "ValueError" else RuntimeError(f"{kind}: {message}"))
+
+    def _fail_pending(self, shard: str) -> None:
+        for req_id, (future, owner) in list(self._pending.items()):
+            if owner == shard:
+                del self._pending[req_id]
+                if not future.done():
+                    future.set_exception(ShardUnavailable(f"Worker {shard} exited"))
+
+    async def _call(self, shard: str, kind: str, payload: Any = None) -> Any:
+        worker = self._workers.get(shard)
+        if worker is None:
+            raise ShardUnavailable(f"Worker {shard} is not running")
+        req_id = next(self._request_ids)
+        future = self._loop.create_future()
+        self._pending[req_id] = (future, shard)
+        worker.requests.put((kind, req_id, payload))
+        return await future
+
+    @asynccontextmanager
+    async def _routing(self, keys: Iterable[str]) -> AsyncIterator[Dict[str, str]]:
+        """
+        Owner of each location; rebalancing them waits until the block exits.
+
+        Locations that are being moved wait for the handoff first.
+        """
+        keys = set(keys)
+        if self._moving & keys:
+            async with self._changed:
+                await self._changed.wait_for(lambda: not self._moving & keys)
+        # New locations arriving mid-rebalance go straight to their future owner
+        owners = {}
+        for key in keys:
+            ring = self._next_ring if self._next_ring is not None and key not in self._owners else self.ring
+            owners[key] = ring.node_for(key)
+        self._owners.update(owners)
+        self._inflight.update(keys)
+        try:
+            yield owners
+        finally:
+            self._inflight.subtract(keys)
+            done = [key for key in keys if not self._inflight[key]]
+            for key in done:
+                del self._inflight[key]
+            if done:
+                async with self._changed:
+                    self._changed.notify_all()
+
+    def _note_routed(self, shard: str, count: int = 1) -> None:
+        worker = self._workers.get(shard)
+        if worker is not None:
+            worker.routed += count
+
+    def _note_result(self, key: str, shard: str, result: dict) -> None:
+        self.recent.append(
+            {
+                "location": key,
+                "shardId": shard,
+                "status": result.get("status"),
+                "confidence": result.get("confidence"),
+                "timestamp": result.get("timestamp"),
+            }
+        )
+
+    async def analyze(
+        self,
+        sensors: SensorData,
+        image_bytes: Optional[bytes] = None,
+        image_mime: Optional[str] = None,
+        image_validated: bool = False,
+        image_phash: Optional[int] = None,
+    ) -> dict:
+        """
+        Analyze a reading on the worker owning its location.
+
+        Returns:
+            dict compatible with `AnalysisResult` (as `analysis_result_payload`)
+
+        Raises:
+            ValueError: missing OpenAI configuration in the worker
+            ShardUnavailable: the worker exited before answering
+        """
+        key = sensors.location or DEFAULT_KEY
+        async with self._routing([key]) as owners:
+            shard = owners[key]
+            self._note_routed(shard)
+            request: AnalyzeRequest = (sensors, image_bytes, image_mime, image_validated, image_phash)
+            result = await self._call(shard, "analyze", request)
+        self._note_result(key, shard, result)
+        return result
+
+    async def analyze_batch(self, items: Sequence[Any], concurrency: Optional[int] = None) -> List[dict]:
+        """
+        `analyze_batch` with each location's readings sent to its owner.
+
+        Valid items are grouped by owner and each group goes to its worker as one
+        request (one history pass and one OpenAI client per group there). The
+        batch's concurrency cap is split across the groups in proportion to
+        their size, at least one each.
+
+        Returns:
+            one entry per input item, in input order (as `analyze_batch`); a group
+            whose worker exits reports the error on each of its items
+        """
+        concurrency = concurrency or int(os.getenv("BATCH_CONCURRENCY", "8"))
+        out: List[Optional[dict]] = [
+            None if item.error is None else {"index": i, "ok": False, "error": item.error}
+            for i, item in enumerate(items)
+        ]
+        valid = [i for i, item in enumerate(items) if item.error is None]
+        if not valid:
+            return out  # type: ignore[return-value]
+        keys = {i: items[i].sensors.location or DEFAULT_KEY for i in valid}
+
+        async def run_group(shard: str, indexes: List[int]) -> None:
+            share = max(1, concurrency * len(indexes) // len(valid))
+            self._note_routed(shard, len(indexes))
+            try:
+                entries = await self._call(shard, "batch", ([items[i] for i in indexes], share))
+            except (ShardUnavailable, RuntimeError) as e:
+                logger.warning("shard_batch_failed", extra={"shardId": shard, "items": len(indexes), "error": str(e)})
+                entries = [{"ok": False, "error": f"{type(e).__name__}: {e}"} for _ in indexes]
+            for index, entry in zip(indexes, entries):
+                out[index] = {**entry, "index": index}
+                if entry["ok"]:
+                    self._note_result(keys[index], shard, entry["result"])
+
+        async with self._routing(keys.values()) as owners:
+            groups: Dict[str, List[int]] = {}
+            for i in valid:
+                groups.setdefault(owners[keys[i]], []).append(i)
+            await asyncio.gather(*(run_group(shard, indexes) for shard, indexes in groups.items()))
+        return out  # type: ignore[return-value]
+
+    async def update_anomaly(self, location: Optional[str], timestamp: Any, values: dict) -> dict:
+        """`AnomalyDetector.update(...).to_context()` on the worker owning the location."""
+        key = location or DEFAULT_KEY
+        async with self._routing([key]) as owners:
+            return await self._call(owners[key], "anomaly", (location, timestamp, values))
+
+    async def add_worker(self) -> str:
+        """Start one more worker and move the locations it now owns onto it."""
+        async with self._rebalance_lock:
+            shard = self._spawn()
+            try:
+                await self._ping(shard)
+            except ShardUnavailable:
+                await self._stop_worker(shard)
+                raise
+            await self._rebalance(add=shard)
+        return shard
+
+    async def remove_worker(self, shard: str) -> None:
+        """
+        Move a worker's locations to the others, then stop it.
+
+        Raises:
+            KeyError: unknown worker
+            ValueError: it is the last worker
+        """
+        async with self._rebalance_lock:
+            if shard not in self._workers:
+                raise KeyError(shard)
+            if len(self._workers) == 1:
+                raise ValueError("Cannot remove the last shard worker")
+            await self._rebalance(remove=shard)
+            await self._stop_worker(shard)
+
+    async def _rebalance(self, add: Optional[str] = None, remove: Optional[str] = None) -> None:
+        start = time.perf_counter()
+        ring = self.ring.copy()
+        if add is not None:
+            ring.add(add)
+        if remove is not None:
+            ring.remove(remove)
+        moves = {key: (old, ring.node_for(key)) for key, old in self._owners.items() if ring.node_for(key) != old}
+        self._next_ring = ring
+        self._moving = set(moves)
+        try:
+            async with self._changed:
+                await self._changed.wait_for(lambda: not any(self._inflight.get(key) for key in moves))
+            by_pair: Dict[Tuple[str, str], List[str]] = {}
+            for key, pair in moves.items():
+                by_pair.setdefault(pair, []).append(key)
+            cold = 0
+            for (old, new), keys in by_pair.items():
+                if old in self._workers:
+                    await self._call(new, "import", await self._call(old, "export", keys))
+                else:
+                    cold += len(keys)  # owner died; nothing to hand over
+            for key, (_, new) in moves.items():
+                self._owners[key] = new
+            self.ring = ring
+        finally:
+            self._next_ring = None
+            self._moving = set()
+            async with self._changed:
+                self._changed.notify_all()
+        event = {
+            "at": time.time(),
+            "added": add,
+            "removed": remove,
+            "moved": len(moves),
+            "movedCold": cold,
+            "locations": len(self._owners),
+            "durationMs": round((time.perf_counter() - start) * 1000, 1),
+        }
+        self.rebalances.append(event)
+        logger.info("shard_rebalanced", extra=event)
+
+    async def _watch(self) -> None:
+        """Replace workers that exited unexpectedly (their state is lost; locations restart cold)."""
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            try:
+                for shard, worker in list(self._workers.items()):
+                    if worker.process.is_alive():
+                        continue
+                    logger.error("shard_worker_exited", extra={"shardId": shard, "exitCode": worker.process.exitcode})
+                    await self._replace(shard)
+                await self._reconcile()
+            except Exception:
+                # e.g. a worker died mid-handoff; keep watching so later exits are still handled
+                logger.exception("shard_watch_failed")
+
+    async def _replace(self, shard: str) -> None:
+        async with self._rebalance_lock:
+            if shard not in self._workers:
+                return
+            del self._workers[shard]
+            self._fail_pending(shard)
+            replacement = None
+            if self.respawn:
+                replacement = self._spawn()
+                try:
+                    await self._ping(replacement)
+                except ShardUnavailable:
+                    logger.exception("shard_respawn_failed", extra={"shardId": replacement})
+                    await self._stop_worker(replacement)
+                    replacement = None
+            if replacement is not None or len(self.ring) > 1:
+                await self._rebalance(add=replacement, remove=shard)
+
+    async def _reconcile(self) -> None:
+        """Retry placement left behind by a failed rebalance (dead shards on the ring, workers off it)."""
+        async with self._rebalance_lock:
+            orphans = sorted(set(self._workers) - self.ring.nodes)
+            for shard in sorted(self.ring.nodes - set(self._workers)):
+                if not orphans and len(self.ring) == 1:
+                    break
+                await self._rebalance(add=orphans.pop(0) if orphans else None, remove=shard)
+            for shard in orphans:
+                await self._rebalance(add=shard)
+
+    async def status(self) -> dict:
+        """Per-worker counters (queried from each worker), ring placement and recent results."""
+
+        async def worker_stats(shard: str) -> dict:
+            try:
+                return await asyncio.wait_for(self._call(shard, "stats"), 2.0)
+            except (asyncio.TimeoutError, ShardUnavailable, RuntimeError) as e:
+                return {"error": str(e) or type(e).__name__}
+
+        shards = list(self._workers)
+        stats = await asyncio.gather(*(worker_stats(shard) for shard in shards))
+        workers = []
+        for shard, worker_stat in zip(shards, stats):
+            worker = self._workers.get(shard)
+            if worker is None:
+                continue
+            workers.append(
+                {
+                    "shardId": shard,
+                    "alive": worker.process.is_alive(),
+                    "routed": worker.routed,
+                    "startedAt": worker.started_at,
+                    **worker_stat,
+                }
+            )
+        return {
+            "enabled": self.enabled,
+            "workers": workers,
+            "totals": {
+                "workers": len(workers),
+                "processed": sum(w.get("processed", 0) for w in workers),
+                "errors": sum(w.get("errors", 0) for w in workers),
+                "inflight": sum(self._inflight.values()),
+                "locations": len(self._owners),
+            },
+            "ring": {"vnodes": self.vnodes, "nodes": sorted(self.ring.nodes)},
+            "owners": dict(sorted(self._owners.items())),
+            "rebalances": list(self.rebalances),
+            "recent": list(self.recent),
+        }
+
+
+_supervisor: Optional[ShardSupervisor] = None
+
+
+def get_shard_supervisor() -> ShardSupervisor:
+    """Get the process-wide shard supervisor (started by the app lifespan when SHARD_WORKERS > 0)"""
+    global _supervisor
+    if _supervisor is None:
+        _supervisor = ShardSupervisor()
+    return _supervisor
+
+
+async def analyze_sharded(
+    sensors: SensorData,
+    image_bytes: Optional[bytes] = None,
+    image_mime: Optional[str] = None,
+    image_validated: bool = False,
+    image_phash: Optional[int] = None,
+) -> dict:
+    """`analyze_reading` on the location's shard worker, or in this process when sharding is off."""
+    supervisor = get_shard_supervisor()
+    if supervisor.running:
+        return await supervisor.analyze(
+            sensors,
+            image_bytes=image_bytes,
+            image_mime=image_mime,
+            image_validated=image_validated,
+            image_phash=image_phash,
+        )
+    from services.analysis_pipeline import analyze_reading
+
+    return await analyze_reading(
+        sensors,
+        image_bytes=image_bytes,
+        image_mime=image_mime,
+        image_validated=image_validated,
+        image_phash=image_phash,
+    )
+
+
+async def analyze_batch_sharded(items: Sequence[Any], concurrency: Optional[int] = None) -> List[dict]:
+    """`analyze_batch`, with each location's readings analyzed on its shard worker when sharding is on."""
+    supervisor = get_shard_supervisor()
+    if supervisor.running:
+        return await supervisor.analyze_batch(items, concurrency)
+    from services.analysis_pipeline import analyze_batch
+
+    return await analyze_batch(items, concurrency)
+
+
+async def anomaly_context_sharded(location: Optional[str], timestamp: Any, values: dict) -> dict:
+    """Score a reading and fold it into its location's baselines, on the location's shard worker if any."""
+    supervisor = get_shard_supervisor()
+    if supervisor.running:
+        return await supervisor.update_anomaly(location, timestamp, values)
+    from services.anomaly_detector import get_detector
+
+    return get_detector().update(location, timestamp, values).to_context()
@@ -0,0 +1,164 @@
+"""
+Structured model output: JSON schema, parser and parse-failure counters.
+
+The response schema is generated from `AnalysisResult` (only the fields the model
+fills in) and sent as `response_format={"type": "json_schema", "strict": true}`,
+so the reply is a single JSON object that pydantic validates straight from the
+raw text (`model_validate_json`: one pass, no regex, no intermediate `json.loads`).
+
+Without structured output (OPENAI_STRUCTURED_OUTPUT=false) the parser skips any
+prose before the first "{" and decodes exactly one object with
+`JSONDecoder.raw_decode` instead of a greedy regex.
+"""
+from __future__ import annotations
+
+import copy
+import json
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, ValidationError, create_model
+
+from models.schemas import AnalysisResult
+
+# AnalysisResult fields produced by the model (the rest is filled in by the service)
+MODEL_OUTPUT_FIELDS = (
+    "status",
+    "confidence",
+    "reasoning",
+    "primary_concern",
+    "visual_assessment",
+    "signals_agree",
+    "recommended_action",
+)
+
+# Keywords strict structured outputs may reject; pydantic still enforces them on parse
+_UNSUPPORTED_KEYWORDS = ("title", "default", "maxLength", "minimum", "maximum")
+
+ModelOutput = create_model(
+    "ModelOutput",
+    __config__=ConfigDict(extra="ignore"),
+    **{
+        name: (AnalysisResult.model_fields[name].annotation, AnalysisResult.model_fields[name])
+        for name in MODEL_OUTPUT_FIELDS
+    },
+)
+
+_DECODER = json.JSONDecoder()
+
+
+class OutputParseError(ValueError):
+    """The model's reply could not be turned into an analysis result."""
+
+    def __init__(self, reason: str, detail: Optional[str] = None):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+
+
+def _strict(node):
+    if isinstance(node, dict):
+        for key in _UNSUPPORTED_KEYWORDS:
+            node.pop(key, None)
+        if node.get("type") == "object" and "properties" in node:
+            node["additionalProperties"] = False
+            node["required"] = list(node["properties"])
+        for value in node.values():
+            _strict(value)
+    elif isinstance(node, list):
+        for value in node:
+            _strict(value)
+    return node
+
+
+@lru_cache(maxsize=1)
+def _schema() -> dict:
+    return _strict(ModelOutput.model_json_schema())
+
+
+def response_format() -> dict:
+    """`response_format` argument for chat.completions.create (strict JSON schema)."""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "greenhouse_analysis", "strict": True, "schema": copy.deepcopy(_schema())},
+    }
+
+
+class ParseStats:
+    """Parse outcomes per mode (structured / legacy), for failure rates."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, mode: str, outcome: str) -> None:
+        with self._lock:
+            self._counts[(mode, outcome)] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        out = {}
+        for (mode, outcome), n in counts.items():
+            out.setdefault(mode, {"ok": 0, "failures": {}})
+            if outcome == "ok":
+                out[mode]["ok"] = n
+            else:
+                out[mode]["failures"][outcome] = n
+        for stats in out.values():
+            failed = sum(stats["failures"].values())
+            total = stats["ok"] + failed
+            stats["failureRate"] = round(failed / total, 4) if total else 0.0
+        return out
+
+
+parse_stats = ParseStats()
+
+
+def parse_model_output(
+    text: Optional[str],
+    structured: bool,
+    finish_reason: Optional[str] = None,
+    refusal: Optional[str] = None,
+) -> dict:
+    """
+    Validate the model's reply into the `AnalysisResult` output fields.
+
+    Raises:
+        OutputParseError: refusal, empty/truncated reply, no JSON object, or schema mismatch
+    """
+    mode = "structured" if structured else "legacy"
+    try:
+        if refusal:
+            raise OutputParseError("refusal", refusal)
+        if not text or not text.strip():
+            raise OutputParseError("empty")
+        if structured:
+            parsed: BaseModel = ModelOutput.model_validate_json(text)
+        else:
+            start = text.find("{")
+            if start < 0:
+                raise OutputParseError("no_json")
+            obj, _ = _DECODER.raw_decode(text, start)
+            parsed = ModelOutput.model_validate(obj)
+    except OutputParseError as e:
+        parse_stats.record(mode, e.reason)
+        raise
+    except (ValidationError, ValueError) as e:
+        # A cut-off reply is the usual cause of invalid JSON; count it separately
+        if finish_reason == "length":
+            reason = "truncated"
+        elif isinstance(e, ValidationError) and not _is_json_error(e):
+            reason = "schema"
+        else:
+            reason = "invalid_json"
+        parse_stats.record(mode, reason)
+        raise OutputParseError(reason, str(e)[:200])
+
+    parse_stats.record(mode, "ok")
+    return parsed.model_dump()
+
+
+def _is_json_error(e: ValidationError) -> bool:
+    return any(err.get("type") == "json_invalid" for err in e.errors())
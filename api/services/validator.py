@@ -1,8 +1,39 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from typing import Optional, Tuple
 
 from models.schemas import SensorData
+from services.rule_engine import get_rule_engine
+
+
+@dataclass(frozen=True)
+class ImageQuality:
+    """Result of the image quality heuristics (brightness + edge strength)."""
+
+    ok: bool
+    issue: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    brightness: Optional[float] = None
+    edge_mean: Optional[float] = None
+    phash: Optional[int] = None  # 64-bit difference hash, see `dhash`
+
+
+def dhash(gray) -> int:
+    """64-bit difference hash of a grayscale PIL image (robust to small lighting/noise changes)."""
+    small = gray.resize((9, 8))
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
 
 
 class ValidationService:
@@ -34,18 +65,15 @@ class ValidationService:
         return True, None
     
     @staticmethod
-    def validate_image_bytes(image_bytes: Optional[bytes]) -> Tuple[bool, Optional[str]]:
+    def assess_image_bytes(image_bytes: bytes) -> ImageQuality:
         """
-        Validate uploaded image bytes (basic checks + lightweight quality heuristics).
-        
+        Compute the quality heuristics used by `validate_image_bytes`.
+
         Returns:
-            (is_valid, error_message)
+            ImageQuality with brightness/edge metrics and the first failing check (if any)
         """
-        if image_bytes is None:
-            return True, None
-
         if len(image_bytes) > 10 * 1024 * 1024:
-            return False, "Image too large (max 10MB)"
+            return ImageQuality(ok=False, issue="Image too large (max 10MB)")
 
         try:
             # Lazy import: keep app importable even if Pillow isn't installed yet.
@@ -54,79 +82,77 @@ class ValidationService:
             from PIL import Image, ImageFilter, ImageStat
 
             with Image.open(BytesIO(image_bytes)) as img:
-                if img.width < 100 or img.height < 100:
-                    return False, "Image too small (min 100x100 pixels)"
+                width, height = img.width, img.height
+                if width < 100 or height < 100:
+                    return ImageQuality(
+                        ok=False,
+                        issue="Image too small (min 100x100 pixels)",
+                        width=width,
+                        height=height,
+                    )
 
                 gray = img.convert("L").resize((256, 256))
 
-                # Dark image heuristic
-                brightness = ImageStat.Stat(gray).mean[0]
-                if brightness < 25:
-                    return False, "Image too dark for reliable visual assessment"
+            brightness = ImageStat.Stat(gray).mean[0]
+            edges = gray.filter(ImageFilter.FIND_EDGES)
+            edge_mean = ImageStat.Stat(edges).mean[0]
 
-                # Blurry image heuristic via edge strength
-                edges = gray.filter(ImageFilter.FIND_EDGES)
-                edge_mean = ImageStat.Stat(edges).mean[0]
-                if edge_mean < 6:
-                    return False, "Image appears blurry/low-detail for reliable assessment"
+            issue = None
+            # Dark image heuristic
+            if brightness < 25:
+                issue = "Image too dark for reliable visual assessment"
+            # Blurry image heuristic via edge strength
+            elif edge_mean < 6:
+                issue = "Image appears blurry/low-detail for reliable assessment"
 
-            return True, None
+            return ImageQuality(
+                ok=issue is None,
+                issue=issue,
+                width=width,
+                height=height,
+                brightness=brightness,
+                edge_mean=edge_mean,
+                phash=dhash(gray),
+            )
         except ImportError:
             # Degrade gracefully: we can't validate blur/brightness without Pillow.
-            return False, "Image validation unavailable (Pillow not installed)"
+            return ImageQuality(ok=False, issue="Image validation unavailable (Pillow not installed)")
         except Exception as e:
-            return False, f"Invalid image file: {str(e)}"
+            return ImageQuality(ok=False, issue=f"Invalid image file: {str(e)}")
+
+    @staticmethod
+    def validate_image_bytes(image_bytes: Optional[bytes]) -> Tuple[bool, Optional[str]]:
+        """
+        Validate uploaded image bytes (basic checks + lightweight quality heuristics).
+        
+        Returns:
+            (is_valid, error_message)
+        """
+        if image_bytes is None:
+            return True, None
+
+        quality = ValidationService.assess_image_bytes(image_bytes)
+        return quality.ok, quality.issue
     
     @staticmethod
-    def get_fallback_analysis(sensor_data: SensorData) -> dict:
+    def image_phash(image_bytes: bytes) -> Optional[int]:
+        """Perceptual hash only (for images whose quality was already checked)."""
+        try:
+            from io import BytesIO
+
+            from PIL import Image
+
+            with Image.open(BytesIO(image_bytes)) as img:
+                return dhash(img.convert("L").resize((256, 256)))
+        except Exception:
+            return None
+
+    @staticmethod
+    def get_fallback_analysis(sensor_data: SensorData, zone: Optional[str] = None) -> dict:
         """
-        Provide rule-based fallback analysis when AI is unavailable
+        Provide rule-based fallback analysis when AI is unavailable.
+
+        Thresholds come from the crop/zone profile in `config/thresholds.json`;
+        use `get_rule_engine().evaluate_batch(...)` for many readings at once.
         """
-        alerts = []
-        
-        if sensor_data.temperature is not None and sensor_data.temperature > 35:
-            alerts.append("High temperature detected (>35°C)")
-        
-        if sensor_data.temperature is not None and sensor_data.temperature < 15:
-            alerts.append("Low temperature detected (<15°C)")
-        
-        if sensor_data.humidity is not None and sensor_data.humidity > 85:
-            alerts.append("High humidity - fungal risk (>85%)")
-        
-        if sensor_data.co2 is not None and sensor_data.co2 < 350:
-            alerts.append("Low CO₂ detected (<350ppm)")
-        
-        if sensor_data.soil_moisture is not None and sensor_data.soil_moisture < 30:
-            alerts.append("Low soil moisture (<30%)")
-        
-        if len(alerts) > 0:
-            return {
-                "status": "potential_anomaly",
-                "confidence": 0.65,
-                "reasoning": " | ".join(alerts),
-                "primary_concern": (
-                    "temperature"
-                    if sensor_data.temperature is not None
-                    and (sensor_data.temperature > 35 or sensor_data.temperature < 15)
-                    else None
-                ),
-                "visual_assessment": None,
-                "signals_agree": None,
-                "recommended_action": "Manual inspection recommended",
-                "tokensUsed": 0,
-                "cost": "0.000000",
-                "timestamp": sensor_data.timestamp,
-            }
-        
-        return {
-            "status": "normal",
-            "confidence": 0.90,
-            "reasoning": "All sensors within normal ranges",
-            "primary_concern": None,
-            "visual_assessment": None,
-            "signals_agree": None,
-            "recommended_action": None,
-            "tokensUsed": 0,
-            "cost": "0.000000",
-            "timestamp": sensor_data.timestamp,
-        }
+        return get_rule_engine().evaluate(sensor_data, zone=zone)
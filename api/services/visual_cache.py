@@ -0,0 +1,142 @@
+"""
+Per-camera visual assessment cache.
+
+Plant appearance changes over hours, not minutes, yet image tokens dominate the
+cost of an analysis. The latest model `visual_assessment` per camera is kept with
+the image's perceptual hash (dHash) and the reading timestamp. A new image is only
+sent to the model when it differs meaningfully from the cached one (Hamming
+distance > VISUAL_HASH_DISTANCE) or the entry is older than VISUAL_STALE_SECONDS.
+Otherwise, and for sensor-only readings, the cached assessment is passed to the
+model as text.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from services.validator import hamming
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class VisualEntry:
+    assessment: str
+    phash: Optional[int]
+    captured_at: datetime
+
+    def age_seconds(self, now: datetime) -> float:
+        return max((_utc(now) - _utc(self.captured_at)).total_seconds(), 0.0)
+
+    def to_context(self, now: datetime) -> dict:
+        return {"text": self.assessment, "ageMinutes": round(self.age_seconds(now) / 60)}
+
+
+class VisualAssessmentCache:
+    """Latest visual assessment per camera + the decision whether an image needs the model."""
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        stale_seconds: Optional[float] = None,
+        hash_distance: Optional[int] = None,
+    ):
+        self.enabled = (
+            enabled if enabled is not None else os.getenv("VISUAL_CACHE_ENABLED", "true").lower() == "true"
+        )
+        self.stale_seconds = (
+            stale_seconds if stale_seconds is not None else float(os.getenv("VISUAL_STALE_SECONDS", "21600"))
+        )
+        self.hash_distance = hash_distance if hash_distance is not None else int(os.getenv("VISUAL_HASH_DISTANCE", "10"))
+        self._lock = threading.Lock()
+        self._entries: Dict[str, VisualEntry] = {}
+        self.counters = Counter()
+
+    def fresh(self, camera_id: Optional[str], now: datetime) -> Optional[VisualEntry]:
+        """Cached entry for the camera if it is within the staleness window."""
+        if not self.enabled or not camera_id:
+            return None
+        with self._lock:
+            entry = self._entries.get(camera_id)
+        if entry is None or entry.age_seconds(now) > self.stale_seconds:
+            return None
+        return entry
+
+    def reuse_for_image(self, camera_id: Optional[str], phash: Optional[int], now: datetime) -> Optional[VisualEntry]:
+        """
+        Decide whether a new image can be skipped.
+
+        Returns:
+            the cached entry to use instead of the image, or None if the image should
+            go to the model (no entry, stale, unhashable or changed beyond the threshold)
+        """
+        if not self.enabled or not camera_id:
+            return None
+        with self._lock:
+            entry = self._entries.get(camera_id)
+        if entry is None:
+            reason = "no_entry"
+        elif entry.age_seconds(now) > self.stale_seconds:
+            reason = "stale"
+        elif phash is None or entry.phash is None:
+            reason = "no_hash"
+        elif hamming(phash, entry.phash) > self.hash_distance:
+            reason = "image_changed"
+        else:
+            with self._lock:
+                self.counters["imageCallsSaved"] += 1
+            return entry
+        with self._lock:
+            self.counters[f"refresh:{reason}"] += 1
+        return None
+
+    def store(self, camera_id: Optional[str], assessment: Optional[str], phash: Optional[int], captured_at: datetime) -> None:
+        if not self.enabled or not camera_id or not assessment:
+            return
+        with self._lock:
+            self._entries[camera_id] = VisualEntry(assessment=assessment, phash=phash, captured_at=captured_at)
+
+    def note_text_reuse(self) -> None:
+        with self._lock:
+            self.counters["sensorOnlyWithCachedVisual"] += 1
+
+    def snapshot(self, now: Optional[datetime] = None) -> dict:
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            entries = dict(self._entries)
+            counters = dict(self.counters)
+        return {
+            "enabled": self.enabled,
+            "staleSeconds": self.stale_seconds,
+            "hashDistance": self.hash_distance,
+            "counters": counters,
+            "cameras": {
+                camera: {
+                    "assessment": e.assessment,
+                    "phash": f"{e.phash:016x}" if e.phash is not None else None,
+                    "capturedAt": e.captured_at.isoformat(),
+                    "stale": e.age_seconds(now) > self.stale_seconds,
+                }
+                for camera, e in entries.items()
+            },
+        }
+
+
+_cache: Optional[VisualAssessmentCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_visual_cache() -> VisualAssessmentCache:
+    """Get global visual assessment cache instance"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = VisualAssessmentCache()
+    return _cache
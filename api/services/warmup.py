@@ -0,0 +1,143 @@
+"""
+Startup warm-up and readiness.
+
+Importing the app stays cheap (the OpenAI SDK, cached results and history are
+loaded lazily), so the server binds quickly. The lifespan then runs `warm_up`
+in a worker thread to load everything the first request would otherwise pay
+for. `GET /ready` returns 503 until that has finished, so a load balancer only
+routes traffic to a warm instance; `/health` is available right away.
+"""
+from __future__ import annotations
+
+import io
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """Warm-up progress: per-step timings and failures."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ready = False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.steps: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+
+    def mark_ready(self) -> None:
+        with self._lock:
+            self.ready = True
+            self.finished_at = time.time()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            duration = None
+            if self.started_at is not None and self.finished_at is not None:
+                duration = round((self.finished_at - self.started_at) * 1000, 1)
+            return {
+                "ready": self.ready,
+                "warmupMs": duration,
+                "steps": dict(self.steps),
+                "errors": dict(self.errors),
+            }
+
+
+_readiness = Readiness()
+
+
+def get_readiness() -> Readiness:
+    return _readiness
+
+
+def _warm_results_store() -> None:
+    from utils.results_store import get_results_store
+
+    get_results_store()
+
+
+def _warm_history() -> None:
+    from services.context_service import get_24h_context
+
+    get_24h_context(datetime.now(timezone.utc))
+
+
+def _warm_detector() -> None:
+    from services.anomaly_detector import get_detector
+
+    get_detector()
+
+
+def _warm_rules_and_pricing() -> None:
+    from services.rule_engine import get_rule_engine
+    from utils.cost_tracker import get_cost_tracker, get_pricing
+
+    get_rule_engine()
+    get_pricing()
+    get_cost_tracker()
+
+
+def _warm_image_codecs() -> None:
+    # Loads the PIL plugins and filters used by the quality check
+    from PIL import Image, ImageFilter, ImageStat
+
+    Image.init()
+    buf = io.BytesIO()
+    Image.new("RGB", (16, 16), (90, 140, 60)).save(buf, format="JPEG")
+    with Image.open(io.BytesIO(buf.getvalue())) as img:
+        gray = img.convert("L")
+        ImageStat.Stat(gray.filter(ImageFilter.FIND_EDGES))
+
+
+def _warm_openai_client() -> None:
+    if not os.getenv("OPENAI_API_KEY"):
+        return
+    from services.openai_service import get_openai_service
+
+    get_openai_service()
+
+
+def _warm_mock_analyzer() -> None:
+    from services.mock_analyzer import get_analyzer
+
+    get_analyzer()
+
+
+STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("results_store", _warm_results_store),
+    ("history", _warm_history),
+    ("anomaly_detector", _warm_detector),
+    ("rules_pricing", _warm_rules_and_pricing),
+    ("image_codecs", _warm_image_codecs),
+    ("openai_client", _warm_openai_client),
+    ("mock_analyzer", _warm_mock_analyzer),
+]
+
+
+def warm_up(readiness: Optional[Readiness] = None) -> Readiness:
+    """
+    Run every warm-up step (blocking) and mark the instance ready.
+
+    A failing step is logged and reported in `/ready` but does not block
+    readiness; that component is then loaded lazily on first use as before.
+    """
+    readiness = readiness or _readiness
+    readiness.started_at = time.time()
+    if os.getenv("WARMUP_ENABLED", "true").lower() == "true":
+        for name, step in STEPS:
+            t0 = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                readiness.errors[name] = f"{type(e).__name__}: {e}"
+                logger.warning("warmup_step_failed", extra={"step": name, "error": str(e)})
+            readiness.steps[name] = round((time.perf_counter() - t0) * 1000, 1)
+    readiness.mark_ready()
+    logger.info("warmup_complete", extra=readiness.snapshot())
+    return readiness
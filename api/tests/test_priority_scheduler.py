@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from services import priority_scheduler
+from services.priority_scheduler import CRITICAL, ELEVATED, ROUTINE, Priority, PriorityWorkQueue
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(priority_scheduler, "time", clock)
+    return clock
+
+
+def prio(score: float, cls: str = ROUTINE) -> Priority:
+    return Priority(score=score, cls=cls, breaches=0, max_abs_z=0.0, pager=cls == CRITICAL)
+
+
+def drain(queue: PriorityWorkQueue) -> list:
+    async def take_all():
+        return [(await queue.get())[0] for _ in range(queue.qsize())]
+
+    return asyncio.run(take_all())
+
+
+def test_highest_score_first(clock):
+    queue = PriorityWorkQueue(maxsize=10, aging_per_second=0.1)
+    queue.put_nowait("routine", prio(0.5))
+    queue.put_nowait("critical", prio(13.0, CRITICAL))
+    queue.put_nowait("elevated", prio(3.0, ELEVATED))
+
+    assert drain(queue) == ["critical", "elevated", "routine"]
+
+
+def test_equal_scores_are_fifo(clock):
+    queue = PriorityWorkQueue(maxsize=10, aging_per_second=0.1)
+    for name in ("a", "b", "c"):
+        queue.put_nowait(name, prio(1.0))
+        clock.now += 0.001
+
+    assert drain(queue) == ["a", "b", "c"]
+
+
+def test_aging_lets_waiting_routine_work_overtake(clock):
+    queue = PriorityWorkQueue(maxsize=10, aging_per_second=0.1)
+    queue.put_nowait("old routine", prio(0.0))
+    # 30 s later the routine item has aged by 3.0: it beats a fresh 2.5 but not a 3.5
+    clock.now += 30
+    queue.put_nowait("fresh elevated", prio(2.5, ELEVATED))
+    queue.put_nowait("fresh high", prio(3.5, ELEVATED))
+
+    assert drain(queue) == ["fresh high", "old routine", "fresh elevated"]
+
+
+def test_wait_time_is_reported_per_class(clock):
+    queue = PriorityWorkQueue(maxsize=10, aging_per_second=0.1)
+    queue.put_nowait("routine", prio(0.0))
+    clock.now += 2.0
+
+    item, priority, waited = asyncio.run(queue.get())
+
+    assert (item, priority.cls, waited) == ("routine", ROUTINE, 2.0)
+    assert queue.wait_stats()[ROUTINE]["dequeued"] == 1
+
+
+def test_critical_preempts_lowest_routine_when_full(clock):
+    queue = PriorityWorkQueue(maxsize=3, aging_per_second=0.1)
+    queue.put_nowait("routine low", prio(0.2))
+    queue.put_nowait("routine high", prio(1.5))
+    queue.put_nowait("elevated", prio(3.0, ELEVATED))
+
+    evicted = queue.put_nowait("critical", prio(10.0, CRITICAL))
+
+    assert evicted == "routine low"
+    assert queue.qsize() == 3
+    assert drain(queue) == ["critical", "elevated", "routine high"]
+    assert queue.wait_stats()[ROUTINE]["preempted"] == 1
+
+
+def test_preemption_spares_aged_routine_work(clock):
+    queue = PriorityWorkQueue(maxsize=2, aging_per_second=0.1)
+    queue.put_nowait("old", prio(0.5))
+    clock.now += 20  # aged by 2.0
+    queue.put_nowait("new", prio(1.0))
+
+    assert queue.put_nowait("critical", prio(10.0, CRITICAL)) == "new"
+
+
+def test_full_queue_rejects_non_critical(clock):
+    queue = PriorityWorkQueue(maxsize=1, aging_per_second=0.1)
+    queue.put_nowait("routine", prio(0.5))
+
+    with pytest.raises(asyncio.QueueFull):
+        queue.put_nowait("elevated", prio(4.0, ELEVATED))
+
+
+def test_full_queue_without_routine_work_rejects_critical(clock):
+    queue = PriorityWorkQueue(maxsize=1, aging_per_second=0.1)
+    queue.put_nowait("elevated", prio(4.0, ELEVATED))
+
+    with pytest.raises(asyncio.QueueFull):
+        queue.put_nowait("critical", prio(10.0, CRITICAL))
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import sqlite3
+from collections import Counter
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from utils import rate_limiter
+from utils.rate_limiter import RateLimiter, SharedRateLimiter
+from utils.usage_store import SQLiteUsageStore
+
+
+class FakeDate:
+    today_value = date(2025, 1, 15)
+
+    @classmethod
+    def today(cls) -> date:
+        return cls.today_value
+
+
+@pytest.fixture
+def today(monkeypatch):
+    FakeDate.today_value = date(2025, 1, 15)
+    monkeypatch.setattr(rate_limiter, "date", FakeDate)
+    return FakeDate
+
+
+@pytest.fixture
+def limiter(tmp_path, today):
+    return RateLimiter(daily_limit=3, usage_file=str(tmp_path / "usage.json"), section_limit=0)
+
+
+def test_acquire_counts_and_stops_at_limit(limiter):
+    results = [limiter.try_acquire()["allowed"] for _ in range(4)]
+
+    assert results == [True, True, True, False]
+    assert limiter.check_limit()["remaining"] == 0
+
+
+def test_release_refunds_a_slot(limiter):
+    for _ in range(3):
+        limiter.try_acquire()
+    limiter.release()
+
+    status = limiter.try_acquire()
+    assert status["allowed"] and status["calls_today"] == 3
+
+
+def test_section_limit_caps_one_section(tmp_path, today):
+    limiter = RateLimiter(daily_limit=10, usage_file=str(tmp_path / "usage.json"), section_limit=1)
+
+    assert limiter.try_acquire(section="A")["allowed"]
+    assert not limiter.try_acquire(section="A")["allowed"]
+    assert limiter.try_acquire(section="B")["allowed"]
+    assert limiter.check_limit()["calls_today"] == 2
+
+
+def test_counters_reset_at_day_boundary(limiter, today):
+    for _ in range(3):
+        limiter.try_acquire(section="A")
+    assert not limiter.try_acquire()["allowed"]
+
+    today.today_value = date(2025, 1, 16)
+
+    status = limiter.try_acquire(section="A")
+    assert status["allowed"] and status["calls_today"] == 1
+
+
+def test_release_after_day_boundary_never_goes_negative(limiter, today):
+    limiter.try_acquire(section="A")
+    today.today_value = date(2025, 1, 16)
+
+    limiter.release(section="A")
+
+    assert limiter.check_limit()["calls_today"] == 0
+    assert [limiter.try_acquire()["allowed"] for _ in range(4)] == [True, True, True, False]
+
+
+def test_flush_persists_and_reload_resumes_same_day(limiter, tmp_path, today):
+    limiter.try_acquire(section="A")
+    limiter.try_acquire()
+    assert limiter.flush()
+
+    saved = json.loads((tmp_path / "usage.json").read_text())
+    assert saved == {"date": "2025-01-15", "calls": 2, "sections": {"A": 1}}
+    reloaded = RateLimiter(daily_limit=3, usage_file=str(tmp_path / "usage.json"))
+    assert reloaded.check_limit()["calls_today"] == 2
+
+    today.today_value = date(2025, 1, 16)
+    assert reloaded.check_limit()["calls_today"] == 0
+
+
+def test_shared_flush_keeps_the_lease_when_the_store_is_locked(tmp_path, monkeypatch):
+    store = SQLiteUsageStore(str(tmp_path / "usage.db"))
+    limiter = SharedRateLimiter(store=store, daily_limit=10, reserve_batch=4, section_limit=0)
+    limiter.try_acquire()
+    assert store.get(SharedRateLimiter.CALLS_KEY) == 4  # one used, three leased
+
+    def locked(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store, "add", locked)
+    assert not limiter.flush()
+    assert limiter.check_limit()["calls_today"] == 1
+
+    monkeypatch.undo()
+    assert limiter.flush()
+    assert store.get(SharedRateLimiter.CALLS_KEY) == 1
+
+
+def test_periodic_flush_survives_a_failing_flusher(monkeypatch):
+    calls = Counter()
+
+    def locked():
+        calls["limiter"] += 1
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(rate_limiter, "get_rate_limiter", lambda: SimpleNamespace(flush=locked))
+    monkeypatch.setattr(
+        rate_limiter, "get_cost_tracker", lambda: SimpleNamespace(flush=lambda: calls.update(["costs"]))
+    )
+
+    async def run():
+        task = asyncio.create_task(
+            rate_limiter.run_periodic_flush(0.001, extra_flushers=(lambda: calls.update(["extra"]),))
+        )
+        while calls["extra"] < 3:
+            await asyncio.sleep(0.001)
+        task.cancel()
+
+    asyncio.run(asyncio.wait_for(run(), 5))
+
+    assert calls["limiter"] >= 3 and calls["costs"] >= 3
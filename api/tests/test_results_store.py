@@ -0,0 +1,144 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils.results_store import ResultsStore, decode_cursor, encode_cursor
+
+T0 = datetime(2025, 1, 15, 10, 0, tzinfo=timezone.utc)
+
+
+def result(i: int, minutes: int, **fields) -> dict:
+    return {
+        "id": f"r{i}",
+        "timestamp": T0 + timedelta(minutes=minutes),
+        "status": "normal",
+        "confidence": 0.9,
+        "location": "Section A - Row 1",
+        "camera_id": "CAM-A1",
+        **fields,
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"), batch_size=1000)
+    yield store
+    store.close()
+
+
+def ids(page: dict) -> list:
+    return [item["id"] for item in page["items"]]
+
+
+def test_filters_combine(store):
+    store.add_many(
+        [
+            result(1, 0),
+            result(2, 1, status="potential_anomaly"),
+            result(3, 2, location="Section B - Row 1", camera_id="CAM-B1"),
+            result(4, 3, status="potential_anomaly", pagerAlert={"triggered": True}),
+            result(5, 4, status="potential_anomaly", location="Section B - Row 1"),
+        ]
+    )
+
+    assert ids(store.query()) == ["r5", "r4", "r3", "r2", "r1"]
+    assert ids(store.query(location="Section A - Row 1", status="potential_anomaly")) == ["r4", "r2"]
+    assert ids(store.query(camera_id="CAM-B1")) == ["r3"]
+    assert ids(store.query(pager_only=True)) == ["r4"]
+    assert ids(store.query(since=T0 + timedelta(minutes=1), until=T0 + timedelta(minutes=3))) == ["r3", "r2"]
+
+
+def test_same_id_replaces_the_stored_row(store):
+    store.add(result(1, 0))
+    store.add(result(1, 5, status="uncertain"))
+
+    assert store.count() == 1
+    assert store.get("r1")["status"] == "uncertain"
+
+
+def test_keyset_paging_across_equal_timestamps(store):
+    # Seven results in the same millisecond plus older and newer ones
+    store.add_many([result(0, -1)] + [result(i, 0) for i in range(1, 8)] + [result(8, 1)])
+
+    seen, cursor = [], None
+    while True:
+        page = store.query(limit=3, cursor=cursor)
+        seen += ids(page)
+        cursor = page["nextCursor"]
+        if cursor is None:
+            break
+
+    assert seen == ["r8", "r7", "r6", "r5", "r4", "r3", "r2", "r1", "r0"]
+
+
+def test_paging_ignores_rows_added_after_the_first_page(store):
+    store.add_many([result(i, 0) for i in range(1, 5)])
+    first = store.query(limit=2)
+    store.add(result(9, 10))
+
+    assert ids(store.query(limit=10, cursor=first["nextCursor"])) == ["r2", "r1"]
+
+
+def test_raw_items_are_the_stored_json(store):
+    store.add(result(1, 0))
+
+    (item,) = store.query(raw=True)["items"]
+    assert isinstance(item, str) and '"timestamp":"2025-01-15T10:00:00Z"' in item
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(1736935200000, 42)) == (1736935200000, 42)
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor(1, 2)[:-1] + "!", "MTIz", "YTpi"])
+def test_malformed_cursor_raises_value_error(store, cursor):
+    with pytest.raises(ValueError):
+        store.query(cursor=cursor)
+
+
+class FailingConnection:
+    """Runs everything on the real connection but fails batch inserts like a full disk."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.failing = True
+
+    def executemany(self, sql, rows):
+        if not self.failing:
+            return self.conn.executemany(sql, rows)
+        # SQLite rolls back by itself on SQLITE_FULL / IOERR
+        self.conn.execute("ROLLBACK")
+        raise sqlite3.OperationalError("database or disk is full")
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def test_failed_flush_keeps_rows_for_the_next_one(store):
+    conn = store._conn = FailingConnection(store._conn)
+    store.add(result(1, 0))
+    store.add(result(2, 1))
+
+    assert not store.flush()
+    assert store.count() == 0  # the failure is not raised to readers
+    assert store.get("r1") is None
+
+    conn.failing = False
+    assert store.count() == 2
+    assert ids(store.query()) == ["r2", "r1"]
+
+
+def test_pending_rows_are_capped_while_writes_fail(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"), batch_size=2, max_pending=4)
+    conn = store._conn = FailingConnection(store._conn)
+
+    for i in range(10):
+        store.add(result(i, i))
+
+    assert len(store._pending) == 4
+    assert store.dropped == 6
+
+    conn.failing = False
+    assert ids(store.query()) == ["r9", "r8", "r7", "r6"]
+    store.close()
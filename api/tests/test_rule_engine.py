@@ -0,0 +1,110 @@
+import itertools
+from datetime import datetime, timezone
+
+import pytest
+
+from models.schemas import SensorData
+from services.rule_engine import RuleEngine
+
+TS = datetime(2025, 1, 15, 10, 0, tzinfo=timezone.utc)
+
+
+def legacy_fallback(sensor_data: SensorData) -> dict:
+    """ValidationService.get_fallback_analysis before the rule engine replaced it."""
+    alerts = []
+    if sensor_data.temperature is not None and sensor_data.temperature > 35:
+        alerts.append("High temperature detected (>35°C)")
+    if sensor_data.temperature is not None and sensor_data.temperature < 15:
+        alerts.append("Low temperature detected (<15°C)")
+    if sensor_data.humidity is not None and sensor_data.humidity > 85:
+        alerts.append("High humidity - fungal risk (>85%)")
+    if sensor_data.co2 is not None and sensor_data.co2 < 350:
+        alerts.append("Low CO₂ detected (<350ppm)")
+    if sensor_data.soil_moisture is not None and sensor_data.soil_moisture < 30:
+        alerts.append("Low soil moisture (<30%)")
+
+    if alerts:
+        return {
+            "status": "potential_anomaly",
+            "confidence": 0.65,
+            "reasoning": " | ".join(alerts),
+            "primary_concern": (
+                "temperature"
+                if sensor_data.temperature is not None
+                and (sensor_data.temperature > 35 or sensor_data.temperature < 15)
+                else None
+            ),
+            "visual_assessment": None,
+            "signals_agree": None,
+            "recommended_action": "Manual inspection recommended",
+            "tokensUsed": 0,
+            "cost": "0.000000",
+            "timestamp": sensor_data.timestamp,
+        }
+    return {
+        "status": "normal",
+        "confidence": 0.90,
+        "reasoning": "All sensors within normal ranges",
+        "primary_concern": None,
+        "visual_assessment": None,
+        "signals_agree": None,
+        "recommended_action": None,
+        "tokensUsed": 0,
+        "cost": "0.000000",
+        "timestamp": sensor_data.timestamp,
+    }
+
+
+# Values below, at and above each default threshold, plus missing sensors
+GRID = list(
+    itertools.product(
+        (None, 10, 15, 24.5, 35, 36),  # temperature
+        (None, 60, 85, 90),  # humidity
+        (None, 300, 350, 450),  # co2
+        (None, 20, 30, 45),  # soil moisture
+    )
+)
+
+
+def reading(temperature, humidity, co2, soil_moisture) -> SensorData:
+    return SensorData(
+        timestamp=TS, temperature=temperature, humidity=humidity, co2=co2, soil_moisture=soil_moisture
+    )
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.delenv("GREENHOUSE_CROP", raising=False)
+    return RuleEngine()
+
+
+def test_single_reading_matches_legacy_checks(engine):
+    for values in GRID:
+        sensors = reading(*values)
+        assert engine.evaluate(sensors) == legacy_fallback(sensors), values
+
+
+def test_batch_matches_legacy_checks(engine):
+    readings = [reading(*values) for values in GRID]
+
+    assert engine.evaluate_batch(readings) == [legacy_fallback(r) for r in readings]
+
+
+def test_breaches_counts_every_rule(engine):
+    assert engine.breaches(reading(36, 90, 300, 20)) == 4
+    assert engine.breaches(reading(24.5, 60, 450, 45)) == 0
+    assert engine.breaches(reading(None, None, None, None)) == 0
+
+
+def test_zone_override_applies_to_matching_location():
+    engine = RuleEngine(
+        {
+            "default_crop": "tomato",
+            "default": {"temperature": {"min": 15, "max": 35}},
+            "crops": {"tomato": {"thresholds": {}, "zones": {"Section A": {"temperature": {"max": 30}}}}},
+        }
+    )
+    hot = reading(32, 60, 450, 45)
+
+    assert engine.evaluate(hot, zone="Section A - Row 1")["status"] == "potential_anomaly"
+    assert engine.evaluate(hot, zone="Section B - Row 1")["status"] == "normal"
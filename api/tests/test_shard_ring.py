@@ -0,0 +1,65 @@
+from collections import Counter
+
+import pytest
+
+from services.shard_ring import HashRing
+
+KEYS = [f"Section {section} - Row {row}" for section in "ABCDEFGHIJ" for row in range(1, 101)]
+
+
+def placement(ring: HashRing) -> dict:
+    return {key: ring.node_for(key) for key in KEYS}
+
+
+def test_placement_is_deterministic():
+    nodes = ["shard-0", "shard-1", "shard-2"]
+
+    assert placement(HashRing(nodes)) == placement(HashRing(reversed(nodes)))
+
+
+def test_keys_spread_over_all_nodes():
+    counts = Counter(placement(HashRing(["shard-0", "shard-1", "shard-2", "shard-3"])).values())
+
+    assert set(counts) == {"shard-0", "shard-1", "shard-2", "shard-3"}
+    # 64 vnodes per node keep every share within a factor of two of the fair 25 %
+    assert all(len(KEYS) / 8 < count < len(KEYS) / 2 for count in counts.values())
+
+
+def test_adding_a_node_only_moves_keys_onto_it():
+    ring = HashRing(["shard-0", "shard-1", "shard-2"])
+    before = placement(ring)
+
+    ring.add("shard-3")
+    after = placement(ring)
+
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert moved and all(after[key] == "shard-3" for key in moved)
+    assert len(moved) < len(KEYS) / 2
+
+
+def test_removing_a_node_only_moves_its_keys():
+    ring = HashRing(["shard-0", "shard-1", "shard-2"])
+    before = placement(ring)
+
+    ring.remove("shard-1")
+    after = placement(ring)
+
+    assert all(before[key] == "shard-1" for key in KEYS if before[key] != after[key])
+    assert "shard-1" not in after.values()
+
+
+def test_copy_is_independent():
+    ring = HashRing(["shard-0", "shard-1"])
+    copy = ring.copy()
+    copy.add("shard-2")
+
+    assert ring.nodes == {"shard-0", "shard-1"}
+    assert "shard-2" not in placement(ring).values()
+
+
+def test_empty_ring_raises():
+    ring = HashRing(["shard-0"])
+    ring.remove("shard-0")
+
+    with pytest.raises(LookupError):
+        ring.node_for("Section A - Row 1")
@@ -0,0 +1,383 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from models.schemas import SensorData
+from services.shard_ring import HashRing
+from services.analysis_pipeline import BatchItem
+from services.shard_workers import DEFAULT_KEY, ShardSupervisor, ShardUnavailable, _Worker
+
+TS = datetime(2025, 1, 15, 10, 0, tzinfo=timezone.utc)
+LOCATIONS = [f"Section {section} - Row {row}" for section in "ABCDEFGH" for row in range(1, 7)]
+
+
+class FakeProcess:
+    def __init__(self):
+        self.alive = True
+        self.exitcode = None
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+
+class FakeSupervisor(ShardSupervisor):
+    """Workers are in-memory dicts of per-location state instead of processes."""
+
+    def __init__(self, workers: int = 2):
+        super().__init__(workers=workers, vnodes=64, concurrency=1)
+        self.watch_interval = 0.01
+        self.state = {}  # shard -> {location: readings analyzed}
+        self.calls = []  # (shard, kind, location or keys)
+        self.gates = {}  # location -> asyncio.Event holding its analysis
+        self.failing_exports = 0  # next exports that fail as if the old owner died
+        self.requests = []  # analyze payloads
+        self.shares = {}  # shard -> concurrency of its last batch
+
+    def _analyze(self, shard: str, sensors: SensorData) -> dict:
+        key = sensors.location or DEFAULT_KEY
+        self.state[shard][key] = self.state[shard].get(key, 0) + 1
+        return {"status": "normal", "confidence": 0.9, "timestamp": sensors.timestamp, "location": key}
+
+    def _spawn(self) -> str:
+        shard = f"shard-{next(self._shard_ids)}"
+        self._workers[shard] = _Worker(shard, FakeProcess(), requests=None)
+        self.state[shard] = {}
+        return shard
+
+    async def _stop_worker(self, shard: str) -> None:
+        del self._workers[shard]
+        self._fail_pending(shard)
+
+    async def _call(self, shard, kind, payload=None):
+        if shard not in self._workers:
+            raise ShardUnavailable(f"Worker {shard} is not running")
+        if kind == "analyze":
+            key = payload[0].location or DEFAULT_KEY
+            self.calls.append((shard, kind, key))
+            self.requests.append(payload)
+            if key in self.gates:
+                await self.gates[key].wait()
+            return self._analyze(shard, payload[0])
+        if kind == "batch":
+            items, share = payload
+            self.calls.append((shard, kind, [item.sensors.location for item in items]))
+            self.shares[shard] = share
+            return [
+                {"index": i, "ok": True, "result": self._analyze(shard, item.sensors)} for i, item in enumerate(items)
+            ]
+        if kind == "anomaly":
+            location, _, values = payload
+            self.calls.append((shard, kind, location))
+            self.state[shard][location] = self.state[shard].get(location, 0) + 1
+            return {"zScores": {}, "maxAbsZ": values["temperature"]}
+        self.calls.append((shard, kind, payload))
+        if kind == "export":
+            if self.failing_exports:
+                self.failing_exports -= 1
+                raise ShardUnavailable(f"Worker {shard} exited")
+            return {key: self.state[shard].pop(key) for key in payload if key in self.state[shard]}
+        if kind == "import":
+            self.state[shard].update(payload)
+            return len(payload)
+        return shard  # ping
+
+
+async def settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def reading(location: str) -> SensorData:
+    return SensorData(timestamp=TS, temperature=24.0, humidity=65.0, location=location)
+
+
+def owner_after_adding(supervisor: ShardSupervisor, shard: str) -> HashRing:
+    ring = supervisor.ring.copy()
+    ring.add(shard)
+    return ring
+
+
+@pytest.fixture(autouse=True)
+def sqlite_usage(monkeypatch):
+    monkeypatch.setenv("USAGE_BACKEND", "sqlite")
+
+
+def test_start_requires_shared_usage_backend(monkeypatch):
+    monkeypatch.setenv("USAGE_BACKEND", "file")
+    supervisor = FakeSupervisor()
+
+    with pytest.raises(ValueError, match="USAGE_BACKEND=sqlite"):
+        asyncio.run(supervisor.start())
+    assert not supervisor.running
+
+
+def test_location_sticks_to_its_shard():
+    async def scenario():
+        supervisor = FakeSupervisor(workers=3)
+        await supervisor.start()
+        try:
+            for _ in range(3):
+                for location in LOCATIONS:
+                    await supervisor.analyze(reading(location))
+            return supervisor
+        finally:
+            await supervisor.stop()
+
+    supervisor = asyncio.run(scenario())
+
+    for location in LOCATIONS:
+        shard = supervisor.ring.node_for(location)
+        assert supervisor._owners[location] == shard
+        assert supervisor.state[shard][location] == 3
+
+
+def test_add_worker_hands_moved_locations_over():
+    async def scenario():
+        supervisor = FakeSupervisor(workers=2)
+        await supervisor.start()
+        try:
+            for location in LOCATIONS:
+                await supervisor.analyze(reading(location))
+            before = dict(supervisor._owners)
+            shard = await supervisor.add_worker()
+            return supervisor, before, shard
+        finally:
+            await supervisor.stop()
+
+    supervisor, before, shard = asyncio.run(scenario())
+
+    moved = [location for location in LOCATIONS if supervisor._owners[location] != before[location]]
+    assert moved and all(supervisor._owners[location] == shard for location in moved)
+    assert supervisor.state[shard] == {location: 1 for location in moved}
+    event = supervisor.rebalances[-1]
+    assert (event["added"], event["moved"], event["movedCold"]) == (shard, len(moved), 0)
+
+
+def test_readings_for_a_moving_location_wait_for_the_handoff():
+    async def scenario():
+        supervisor = FakeSupervisor(workers=2)
+        await supervisor.start()
+        try:
+            for location in LOCATIONS:
+                await supervisor.analyze(reading(location))
+            next_ring = owner_after_adding(supervisor, "shard-2")
+            moving = next(location for location in LOCATIONS if next_ring.node_for(location) == "shard-2")
+            old_owner = supervisor._owners[moving]
+
+            # A reading in flight on the old owner holds the rebalance back
+            gate = supervisor.gates[moving] = asyncio.Event()
+            in_flight = asyncio.create_task(supervisor.analyze(reading(moving)))
+            await settle()
+            adding = asyncio.create_task(supervisor.add_worker())
+            await settle()
+            assert supervisor._moving == {
+                location for location in LOCATIONS if next_ring.node_for(location) == "shard-2"
+            }
+
+            # The next reading for it waits instead of going to either owner
+            waiting = asyncio.create_task(supervisor.analyze(reading(moving)))
+            await settle()
+            assert not waiting.done()
+            assert supervisor.calls.count((old_owner, "analyze", moving)) == 2
+
+            # A location first seen mid-rebalance goes straight to its future owner
+            fresh = (f"Section Z - Row {row}" for row in range(1, 100))
+            new = next(location for location in fresh if next_ring.node_for(location) == "shard-2")
+            await supervisor.analyze(reading(new))
+            assert not adding.done()
+            assert supervisor._owners[new] == "shard-2"
+
+            gate.set()
+            await asyncio.gather(in_flight, adding, waiting)
+            return supervisor, moving, old_owner
+        finally:
+            await supervisor.stop()
+
+    supervisor, moving, old_owner = asyncio.run(scenario())
+
+    calls = supervisor.calls
+    export = next(i for i, call in enumerate(calls) if call[:2] == (old_owner, "export") and moving in call[2])
+    assert calls.index(("shard-2", "analyze", moving)) > export
+    # Two readings before the handoff, one after it on the new owner
+    assert supervisor.state["shard-2"][moving] == 3
+    assert moving not in supervisor.state[old_owner]
+
+
+def wait_for_rebalance(supervisor: ShardSupervisor, count: int = 1):
+    async def wait():
+        while len(supervisor.rebalances) < count:
+            await asyncio.sleep(0.01)
+
+    return asyncio.wait_for(wait(), 5)
+
+
+def test_dead_worker_is_replaced_and_its_locations_restart_cold():
+    async def scenario():
+        supervisor = FakeSupervisor(workers=2)
+        await supervisor.start()
+        try:
+            for location in LOCATIONS:
+                await supervisor.analyze(reading(location))
+            before = dict(supervisor._owners)
+            supervisor._workers["shard-0"].process.alive = False
+            await wait_for_rebalance(supervisor)
+            return supervisor, before
+        finally:
+            await supervisor.stop()
+
+    supervisor, before = asyncio.run(scenario())
+
+    lost = [location for location in LOCATIONS if before[location] == "shard-0"]
+    event = supervisor.rebalances[-1]
+    assert (event["removed"], event["added"], event["movedCold"]) == ("shard-0", "shard-2", len(lost))
+    assert supervisor.ring.nodes == {"shard-1", "shard-2"}
+    assert set(supervisor._owners.values()) <= {"shard-1", "shard-2"}
+    for location in LOCATIONS:
+        assert supervisor._owners[location] == supervisor.ring.node_for(location)
+    # Only locations handed over from the live worker arrive with state
+    handed_over = {location for location in LOCATIONS if before[location] == "shard-1"}
+    assert set(supervisor.state["shard-2"]) == {
+        location for location in handed_over if supervisor._owners[location] == "shard-2"
+    }
+
+
+def test_dead_worker_without_respawn_shrinks_the_ring(monkeypatch):
+    monkeypatch.setenv("SHARD_RESPAWN", "false")
+
+    async def scenario():
+        supervisor = FakeSupervisor(workers=2)
+        await supervisor.start()
+        try:
+            for location in LOCATIONS:
+                await supervisor.analyze(reading(location))
+            supervisor._workers["shard-1"].process.alive = False
+            await wait_for_rebalance(supervisor)
+            return supervisor
+        finally:
+            await supervisor.stop()
+
+    supervisor = asyncio.run(scenario())
+
+    assert supervisor.ring.nodes == {"shard-0"}
+    assert set(supervisor._owners.values()) == {"shard-0"}
+    assert supervisor.rebalances[-1]["added"] is None
+
+
+def test_watch_survives_a_failed_handoff_and_repairs_the_ring():
+    async def scenario():
+        supervisor = FakeSupervisor(workers=2)
+        await supervisor.start()
+        try:
+            for location in LOCATIONS:
+                await supervisor.analyze(reading(location))
+            supervisor.failing_exports = 1
+            supervisor._workers["shard-0"].process.alive = False
+            # The first handoff to shard-2 fails; the next pass moves shard-0's locations anyway
+            await wait_for_rebalance(supervisor)
+            assert supervisor.failing_exports == 0
+            assert supervisor.ring.nodes == {"shard-1", "shard-2"}
+
+            # Later exits are still replaced
+            supervisor._workers["shard-1"].process.alive = False
+            await wait_for_rebalance(supervisor, 2)
+            return supervisor
+        finally:
+            await supervisor.stop()
+
+    supervisor = asyncio.run(scenario())
+
+    assert supervisor.ring.nodes == {"shard-2", "shard-3"}
+    assert set(supervisor._owners.values()) <= {"shard-2", "shard-3"}
+    assert supervisor.rebalances[-1]["removed"] == "shard-1"
+
+
+def test_burst_frame_metadata_reaches_the_worker():
+    async def scenario():
+        supervisor = FakeSupervisor(workers=2)
+        await supervisor.start()
+        try:
+            await supervisor.analyze(
+                reading("Section A - Row 1"),
+                image_bytes=b"jpeg",
+                image_mime="image/jpeg",
+                image_validated=True,
+                image_phash=42,
+            )
+            return supervisor
+        finally:
+            await supervisor.stop()
+
+    supervisor = asyncio.run(scenario())
+
+    (request,) = supervisor.requests
+    assert request[1:] == (b"jpeg", "image/jpeg", True, 42)
+
+
+def test_batch_goes_to_each_owner_once_in_input_order():
+    items = [BatchItem(sensors=reading(location)) for location in LOCATIONS]
+    items.insert(3, BatchItem(error="bad reading"))
+
+    async def scenario():
+        supervisor = FakeSupervisor(workers=3)
+        await supervisor.start()
+        try:
+            return supervisor, await supervisor.analyze_batch(items, concurrency=12)
+        finally:
+            await supervisor.stop()
+
+    supervisor, entries = asyncio.run(scenario())
+
+    assert [entry["index"] for entry in entries] == list(range(len(items)))
+    assert entries[3] == {"index": 3, "ok": False, "error": "bad reading"}
+    for item, entry in zip(items, entries):
+        if item.error is None:
+            assert entry["ok"] and entry["result"]["location"] == item.sensors.location
+    batches = [call for call in supervisor.calls if call[1] == "batch"]
+    assert sorted(shard for shard, _, _ in batches) == ["shard-0", "shard-1", "shard-2"]
+    for shard, _, locations in batches:
+        assert all(supervisor.ring.node_for(location) == shard for location in locations)
+        assert supervisor._owners[locations[0]] == shard
+    # The cap is split across the groups by size
+    assert sum(supervisor.shares.values()) <= 12
+    assert all(share >= 1 for share in supervisor.shares.values())
+
+
+def test_batch_group_on_a_dead_worker_reports_per_item_errors():
+    items = [BatchItem(sensors=reading(location)) for location in LOCATIONS]
+
+    async def scenario():
+        supervisor = FakeSupervisor(workers=2)
+        await supervisor.start()
+        try:
+            await supervisor._stop_worker("shard-1")  # still on the ring until the monitor notices
+            return supervisor, await supervisor.analyze_batch(items)
+        finally:
+            await supervisor.stop()
+
+    supervisor, entries = asyncio.run(scenario())
+
+    for item, entry in zip(items, entries):
+        if supervisor.ring.node_for(item.sensors.location) == "shard-1":
+            assert not entry["ok"] and entry["error"].startswith("ShardUnavailable")
+        else:
+            assert entry["ok"]
+
+
+def test_anomaly_scoring_runs_on_the_owner():
+    async def scenario():
+        supervisor = FakeSupervisor(workers=3)
+        await supervisor.start()
+        try:
+            context = await supervisor.update_anomaly("Section C - Row 2", TS, {"temperature": 31.0})
+            return supervisor, context
+        finally:
+            await supervisor.stop()
+
+    supervisor, context = asyncio.run(scenario())
+
+    owner = supervisor.ring.node_for("Section C - Row 2")
+    assert context["maxAbsZ"] == 31.0
+    assert [call for call in supervisor.calls if call[1] == "anomaly"] == [(owner, "anomaly", "Section C - Row 2")]
+    assert supervisor._owners["Section C - Row 2"] == owner
+    assert not supervisor._inflight
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from services import structured_output
+from services.structured_output import OutputParseError, ParseStats, parse_model_output, response_format
+
+REPLY = {
+    "status": "potential_anomaly",
+    "confidence": 0.72,
+    "reasoning": "Temperature is rising faster than the 24h trend.",
+    "primary_concern": "temperature",
+    "visual_assessment": "Slight leaf curl on the upper canopy.",
+    "signals_agree": True,
+    "recommended_action": "Open the roof vents",
+}
+
+
+@pytest.fixture(autouse=True)
+def stats(monkeypatch) -> ParseStats:
+    stats = ParseStats()
+    monkeypatch.setattr(structured_output, "parse_stats", stats)
+    return stats
+
+
+def failure(text, structured=True, **kwargs) -> str:
+    with pytest.raises(OutputParseError) as e:
+        parse_model_output(text, structured, **kwargs)
+    return e.value.reason
+
+
+def test_structured_reply_is_validated_as_is(stats):
+    assert parse_model_output(json.dumps(REPLY), structured=True) == REPLY
+    assert stats.snapshot() == {"structured": {"ok": 1, "failures": {}, "failureRate": 0.0}}
+
+
+def test_legacy_reply_skips_prose_and_trailing_text():
+    text = f"Here is my analysis:\n{json.dumps(REPLY)}\nLet me know if you need more {{detail}}."
+
+    assert parse_model_output(text, structured=False) == REPLY
+
+
+def test_extra_keys_are_ignored():
+    assert parse_model_output(json.dumps({**REPLY, "notes": "n/a"}), structured=True) == REPLY
+
+
+@pytest.mark.parametrize("structured", [True, False])
+def test_refusal_wins_over_text(structured):
+    assert failure(json.dumps(REPLY), structured, refusal="I can't help with that") == "refusal"
+
+
+@pytest.mark.parametrize("text", [None, "", "   \n"])
+def test_empty_reply(text):
+    assert failure(text) == "empty"
+
+
+def test_legacy_reply_without_an_object():
+    assert failure("All sensors look fine.", structured=False) == "no_json"
+
+
+@pytest.mark.parametrize("structured", [True, False])
+def test_malformed_json(structured):
+    assert failure('{"status": "normal", "confidence": 0.9,, }', structured) == "invalid_json"
+
+
+@pytest.mark.parametrize("structured", [True, False])
+def test_cut_off_reply_counts_as_truncated(structured):
+    text = json.dumps(REPLY)[:60]
+
+    assert failure(text, structured, finish_reason="length") == "truncated"
+    assert failure(text, structured) == "invalid_json"
+
+
+@pytest.mark.parametrize(
+    "change",
+    [{"status": "fine"}, {"confidence": 1.5}, {"reasoning": "x" * 501}, {"primary_concern": "light"}],
+)
+def test_schema_violations(change):
+    assert failure(json.dumps({**REPLY, **change})) == "schema"
+    assert failure(json.dumps({**REPLY, **change}), structured=False) == "schema"
+
+
+def test_failure_rate_per_mode(stats):
+    parse_model_output(json.dumps(REPLY), structured=True)
+    failure("", structured=True)
+    failure("no json here", structured=False)
+
+    snapshot = stats.snapshot()
+    assert snapshot["structured"] == {"ok": 1, "failures": {"empty": 1}, "failureRate": 0.5}
+    assert snapshot["legacy"] == {"ok": 0, "failures": {"no_json": 1}, "failureRate": 1.0}
+
+
+def test_response_schema_is_strict():
+    schema = response_format()["json_schema"]["schema"]
+
+    assert schema["additionalProperties"] is False
+    assert schema["required"] == list(structured_output.MODEL_OUTPUT_FIELDS)
+    assert "maxLength" not in json.dumps(schema)
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.visual_cache import VisualAssessmentCache
+
+T0 = datetime(2025, 1, 15, 10, 0, tzinfo=timezone.utc)
+HASH = 0x0F0F_0F0F_0F0F_0F0F
+
+
+@pytest.fixture
+def cache() -> VisualAssessmentCache:
+    cache = VisualAssessmentCache(enabled=True, stale_seconds=3600, hash_distance=4)
+    cache.store("CAM-A1", "Healthy foliage", HASH, T0)
+    return cache
+
+
+def test_similar_image_reuses_the_cached_assessment(cache):
+    entry = cache.reuse_for_image("CAM-A1", HASH ^ 0b111, T0 + timedelta(minutes=30))
+
+    assert entry is not None and entry.assessment == "Healthy foliage"
+    assert cache.counters == {"imageCallsSaved": 1}
+
+
+@pytest.mark.parametrize(
+    "camera_id, phash, minutes, reason",
+    [
+        ("CAM-B2", HASH, 5, "no_entry"),
+        ("CAM-A1", HASH, 61, "stale"),
+        ("CAM-A1", None, 5, "no_hash"),
+        ("CAM-A1", HASH ^ 0b11111, 5, "image_changed"),
+    ],
+)
+def test_refresh_reasons(cache, camera_id, phash, minutes, reason):
+    assert cache.reuse_for_image(camera_id, phash, T0 + timedelta(minutes=minutes)) is None
+    assert cache.counters == {f"refresh:{reason}": 1}
+
+
+def test_entry_without_hash_is_never_reused():
+    cache = VisualAssessmentCache(enabled=True, stale_seconds=3600, hash_distance=4)
+    cache.store("CAM-A1", "Healthy foliage", None, T0)
+
+    assert cache.reuse_for_image("CAM-A1", HASH, T0) is None
+    assert cache.counters == {"refresh:no_hash": 1}
+
+
+def test_zero_stale_seconds_disables_reuse(monkeypatch):
+    monkeypatch.setenv("VISUAL_STALE_SECONDS", "21600")
+    cache = VisualAssessmentCache(enabled=True, stale_seconds=0, hash_distance=4)
+    cache.store("CAM-A1", "Healthy foliage", HASH, T0)
+
+    assert cache.stale_seconds == 0
+    assert cache.reuse_for_image("CAM-A1", HASH, T0 + timedelta(seconds=1)) is None
+    assert cache.fresh("CAM-A1", T0 + timedelta(seconds=1)) is None
+
+
+def test_fresh_entry_serves_sensor_only_readings(cache):
+    assert cache.fresh("CAM-A1", T0 + timedelta(minutes=59)).to_context(T0 + timedelta(minutes=59)) == {
+        "text": "Healthy foliage",
+        "ageMinutes": 59,
+    }
+    assert cache.fresh("CAM-A1", T0 + timedelta(minutes=61)) is None
+
+
+def test_disabled_cache_never_reuses():
+    cache = VisualAssessmentCache(enabled=False, stale_seconds=3600, hash_distance=4)
+    cache.store("CAM-A1", "Healthy foliage", HASH, T0)
+
+    assert cache.reuse_for_image("CAM-A1", HASH, T0) is None
+    assert cache.fresh("CAM-A1", T0) is None
+    assert not cache.counters
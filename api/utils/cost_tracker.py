@@ -1,64 +1,249 @@
 from __future__ import annotations
 
 import json
+import logging
 import os
+import threading
 from dataclasses import dataclass
 from datetime import date
+from pathlib import Path
+from typing import Dict, Optional
+
+from utils.atomic_io import atomic_write_json
+from utils.usage_store import SQLiteUsageStore, get_usage_store, usage_backend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRICING_PATH = Path(__file__).parent.parent / "config" / "pricing.json"
 
 
 @dataclass(frozen=True)
 class Pricing:
-    """
-    Approx gpt-5-nano mini pricing (USD per 1M tokens).
-
-    Note: We treat usage as 70% input / 30% output for a simple estimate.
-    """
+    """USD per 1M tokens for one model (cached prompt tokens are billed separately)."""
 
     input_per_1m: float = 0.15
     output_per_1m: float = 0.60
-    assumed_input_ratio: float = 0.70
+    cached_input_per_1m: Optional[float] = None
+
 
+class PricingTable:
+    """Per-model prices from `config/pricing.json`, matched by longest model-name prefix."""
 
-def calculate_cost(tokens: int, pricing: Pricing = Pricing()) -> str:
-    input_tokens = tokens * pricing.assumed_input_ratio
-    output_tokens = tokens * (1.0 - pricing.assumed_input_ratio)
-    cost = (input_tokens * pricing.input_per_1m / 1_000_000) + (
-        output_tokens * pricing.output_per_1m / 1_000_000
-    )
-    return f"{cost:.6f}"
+    def __init__(self, models: Dict[str, Pricing], default: Pricing = Pricing()):
+        self.models = models
+        self.default = default
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None) -> "PricingTable":
+        path = path or os.getenv("MODEL_PRICING_PATH") or str(DEFAULT_PRICING_PATH)
+        try:
+            with open(path, "r") as f:
+                raw = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("pricing_config_unavailable", extra={"path": path, "error": str(e)})
+            return cls({})
+        models = {name: Pricing(**p) for name, p in (raw.get("models") or {}).items()}
+        default = Pricing(**raw["default"]) if raw.get("default") else Pricing()
+        return cls(models, default)
+
+    def for_model(self, model: Optional[str]) -> Pricing:
+        """Exact match, else longest prefix (dated snapshots like gpt-4o-mini-2024-07-18)."""
+        if not model:
+            return self.default
+        if model in self.models:
+            return self.models[model]
+        matches = [name for name in self.models if model.startswith(name)]
+        return self.models[max(matches, key=len)] if matches else self.default
+
+
+_pricing: Optional[PricingTable] = None
+_pricing_lock = threading.Lock()
+
+
+def get_pricing() -> PricingTable:
+    global _pricing
+    if _pricing is None:
+        with _pricing_lock:
+            if _pricing is None:
+                _pricing = PricingTable.from_file()
+    return _pricing
+
+
+def cost_usd(
+    model: Optional[str],
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_tokens: int = 0,
+) -> float:
+    """Cost of one call from the real usage fields (`response.usage`)."""
+    p = get_pricing().for_model(model)
+    cached = min(max(cached_tokens, 0), prompt_tokens)
+    cached_rate = p.cached_input_per_1m if p.cached_input_per_1m is not None else p.input_per_1m
+    return (
+        (prompt_tokens - cached) * p.input_per_1m
+        + cached * cached_rate
+        + completion_tokens * p.output_per_1m
+    ) / 1_000_000
+
+
+def calculate_cost(
+    model: Optional[str],
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_tokens: int = 0,
+) -> str:
+    return f"{cost_usd(model, prompt_tokens, completion_tokens, cached_tokens):.6f}"
+
+
+def _empty_state(day: str) -> dict:
+    return {
+        "date": day,
+        "tokens": 0,
+        "promptTokens": 0,
+        "completionTokens": 0,
+        "calls": 0,
+        "cost": "0.000000",
+        "models": {},
+    }
 
 
 class CostTracker:
-    """Track daily token usage + estimated cost for transparency in the assessment."""
+    """
+    Track daily token usage + cost for transparency in the assessment.
+
+    Usage is aggregated in memory (one instance per process, see `get_cost_tracker`)
+    and written out in batches by `flush()`: to `cost_state.json` with an atomic
+    replace, or, with USAGE_BACKEND=sqlite, as counter deltas to the shared store
+    so several workers can add to it without losing updates.
+    """
 
-    def __init__(self):
+    def __init__(self, store: Optional[SQLiteUsageStore] = None, batch_size: Optional[int] = None):
+        self.store = store or (get_usage_store() if usage_backend() == "sqlite" else None)
         self.state_file = os.path.join(os.path.dirname(__file__), "cost_state.json")
-        self._ensure_file_exists()
+        self.batch_size = batch_size or int(os.getenv("COST_FLUSH_BATCH", "20"))
 
-    def _ensure_file_exists(self) -> None:
-        if not os.path.exists(self.state_file):
-            self._save({"date": str(date.today()), "tokens": 0, "cost": "0.000000"})
+        self._lock = threading.Lock()
+        self._state = self._load()
+        self._pending: Dict[str, int] = {}
+        self._pending_calls = 0
 
     def _load(self) -> dict:
+        today = str(date.today())
+        if self.store is not None:
+            return _empty_state(today)
         try:
             with open(self.state_file, "r") as f:
-                return json.load(f)
+                state = json.load(f)
         except (FileNotFoundError, json.JSONDecodeError):
-            return {"date": str(date.today()), "tokens": 0, "cost": "0.000000"}
-
-    def _save(self, data: dict) -> None:
-        with open(self.state_file, "w") as f:
-            json.dump(data, f)
-
-    def add(self, tokens: int) -> dict:
-        state = self._load()
-        today = str(date.today())
+            return _empty_state(today)
         if state.get("date") != today:
-            state = {"date": today, "tokens": 0, "cost": "0.000000"}
+            return _empty_state(today)
+        merged = _empty_state(today)
+        merged.update(state)
+        merged["_costUsd"] = float(state.get("cost", 0) or 0)
+        return merged
 
-        state["tokens"] = int(state.get("tokens", 0)) + int(tokens)
-        state["cost"] = calculate_cost(state["tokens"])
-        self._save(state)
+    def _roll_day_locked(self) -> dict:
+        today = str(date.today())
+        if self._state.get("date") != today:
+            self._state = _empty_state(today)
+            self._pending.clear()
+            self._pending_calls = 0
+        return self._state
+
+    def record(
+        self,
+        model: Optional[str],
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+    ) -> float:
+        """Add one model call's real usage; returns its cost in USD."""
+        cost = cost_usd(model, prompt_tokens, completion_tokens, cached_tokens)
+        total = prompt_tokens + completion_tokens
+        with self._lock:
+            state = self._roll_day_locked()
+            state["tokens"] += total
+            state["promptTokens"] += prompt_tokens
+            state["completionTokens"] += completion_tokens
+            state["calls"] += 1
+            state["_costUsd"] = state.get("_costUsd", 0.0) + cost
+            state["cost"] = f"{state['_costUsd']:.6f}"
+            per_model = state["models"].setdefault(model or "unknown", {"calls": 0, "tokens": 0, "costUsd": 0.0})
+            per_model["calls"] += 1
+            per_model["tokens"] += total
+            per_model["costUsd"] = round(per_model["costUsd"] + cost, 9)
+
+            for key, delta in (
+                ("tokens", total),
+                ("prompt_tokens", prompt_tokens),
+                ("completion_tokens", completion_tokens),
+                ("cost_nano_usd", round(cost * 1e9)),
+            ):
+                self._pending[key] = self._pending.get(key, 0) + delta
+            self._pending_calls += 1
+            flush_now = self._pending_calls >= self.batch_size
+
+        if flush_now:
+            self.flush()
+        return cost
+
+    def spent_usd(self) -> float:
+        """Today's spend: shared total (sqlite) or this process's total (file), incl. unflushed."""
+        with self._lock:
+            self._roll_day_locked()
+            local = self._state.get("_costUsd", 0.0)
+            pending = self._pending.get("cost_nano_usd", 0) / 1e9
+        if self.store is not None:
+            return self.store.get("cost_nano_usd") / 1e9 + pending
+        return local
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            state = dict(self._roll_day_locked())
+        state.pop("_costUsd", None)
+        if self.store is not None:
+            state["shared"] = {
+                "tokens": self.store.get("tokens"),
+                "cost": f"{self.store.get('cost_nano_usd') / 1e9:.6f}",
+            }
         return state
 
+    def flush(self) -> bool:
+        """Write pending usage out (one batch per call)"""
+        with self._lock:
+            if not self._pending_calls:
+                return False
+            pending, self._pending = self._pending, {}
+            calls, self._pending_calls = self._pending_calls, 0
+            state = dict(self._state)
 
+        try:
+            if self.store is not None:
+                # One transaction: a failure leaves none of the deltas applied
+                self.store.add_many(pending, day=state["date"])
+            else:
+                state.pop("_costUsd", None)
+                atomic_write_json(self.state_file, state)
+        except Exception as e:
+            logger.warning("cost_flush_failed", extra={"error": str(e)})
+            with self._lock:
+                for key, delta in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + delta
+                self._pending_calls += calls
+            return False
+        return True
+
+
+_tracker: Optional[CostTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_cost_tracker() -> CostTracker:
+    """Get the process-wide cost tracker instance"""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = CostTracker()
+    return _tracker
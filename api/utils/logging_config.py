@@ -1,5 +1,88 @@
+import atexit
 import logging
 import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, List, Tuple
+
+from utils.metrics import LOG_RECORDS_DROPPED
+
+# Loggers with their own handlers (uvicorn sets these up before importing the app)
+_ROUTED_LOGGERS = ("", "uvicorn", "uvicorn.error", "uvicorn.access")
+
+# (logger, its original handlers, listener writing to them)
+_routes: List[Tuple[logging.Logger, List[logging.Handler], QueueListener]] = []
+_payload_sample_rate = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the background listener without formatting them.
+
+    The stock `prepare` renders the message (and any payload in it) on the
+    calling thread; here the record is passed as-is so formatting happens on the
+    listener thread. A full queue drops the record instead of blocking the
+    event loop (counted in greenhouse_log_records_dropped_total).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class LazyStr:
+    """`str(value)` deferred until a handler formats the record (on the listener thread)."""
+
+    __slots__ = ("_value",)
+
+    def __init__(self, value: Any):
+        self._value = value
+
+    def __str__(self) -> str:
+        try:
+            return str(self._value)
+        except Exception as e:
+            return f"<unrenderable {type(self._value).__name__}: {e}>"
+
+    __repr__ = __str__
+
+
+def payload_log_sampled(logger: logging.Logger) -> bool:
+    """
+    Whether to emit a verbose payload log (raw model response etc.) for this call.
+
+    Payload logs are DEBUG and additionally sampled at LOG_PAYLOAD_SAMPLE_RATE,
+    so enabling them on a busy instance doesn't log every request.
+    """
+    return logger.isEnabledFor(logging.DEBUG) and random.random() < _payload_sample_rate
+
+
+def _route_through_queue(logger: logging.Logger, queue_size: int) -> None:
+    handlers = list(logger.handlers)
+    if not handlers:
+        return
+    records: queue.Queue = queue.Queue(maxsize=queue_size)
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    _routes.append((logger, handlers, listener))
+    logger.handlers = [NonBlockingQueueHandler(records)]
+
+
+def stop_logging() -> None:
+    """Drain the queues, stop the writer threads and restore direct handlers (atexit)."""
+    while _routes:
+        logger, handlers, listener = _routes.pop()
+        logger.handlers = handlers
+        try:
+            listener.stop()
+        except queue.Full:
+            pass  # queue full of undelivered records; the daemon thread exits with the process
 
 
 def configure_logging() -> None:
@@ -9,9 +92,15 @@ def configure_logging() -> None:
     Notes:
     - Keeps output simple for local dev while remaining machine-parseable.
     - You can extend this with request IDs, trace IDs, etc.
+    - With LOG_ASYNC=true (default) callers only enqueue records; a background
+      QueueListener formats and writes them, so a slow stdout never blocks the
+      event loop. The queue holds LOG_QUEUE_SIZE records; beyond that records
+      are dropped rather than waited on.
     """
+    global _payload_sample_rate
     level_name = os.getenv("LOG_LEVEL", "INFO").upper()
     level = getattr(logging, level_name, logging.INFO)
+    _payload_sample_rate = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
 
     handler = logging.StreamHandler()
     try:
@@ -28,9 +117,17 @@ def configure_logging() -> None:
         )
         handler.setFormatter(formatter)
 
+    # Reconfiguring (e.g. app re-created in tests): flush and replace earlier listeners
+    stop_logging()
+
     root = logging.getLogger()
-    root.handlers = []
-    root.addHandler(handler)
+    root.handlers = [handler]
     root.setLevel(level)
 
+    if os.getenv("LOG_ASYNC", "true").lower() == "true":
+        queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+        for name in _ROUTED_LOGGERS:
+            _route_through_queue(logging.getLogger(name), queue_size)
+
 
+atexit.register(stop_logging)
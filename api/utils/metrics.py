@@ -0,0 +1,220 @@
+"""
+In-process metrics served at `/metrics` (Prometheus text exposition format).
+
+A deliberately small registry instead of a client library: counters and
+fixed-bucket histograms keyed by positional label values. An observation is one
+`bisect` plus a few increments under a lock (about a microsecond, see
+benchmarks/bench_metrics.py), so the timers can wrap every stage of the hot path.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar, Token
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers sub-ms parsing up to slow vision calls
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+# Per-request stage log, set by the profiling middleware for requests it captures
+_stage_trace: ContextVar[Optional[list]] = ContextVar("stage_trace", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        with self._lock:
+            return self._values.get(labelvalues, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        if not values and not self.labelnames:
+            values = [((), 0.0)]  # unlabeled counters are exported from zero
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labelnames, key)} {_fmt(v)}" for key, v in values]
+        return lines
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_labelvalues", "_start")
+
+    def __init__(self, histogram: "Histogram", labelvalues: Tuple[str, ...]):
+        self._histogram = histogram
+        self._labelvalues = labelvalues
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self._start
+        self._histogram.observe(elapsed, *self._labelvalues)
+        trace = _stage_trace.get()
+        if trace is not None:
+            trace.append((self._labelvalues, elapsed))
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._bounds = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (last = +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self._bounds) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labelvalues: str) -> _Timer:
+        """Context manager observing the elapsed wall time of its block (also on error)."""
+        return _Timer(self, labelvalues)
+
+    def count(self, *labelvalues: str) -> int:
+        with self._lock:
+            series = self._series.get(labelvalues)
+            return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, counts, total in snapshot:
+            cumulative = 0
+            for bound, n in zip(self._bounds + (math.inf,), counts):
+                cumulative += n
+                le = f'le="{_fmt(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {repr(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "greenhouse_stage_seconds",
+    "Time spent per analysis stage",
+    ("stage",),
+))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "greenhouse_cache_lookups_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ("cache", "result"),
+))
+FALLBACKS = REGISTRY.register(Counter(
+    "greenhouse_fallbacks_total",
+    "Readings answered without a model call, by reason",
+    ("reason",),
+))
+LIMITER_REJECTIONS = REGISTRY.register(Counter(
+    "greenhouse_limiter_rejections_total",
+    "Model calls refused by the daily rate limiter",
+))
+LOOP_LAG_SECONDS = REGISTRY.register(Histogram(
+    "greenhouse_event_loop_lag_seconds",
+    "How late the event loop ran the lag monitor's periodic tick",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+))
+LOG_RECORDS_DROPPED = REGISTRY.register(Counter(
+    "greenhouse_log_records_dropped_total",
+    "Log records dropped because the background log queue was full",
+))
+MODEL_CALLS = REGISTRY.register(Counter(
+    "greenhouse_model_calls_total",
+    "Model calls by outcome (ok, parse_error, error)",
+    ("outcome",),
+))
+
+
+def stage(name: str) -> _Timer:
+    """`with stage("model_call"): ...` records the block in greenhouse_stage_seconds."""
+    return STAGE_SECONDS.time(name)
+
+
+def start_stage_trace() -> Tuple[list, Token]:
+    """
+    Collect (labels, seconds) for every timed block in the current request context.
+
+    Returns the trace list and the token to pass to `end_stage_trace`.
+    """
+    trace: list = []
+    return trace, _stage_trace.set(trace)
+
+
+def end_stage_trace(token: Token) -> None:
+    _stage_trace.reset(token)
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.inc(cache, "hit" if hit else "miss")
+
+
+def render_latest() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,287 @@
+"""
+Opt-in request profiling, slow-request capture and an event-loop lag monitor.
+
+`RequestProfilerMiddleware` (PROFILE_ENABLED=true) runs a sampled fraction of
+requests (PROFILE_SAMPLE_RATE) under cProfile and records, for every captured
+request, the per-stage timings from `utils.metrics` plus any event-loop stalls
+seen while it was in flight. Requests slower than PROFILE_SLOW_MS are captured
+even when they were not sampled (stage timings and stalls, no call graph).
+Captures go to a bounded on-disk ring (PROFILE_DIR, newest PROFILE_KEEP kept):
+`<stem>.json` summary plus `<stem>.prof` for `python -m pstats` / snakeviz.
+
+cProfile is per thread, so one sampled request is profiled at a time and its
+profile also contains whatever else the event loop ran meanwhile.
+
+`LoopLagMonitor` ticks on the event loop; a watchdog thread grabs the loop
+thread's stack when a tick is overdue, so a stall is reported together with
+the handler that was blocking the loop (e.g. Pillow or a JSON file read).
+"""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Deque, List, Optional
+
+from utils.metrics import LOOP_LAG_SECONDS, end_stage_trace, start_stage_trace
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = str(Path(__file__).resolve().parent.parent)
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() == "true"
+
+
+def _app_frames(frames: List[traceback.FrameSummary]) -> List[str]:
+    """`module:function` for frames in this app (not the profiler, not site-packages), outermost first."""
+    out = []
+    for frame in frames:
+        path = frame.filename
+        if not path.endswith(".py") or not os.path.isabs(path):
+            continue
+        if not path.startswith(_APP_DIR + os.sep) or "site-packages" in path or path == __file__:
+            continue
+        out.append(os.path.relpath(path, _APP_DIR)[:-3].replace(os.sep, ".") + ":" + frame.name)
+    return out
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop runs a periodic tick.
+
+    While a tick is overdue by LOOP_LAG_THRESHOLD_MS the watchdog thread records
+    a stall with the loop thread's stack (the handler holding the loop); the
+    tick completes it with the final lag. Stalls are counted, logged and kept in
+    a short history for `/debug/profiling` and request captures. Every tick's
+    lag goes into the greenhouse_event_loop_lag_seconds histogram.
+    """
+
+    def __init__(self, interval_ms: Optional[float] = None, threshold_ms: Optional[float] = None, history: int = 50):
+        self.enabled = _env_bool("LOOP_LAG_MONITOR_ENABLED", "true")
+        self.interval = (interval_ms or float(os.getenv("LOOP_LAG_INTERVAL_MS", "100"))) / 1000
+        self.threshold = (threshold_ms or float(os.getenv("LOOP_LAG_THRESHOLD_MS", "200"))) / 1000
+        self.stalls: Deque[dict] = deque(maxlen=history)
+        self.stall_count = 0
+        self.max_lag = 0.0
+        self._lock = threading.Lock()
+        self._due = time.perf_counter()
+        self._loop_thread_id: Optional[int] = None
+        self._open_stall: Optional[dict] = None
+        self._stopped = threading.Event()
+
+    def _new_stall(self, lag: float, stack: List[traceback.FrameSummary]) -> dict:
+        app_frames = _app_frames(stack)
+        handlers = [f for f in app_frames if f.startswith(("routes.", "main:"))]
+        stall = {
+            "at": time.time() - lag,
+            "lagMs": round(lag * 1000, 1),
+            # Route handler that was running, and the innermost app function that held the loop
+            "handler": handlers[0] if handlers else (app_frames[0] if app_frames else None),
+            "blockedIn": app_frames[-1] if app_frames else None,
+            "stack": [f"{f.filename}:{f.lineno} {f.name}" for f in stack],
+        }
+        self.stall_count += 1
+        self.stalls.append(stall)
+        return stall
+
+    def _watchdog(self) -> None:
+        poll = min(self.threshold / 4, 0.05)
+        while not self._stopped.wait(poll):
+            overdue = time.perf_counter() - self._due
+            if overdue < self.threshold:
+                continue
+            with self._lock:
+                if self._open_stall is not None:
+                    self._open_stall["lagMs"] = round(overdue * 1000, 1)
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                stack = traceback.extract_stack(frame)[-20:] if frame is not None else []
+                self._open_stall = self._new_stall(overdue, stack)
+
+    async def run(self) -> None:
+        if not self.enabled:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        threading.Thread(target=self._watchdog, name="loop-lag-watchdog", daemon=True).start()
+        try:
+            while True:
+                self._due = time.perf_counter() + self.interval
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, time.perf_counter() - self._due)
+                LOOP_LAG_SECONDS.observe(lag)
+                self.max_lag = max(self.max_lag, lag)
+                with self._lock:
+                    stall, self._open_stall = self._open_stall, None
+                    if stall is None and lag >= self.threshold:
+                        stall = self._new_stall(lag, [])  # ended between watchdog polls
+                    if stall is not None:
+                        stall["lagMs"] = round(lag * 1000, 1)
+                if stall is not None:
+                    logger.warning(
+                        "event_loop_blocked",
+                        extra={"lagMs": stall["lagMs"], "handler": stall["handler"], "blockedIn": stall["blockedIn"]},
+                    )
+        finally:
+            self._stopped.set()
+
+    def stalls_since(self, since: float) -> List[dict]:
+        with self._lock:
+            return [dict(s) for s in self.stalls if s["at"] >= since]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            recent = [dict(s) for s in list(self.stalls)[-10:]]
+        return {
+            "enabled": self.enabled,
+            "intervalMs": self.interval * 1000,
+            "thresholdMs": self.threshold * 1000,
+            "maxLagMs": round(self.max_lag * 1000, 1),
+            "stalls": self.stall_count,
+            "recent": recent,
+        }
+
+
+class ProfileRing:
+    """Newest `keep` captures in `directory`; older files are deleted as new ones arrive."""
+
+    def __init__(self, directory: str, keep: int):
+        self.directory = Path(directory)
+        self.keep = max(1, keep)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stems: Deque[str] = deque(sorted({p.stem for p in self.directory.glob("*.json")}))
+        self._trim()
+
+    def _trim(self) -> None:
+        while len(self._stems) > self.keep:
+            stem = self._stems.popleft()
+            for path in self.directory.glob(f"{stem}.*"):
+                path.unlink(missing_ok=True)
+
+    def write(self, stem: str, summary: dict, profile: Optional[cProfile.Profile]) -> None:
+        if profile is not None:
+            profile.dump_stats(str(self.directory / f"{stem}.prof"))
+        tmp = self.directory / f"{stem}.json.tmp"
+        tmp.write_text(json.dumps(summary, indent=2, default=str))
+        os.replace(tmp, self.directory / f"{stem}.json")
+        with self._lock:
+            self._stems.append(stem)
+            self._trim()
+
+    def list(self) -> List[str]:
+        with self._lock:
+            return list(self._stems)
+
+
+def _top_functions(profile: cProfile.Profile, limit: int = 25) -> str:
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+class RequestProfilerMiddleware:
+    """ASGI middleware: sampled cProfile runs and slow-request capture for PROFILE_PATH_PREFIX."""
+
+    def __init__(self, app, monitor: Optional[LoopLagMonitor] = None):
+        self.app = app
+        self.monitor = monitor
+        self.sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))
+        self.slow_seconds = float(os.getenv("PROFILE_SLOW_MS", "1000")) / 1000
+        self.path_prefix = os.getenv("PROFILE_PATH_PREFIX", "/api/analyze")
+        self.ring = get_profile_ring()
+        self._profiling = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        profile = None
+        if random.random() < self.sample_rate and self._profiling.acquire(blocking=False):
+            profile = cProfile.Profile()
+        status = {"code": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        trace, trace_token = start_stage_trace()
+        started_wall = time.time()
+        start = time.perf_counter()
+        try:
+            if profile is not None:
+                profile.enable()
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._profiling.release()
+            end_stage_trace(trace_token)
+            elapsed = time.perf_counter() - start
+            if profile is not None or elapsed >= self.slow_seconds:
+                await self._capture(scope, status["code"], started_wall, elapsed, trace, profile)
+
+    async def _capture(self, scope, status_code, started_wall, elapsed, trace, profile) -> None:
+        kind = "sampled" if profile is not None else "slow"
+        stem = f"{int(started_wall * 1000)}-{kind}-{uuid.uuid4().hex[:6]}"
+        summary = {
+            "kind": kind,
+            "method": scope.get("method"),
+            "path": scope.get("path"),
+            "status": status_code,
+            "startedAt": started_wall,
+            "durationMs": round(elapsed * 1000, 2),
+            "stagesMs": [
+                {"stage": "/".join(labels), "ms": round(seconds * 1000, 3)} for labels, seconds in trace
+            ],
+            "loopStalls": self.monitor.stalls_since(started_wall) if self.monitor else [],
+            "profile": f"{stem}.prof" if profile is not None else None,
+        }
+        try:
+            # Off the loop: formatting stats and writing files is blocking work
+            await asyncio.to_thread(self._write, stem, summary, profile)
+        except OSError as e:
+            logger.warning("profile_write_failed", extra={"error": str(e)})
+            return
+        logger.info("request_profile_captured", extra={"kind": kind, "path": scope.get("path"), "file": stem})
+
+    def _write(self, stem: str, summary: dict, profile: Optional[cProfile.Profile]) -> None:
+        summary["topFunctions"] = _top_functions(profile) if profile is not None else None
+        self.ring.write(stem, summary, profile)
+
+
+_monitor: Optional[LoopLagMonitor] = None
+_ring: Optional[ProfileRing] = None
+
+
+def get_loop_monitor() -> LoopLagMonitor:
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopLagMonitor()
+    return _monitor
+
+
+def get_profile_ring() -> ProfileRing:
+    global _ring
+    if _ring is None:
+        _ring = ProfileRing(
+            os.getenv("PROFILE_DIR", os.path.join(_APP_DIR, "profiles")),
+            int(os.getenv("PROFILE_KEEP", "50")),
+        )
+    return _ring
@@ -1,82 +1,314 @@
-from datetime import datetime, date
+from datetime import date
+import asyncio
 import json
+import logging
 import os
+import sqlite3
+import threading
+from typing import Callable, Dict, Optional, Sequence
+
+from utils.atomic_io import atomic_write_json
+from utils.cost_tracker import get_cost_tracker
+from utils.usage_store import SQLiteUsageStore, get_usage_store, usage_backend
+
+logger = logging.getLogger(__name__)
 
 
 class RateLimiter:
-    """Track API usage and enforce daily limits"""
-    
-    def __init__(self, daily_limit: int = 144):
-        self.daily_limit = daily_limit
-        self.usage_file = os.path.join(os.path.dirname(__file__), "rate_limit_data.json")
-        self._ensure_file_exists()
-    
-    def _ensure_file_exists(self):
-        """Create usage file if it doesn't exist"""
-        if not os.path.exists(self.usage_file):
-            os.makedirs(os.path.dirname(self.usage_file), exist_ok=True)
-            self._save_usage({"date": str(date.today()), "calls": 0})
-    
+    """
+    Track API usage and enforce daily limits.
+
+    Counters live in memory (one instance per process, see `get_rate_limiter`);
+    `try_acquire` is an atomic check-and-reserve, so concurrent requests can't both
+    take the last slot. State is written behind to `rate_limit_data.json` by
+    `flush()` (periodically and on shutdown) using write-to-temp-and-rename.
+
+    Optional per-section sub-limits cap how much of the daily budget a single
+    greenhouse section can consume.
+    """
+
+    def __init__(
+        self,
+        daily_limit: Optional[int] = None,
+        usage_file: Optional[str] = None,
+        section_limit: Optional[int] = None,
+        section_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.daily_limit = daily_limit or int(os.getenv("DAILY_API_LIMIT", "144"))
+        self.usage_file = usage_file or os.path.join(os.path.dirname(__file__), "rate_limit_data.json")
+        # Default cap for any one section (0 = no sub-limit) + explicit overrides
+        self.section_limit = (
+            section_limit if section_limit is not None else int(os.getenv("SECTION_DAILY_LIMIT", "0"))
+        )
+        self.section_limits = dict(section_limits or {})
+
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._usage = self._load_usage()
+
+    def _empty(self) -> dict:
+        return {"date": str(date.today()), "calls": 0, "sections": {}}
+
     def _load_usage(self) -> dict:
-        """Load current usage data"""
+        """Load persisted usage data (once, at construction)"""
         try:
             with open(self.usage_file, 'r') as f:
-                return json.load(f)
+                usage = json.load(f)
         except (FileNotFoundError, json.JSONDecodeError):
-            return {"date": str(date.today()), "calls": 0}
-    
-    def _save_usage(self, data: dict):
-        """Save usage data"""
-        os.makedirs(os.path.dirname(self.usage_file), exist_ok=True)
-        with open(self.usage_file, 'w') as f:
-            json.dump(data, f)
-    
-    def check_limit(self) -> dict:
-        """Check if API call is allowed"""
-        usage = self._load_usage()
+            return self._empty()
+        usage.setdefault("calls", 0)
+        usage.setdefault("sections", {})
+        return usage
+
+    def _roll_day_locked(self) -> dict:
+        """Reset counters if a new day started (caller holds the lock)"""
         today = str(date.today())
-        
-        # Reset counter if new day
-        if usage.get("date") != today:
-            usage = {"date": today, "calls": 0}
-            self._save_usage(usage)
-        
+        if self._usage.get("date") != today:
+            self._usage = self._empty()
+            self._dirty = True
+        return self._usage
+
+    def _limit_for(self, section: Optional[str]) -> Optional[int]:
+        if section is None:
+            return None
+        limit = self.section_limits.get(section, self.section_limit)
+        return limit or None
+
+    def _status_locked(self, section: Optional[str]) -> dict:
+        usage = self._roll_day_locked()
         calls_made = usage.get("calls", 0)
-        
-        if calls_made >= self.daily_limit:
-            return {
-                "allowed": False,
-                "remaining": 0,
-                "calls_today": calls_made,
-                "limit": self.daily_limit,
-                "message": "Daily API limit reached. Using fallback threshold analysis."
-            }
-        
-        return {
-            "allowed": True,
-            "remaining": self.daily_limit - calls_made,
+        status = {
+            "allowed": calls_made < self.daily_limit,
+            "remaining": max(self.daily_limit - calls_made, 0),
             "calls_today": calls_made,
-            "limit": self.daily_limit
+            "limit": self.daily_limit,
         }
-    
-    def increment(self):
+
+        section_limit = self._limit_for(section)
+        if section_limit is not None:
+            section_calls = usage["sections"].get(section, 0)
+            status["section"] = section
+            status["section_calls_today"] = section_calls
+            status["section_limit"] = section_limit
+            if section_calls >= section_limit:
+                status["allowed"] = False
+                status["message"] = "Section API limit reached. Using fallback threshold analysis."
+
+        if calls_made >= self.daily_limit:
+            status["message"] = "Daily API limit reached. Using fallback threshold analysis."
+        return status
+
+    def check_limit(self, section: Optional[str] = None) -> dict:
+        """Check if API call is allowed (no reservation; see `try_acquire`)"""
+        with self._lock:
+            return self._status_locked(section)
+
+    def try_acquire(self, section: Optional[str] = None) -> dict:
+        """
+        Atomically check the limit and reserve one call if allowed.
+
+        Returns the same dict as `check_limit`; when `allowed` is True the call has
+        already been counted. Use `release()` to refund it if the call never happened.
+        """
+        with self._lock:
+            status = self._status_locked(section)
+            if status["allowed"]:
+                self._usage["calls"] += 1
+                if section is not None:
+                    sections = self._usage["sections"]
+                    sections[section] = sections.get(section, 0) + 1
+                self._dirty = True
+                status["calls_today"] = self._usage["calls"]
+                status["remaining"] = max(self.daily_limit - self._usage["calls"], 0)
+            return status
+
+    def release(self, section: Optional[str] = None) -> None:
+        """Refund a reservation taken with `try_acquire`"""
+        with self._lock:
+            usage = self._roll_day_locked()
+            usage["calls"] = max(usage.get("calls", 0) - 1, 0)
+            if section is not None and usage["sections"].get(section):
+                usage["sections"][section] -= 1
+            self._dirty = True
+
+    def increment(self, section: Optional[str] = None) -> int:
         """Increment usage counter"""
-        usage = self._load_usage()
+        with self._lock:
+            usage = self._roll_day_locked()
+            usage["calls"] = usage.get("calls", 0) + 1
+            if section is not None:
+                usage["sections"][section] = usage["sections"].get(section, 0) + 1
+            self._dirty = True
+            return usage["calls"]
+
+    def flush(self) -> bool:
+        """Persist counters if they changed since the last flush (atomic replace)"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            snapshot = {**self._usage, "sections": dict(self._usage["sections"])}
+            self._dirty = False
+
+        try:
+            atomic_write_json(self.usage_file, snapshot)
+        except OSError as e:
+            with self._lock:
+                self._dirty = True
+            logger.warning("rate_limit_flush_failed", extra={"error": str(e)})
+            return False
+        return True
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Daily limiter shared by all workers/pods through the SQLite usage store.
+
+    To keep per-request round trips low, each process leases a small batch of
+    slots (`USAGE_RESERVE_BATCH`) with one atomic UPDATE and hands them out
+    locally; unused slots go back to the store on `flush()`/shutdown. Near the
+    limit the lease shrinks to a single slot so no worker hoards the remainder.
+    """
+
+    CALLS_KEY = "calls"
+    SECTION_PREFIX = "calls:section:"
+
+    def __init__(
+        self,
+        store: Optional[SQLiteUsageStore] = None,
+        daily_limit: Optional[int] = None,
+        reserve_batch: Optional[int] = None,
+        section_limit: Optional[int] = None,
+        section_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.daily_limit = daily_limit or int(os.getenv("DAILY_API_LIMIT", "144"))
+        self.section_limit = (
+            section_limit if section_limit is not None else int(os.getenv("SECTION_DAILY_LIMIT", "0"))
+        )
+        self.section_limits = dict(section_limits or {})
+        self.reserve_batch = max(1, reserve_batch or int(os.getenv("USAGE_RESERVE_BATCH", "4")))
+        self.store = store or get_usage_store()
+
+        self._lock = threading.Lock()
+        self._lease = 0
+        self._lease_day = str(date.today())
+
+    def _roll_lease_locked(self) -> None:
         today = str(date.today())
-        
-        if usage.get("date") != today:
-            usage = {"date": today, "calls": 0}
-        
-        usage["calls"] = usage.get("calls", 0) + 1
-        self._save_usage(usage)
-        
-        return usage["calls"]
-
-
-def calculate_cost(tokens: int) -> str:
-    """Calculate API cost from token usage"""
-    # gpt-5-nano mini pricing
-    input_tokens = tokens * 0.7
-    output_tokens = tokens * 0.3
-    cost = (input_tokens * 0.15 / 1_000_000) + (output_tokens * 0.60 / 1_000_000)
-    return f"{cost:.6f}"
+        if self._lease_day != today:
+            # Yesterday's unused lease belongs to yesterday's counter; just drop it.
+            self._lease, self._lease_day = 0, today
+
+    def _take_slot_locked(self) -> bool:
+        self._roll_lease_locked()
+        if self._lease > 0:
+            self._lease -= 1
+            return True
+        if self.reserve_batch > 1 and self.store.reserve(self.CALLS_KEY, self.reserve_batch, self.daily_limit):
+            self._lease = self.reserve_batch - 1
+            return True
+        return self.store.reserve(self.CALLS_KEY, 1, self.daily_limit)
+
+    def _status(self, section: Optional[str], allowed: Optional[bool] = None) -> dict:
+        # Leased-but-unused slots are counted in the store already; report them as used.
+        calls_made = self.store.get(self.CALLS_KEY) - self._lease
+        status = {
+            "allowed": calls_made < self.daily_limit if allowed is None else allowed,
+            "remaining": max(self.daily_limit - calls_made, 0),
+            "calls_today": calls_made,
+            "limit": self.daily_limit,
+        }
+        section_limit = self._limit_for(section)
+        if section_limit is not None:
+            section_calls = self.store.get(self.SECTION_PREFIX + section)
+            status["section"] = section
+            status["section_calls_today"] = section_calls
+            status["section_limit"] = section_limit
+        if not status["allowed"]:
+            status["message"] = "Daily API limit reached. Using fallback threshold analysis."
+        return status
+
+    def check_limit(self, section: Optional[str] = None) -> dict:
+        with self._lock:
+            self._roll_lease_locked()
+            if self._lease > 0:
+                return self._status(section, allowed=True)
+        return self._status(section)
+
+    def try_acquire(self, section: Optional[str] = None) -> dict:
+        section_limit = self._limit_for(section)
+        if section_limit is not None:
+            if not self.store.reserve(self.SECTION_PREFIX + section, 1, section_limit):
+                status = self._status(section, allowed=False)
+                status["message"] = "Section API limit reached. Using fallback threshold analysis."
+                return status
+
+        with self._lock:
+            allowed = self._take_slot_locked()
+
+        if allowed:
+            # Counts are only read back on rejection, to keep admission to one round trip.
+            return {"allowed": True, "limit": self.daily_limit}
+        if section_limit is not None:
+            self.store.add(self.SECTION_PREFIX + section, -1)
+        return self._status(section, allowed=False)
+
+    def release(self, section: Optional[str] = None) -> None:
+        with self._lock:
+            self._roll_lease_locked()
+            self._lease += 1
+        if self._limit_for(section) is not None:
+            self.store.add(self.SECTION_PREFIX + section, -1)
+
+    def increment(self, section: Optional[str] = None) -> int:
+        if self._limit_for(section) is not None:
+            self.store.add(self.SECTION_PREFIX + section, 1)
+        return self.store.add(self.CALLS_KEY, 1)
+
+    def flush(self) -> bool:
+        """Return unused leased slots to the shared counter"""
+        with self._lock:
+            unused, self._lease = self._lease, 0
+            day = self._lease_day
+        if not unused:
+            return False
+        try:
+            self.store.add(self.CALLS_KEY, -unused, day=day)
+        except sqlite3.Error as e:
+            # Keep the slots leased (e.g. database locked) so the next flush returns them
+            with self._lock:
+                if self._lease_day == day:
+                    self._lease += unused
+            logger.warning("rate_limit_flush_failed", extra={"error": str(e)})
+            return False
+        return True
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the process-wide limiter instance"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = SharedRateLimiter() if usage_backend() == "sqlite" else RateLimiter()
+    return _limiter
+
+
+async def run_periodic_flush(
+    interval_seconds: Optional[float] = None,
+    extra_flushers: Sequence[Callable[[], object]] = (),
+) -> None:
+    """Write-behind loop: flush limiter, cost counters and `extra_flushers` every few seconds (run as a task)"""
+    interval = interval_seconds or float(os.getenv("USAGE_FLUSH_INTERVAL_SECONDS", "5"))
+    while True:
+        await asyncio.sleep(interval)
+        flushers = (lambda: get_rate_limiter().flush(), lambda: get_cost_tracker().flush(), *extra_flushers)
+        for flush in flushers:
+            try:
+                flush()
+            except Exception as e:
+                logger.warning("periodic_flush_failed", extra={"error": str(e)})
+
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.fast_json import dumps
+
+logger = logging.getLogger(__name__)
+
+
+def _epoch_ms(value: Any) -> Optional[int]:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def _pager_flag(result: dict) -> int:
+    pager = result.get("pagerAlert")
+    if isinstance(pager, dict):
+        return int(bool(pager.get("triggered")))
+    return int(bool(pager))
+
+
+def encode_cursor(ts_ms: int, seq: int) -> str:
+    return base64.urlsafe_b64encode(f"{ts_ms}:{seq}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """Raises ValueError on a malformed cursor."""
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    ts_ms, seq = raw.split(":")
+    return int(ts_ms), int(seq)
+
+
+class ResultsStore:
+    """
+    Durable analysis results in SQLite (WAL).
+
+    Results are buffered in memory and written in one transaction per batch
+    (`RESULTS_FLUSH_BATCH`, plus the periodic write-behind flush), so memory stays
+    bounded by the batch size rather than by history. While writes keep failing
+    the buffer is capped at `RESULTS_MAX_PENDING` rows; the oldest are dropped
+    (and counted in `dropped`). Queries read through the
+    (location, ts), (status, ts), (camera_id, ts), ts and pager-only indexes and
+    page with a keyset cursor on (ts, seq) instead of OFFSET, so a page costs
+    the same at row 10 and at row 10 million.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        busy_timeout_ms: int = 5000,
+    ):
+        self.path = path or os.getenv(
+            "RESULTS_DB_PATH", os.path.join(os.path.dirname(__file__), "results.db")
+        )
+        self.batch_size = batch_size or int(os.getenv("RESULTS_FLUSH_BATCH", "50"))
+        self.max_pending = max(self.batch_size, max_pending or int(os.getenv("RESULTS_MAX_PENDING", "10000")))
+        self.dropped = 0
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []
+        with self._lock:
+            self._conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS analyses (
+                    seq        INTEGER PRIMARY KEY,
+                    id         TEXT    NOT NULL UNIQUE,
+                    ts         INTEGER NOT NULL,
+                    location   TEXT,
+                    camera_id  TEXT,
+                    status     TEXT    NOT NULL,
+                    confidence REAL,
+                    pager      INTEGER NOT NULL DEFAULT 0,
+                    payload    TEXT    NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_analyses_ts ON analyses (ts);
+                CREATE INDEX IF NOT EXISTS idx_analyses_location_ts ON analyses (location, ts);
+                CREATE INDEX IF NOT EXISTS idx_analyses_status_ts ON analyses (status, ts);
+                CREATE INDEX IF NOT EXISTS idx_analyses_camera_ts ON analyses (camera_id, ts);
+                CREATE INDEX IF NOT EXISTS idx_analyses_pager_ts ON analyses (ts) WHERE pager = 1;
+                """
+            )
+
+    def _row(self, result: dict) -> Optional[tuple]:
+        ts_ms = _epoch_ms(result.get("timestamp"))
+        if ts_ms is None:
+            return None
+        result_id = str(result.get("id") or uuid.uuid4().hex)
+        return (
+            result_id,
+            ts_ms,
+            result.get("location"),
+            result.get("camera_id"),
+            result.get("status") or "uncertain",
+            result.get("confidence"),
+            _pager_flag(result),
+            # Same encoding as the API responses (datetimes as ISO 8601, UTC as "Z")
+            dumps({**result, "id": result_id}).decode("utf-8"),
+        )
+
+    def add(self, result: dict) -> None:
+        """Buffer one result (needs `timestamp`; `id` is generated when missing)."""
+        row = self._row(result)
+        if row is None:
+            logger.warning("result_without_timestamp_skipped")
+            return
+        with self._lock:
+            self._pending.append(row)
+            flush_now = len(self._pending) >= self.batch_size
+        if flush_now:
+            self.flush()
+
+    def add_many(self, results: List[dict]) -> int:
+        rows = [row for row in map(self._row, results) if row is not None]
+        with self._lock:
+            self._pending.extend(rows)
+        self.flush()
+        return len(rows)
+
+    def flush(self) -> bool:
+        """Write buffered results in one transaction (same id replaces the older row)."""
+        with self._lock:
+            if not self._pending:
+                return False
+            rows, self._pending = self._pending, []
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    """
+                    INSERT INTO analyses (id, ts, location, camera_id, status, confidence, pager, payload)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        ts = excluded.ts, location = excluded.location, camera_id = excluded.camera_id,
+                        status = excluded.status, confidence = excluded.confidence,
+                        pager = excluded.pager, payload = excluded.payload
+                    """,
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                self._pending[:0] = rows
+                # SQLite already rolled back on e.g. SQLITE_FULL / IOERR; ROLLBACK would raise
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                overflow = len(self._pending) - self.max_pending
+                if overflow > 0:
+                    del self._pending[:overflow]
+                    self.dropped += overflow
+                logger.warning(
+                    "results_flush_failed",
+                    extra={"error": str(e), "pending": len(self._pending), "dropped": self.dropped},
+                )
+                return False
+        return True
+
+    def count(self) -> int:
+        self.flush()
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM analyses").fetchone()[0]
+
+    def get(self, result_id: str) -> Optional[dict]:
+        self.flush()
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM analyses WHERE id = ?", (result_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def query(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        location: Optional[str] = None,
+        status: Optional[str] = None,
+        camera_id: Optional[str] = None,
+        pager_only: bool = False,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        raw: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Newest-first page of results matching the filters.
+
+        With `raw=True` items are the stored JSON payloads (str), not decoded,
+        so a response can splice them in without a decode/re-encode round trip.
+
+        Returns:
+            {"items": [...], "nextCursor": str | None}
+
+        Raises:
+            ValueError: malformed cursor
+        """
+        self.flush()
+        where, params = [], []
+        if location is not None:
+            where.append("location = ?")
+            params.append(location)
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        if camera_id is not None:
+            where.append("camera_id = ?")
+            params.append(camera_id)
+        if pager_only:
+            where.append("pager = 1")
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(_epoch_ms(since))
+        if until is not None:
+            where.append("ts < ?")
+            params.append(_epoch_ms(until))
+        if cursor:
+            ts_ms, seq = decode_cursor(cursor)
+            where.append("(ts, seq) < (?, ?)")
+            params.extend((ts_ms, seq))
+
+        sql = "SELECT seq, ts, payload FROM analyses"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC, seq DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        items = [payload for _, _, payload in rows] if raw else [json.loads(payload) for _, _, payload in rows]
+        return {"items": items, "nextCursor": next_cursor}
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[ResultsStore] = None
+_store_lock = threading.Lock()
+
+
+def get_results_store() -> ResultsStore:
+    """Get the process-wide results store (imports analyzed_results.json once if empty)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = ResultsStore()
+                if store.count() == 0:
+                    _import_legacy_results(store)
+                _store = store
+    return _store
+
+
+def _import_legacy_results(store: ResultsStore) -> None:
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "mock_data", "analyzed_results.json")
+    try:
+        with open(path, "r") as f:
+            results = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return
+    if isinstance(results, list):
+        imported = store.add_many([r for r in results if isinstance(r, dict)])
+        logger.info("results_imported", extra={"count": imported})
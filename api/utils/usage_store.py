@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from datetime import date
+from typing import Dict, Optional
+
+
+def _today() -> str:
+    return str(date.today())
+
+
+class SQLiteUsageStore:
+    """
+    Daily usage counters shared by every worker/pod on the same volume.
+
+    Backed by SQLite in WAL mode. Each operation is a single atomic
+    `INSERT ... ON CONFLICT DO UPDATE ... RETURNING` statement, so concurrent
+    processes never lose increments and a limit check can't be raced past.
+    """
+
+    def __init__(self, path: Optional[str] = None, busy_timeout_ms: int = 5000):
+        self.path = path or os.getenv(
+            "USAGE_DB_PATH", os.path.join(os.path.dirname(__file__), "usage.db")
+        )
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        # Autocommit: every statement below is its own atomic transaction.
+        self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS usage_counters (
+                    day   TEXT    NOT NULL,
+                    key   TEXT    NOT NULL,
+                    value INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, key)
+                ) WITHOUT ROWID
+                """
+            )
+
+    def reserve(self, key: str, n: int, limit: int, day: Optional[str] = None) -> bool:
+        """
+        Atomically add `n` to the counter only if it stays within `limit`.
+
+        Returns:
+            True if all `n` units were reserved, False if none were.
+        """
+        if n <= 0 or n > limit:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                """
+                INSERT INTO usage_counters (day, key, value) VALUES (?, ?, ?)
+                ON CONFLICT (day, key) DO UPDATE
+                    SET value = value + excluded.value
+                    WHERE value + excluded.value <= ?
+                RETURNING value
+                """,
+                (day or _today(), key, n, limit),
+            ).fetchone()
+        return row is not None
+
+    def add(self, key: str, amount: int, day: Optional[str] = None) -> int:
+        """Unconditionally add to a counter (negative amounts release); returns the new value."""
+        with self._lock:
+            row = self._conn.execute(
+                """
+                INSERT INTO usage_counters (day, key, value) VALUES (?, ?, max(?, 0))
+                ON CONFLICT (day, key) DO UPDATE
+                    SET value = max(value + ?, 0)
+                RETURNING value
+                """,
+                (day or _today(), key, amount, amount),
+            ).fetchone()
+        return int(row[0])
+
+    def add_many(self, amounts: Dict[str, int], day: Optional[str] = None) -> None:
+        """`add` for several counters in one transaction (all applied or none)."""
+        day = day or _today()
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(
+                    """
+                    INSERT INTO usage_counters (day, key, value) VALUES (?, ?, max(?, 0))
+                    ON CONFLICT (day, key) DO UPDATE
+                        SET value = max(value + ?, 0)
+                    """,
+                    [(day, key, amount, amount) for key, amount in amounts.items()],
+                )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, key: str, day: Optional[str] = None) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM usage_counters WHERE day = ? AND key = ?",
+                (day or _today(), key),
+            ).fetchone()
+        return int(row[0]) if row else 0
+
+    def get_prefix(self, prefix: str, day: Optional[str] = None) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM usage_counters WHERE day = ? AND key >= ? AND key < ?",
+                (day or _today(), prefix, prefix + "\uffff"),
+            ).fetchall()
+        return {k[len(prefix):]: int(v) for k, v in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[SQLiteUsageStore] = None
+_store_lock = threading.Lock()
+
+
+def usage_backend() -> str:
+    """`file` (per-process JSON, default) or `sqlite` (shared across workers)"""
+    return os.getenv("USAGE_BACKEND", "file").strip().lower()
+
+
+def get_usage_store() -> SQLiteUsageStore:
+    """Get the process-wide SQLite usage store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SQLiteUsageStore()
+    return _store
@@ -151,7 +151,11 @@ export default function AnalysisDetail() {
                   📸 Plant Image
                 </h2>
                 <img
-                  src={`${API_URL}/api/mock_data/images/${analysis.image}`}
+                  src={analysis.imageUrl ? `${API_URL}${analysis.imageUrl}` : `${API_URL}/api/images/${analysis.image}`}
+                  srcSet={analysis.imageSrcSet
+                    ? Object.entries(analysis.imageSrcSet).map(([w, url]) => `${API_URL}${url} ${w}w`).join(', ')
+                    : undefined}
+                  sizes="(min-width: 1024px) 50vw, 100vw"
                   alt="Plant"
                   className="w-full rounded-xl shadow-md"
                   onError={(e) => {